@@ -0,0 +1,62 @@
+import argparse
+import random
+import threading
+import time
+
+from idt.concurrent import ConcurrentStore, LockStripes
+from idt.domains import Dimmer, Hub
+from idt.repositories import DeviceRepository, HubRepository
+from idt.usecases import DeviceUsecases, HubUsecases
+
+
+def run(stripes: int, threads: int, devices: int, hubs: int, ops: int) -> float:
+    store = ConcurrentStore(stripes=LockStripes(count=stripes))
+    device_repo = DeviceRepository(store)
+    hub_repo = HubRepository(store)
+    ids = [d.id for d in device_repo.create_many([Dimmer() for _ in range(devices)])]
+    for i in range(hubs):
+        hub_repo.save(Hub(id=f"hub-{i}"))
+    device_uc = DeviceUsecases(device_repo)
+    hub_uc = HubUsecases(hub_repo, device_repo)
+
+    def work(seed: int):
+        rng = random.Random(seed)
+        for _ in range(ops // threads):
+            id_ = rng.choice(ids)
+            roll = rng.random()
+            if roll < 0.8:
+                device_uc.update_device(id_, brightness=rng.randrange(101))
+            elif roll < 0.9:
+                device_uc.list_devices()
+            else:
+                hub_id = f"hub-{rng.randrange(hubs)}"
+                device = device_repo.get(id_)
+                if device.hub is None:
+                    hub_uc.pair_device(hub_id, id_)
+                else:
+                    hub_uc.unpair_device(device.hub.id, id_)
+
+    workers = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return ops / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ConcurrentStore lock contention")
+    parser.add_argument("--devices", type=int, default=10_000)
+    parser.add_argument("--hubs", type=int, default=100)
+    parser.add_argument("--ops", type=int, default=50_000)
+    args = parser.parse_args()
+
+    for stripes in (1, 64):
+        for threads in (1, 4, 16):
+            rate = run(stripes, threads, args.devices, args.hubs, args.ops)
+            print(f"stripes={stripes:<3} threads={threads:<3} {rate:12,.0f} ops/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import random
+from dataclasses import dataclass, field
+from typing import Callable, Mapping, Optional
+
+from idt.domains import (
+    Dimmer,
+    Dwelling,
+    DwellingState,
+    Hub,
+    Lock,
+    LockState,
+    Switch,
+    SwitchState,
+    Thermostat,
+    TypeDevice,
+)
+from idt.repositories import DeviceRepository, DwellingRepository, Store
+
+FACTORIES: Mapping[type[TypeDevice], Callable[[str, random.Random], TypeDevice]] = {
+    Switch: lambda id_, rng: Switch(id=id_, state=rng.choice(list(SwitchState))),
+    Dimmer: lambda id_, rng: Dimmer(id=id_, brightness=rng.randrange(101)),
+    Lock: lambda id_, rng: Lock(
+        id=id_, state=rng.choice(list(LockState)), code=["1", "2", "3", "4"]
+    ),
+    Thermostat: lambda id_, rng: Thermostat(
+        id=id_,
+        target_temp_f=rng.choice([66.0, 68.0, 70.0, 72.0]),
+        actual_temp_f=round(rng.uniform(60.0, 80.0), 1),
+    ),
+}
+
+
+@dataclass
+class FleetSpec:
+    dwellings: int = 1000
+    hubs_per_dwelling: int = 1
+    devices_per_hub: int = 10
+    unpaired: int = 0
+    mix: Mapping[type[TypeDevice], float] = field(
+        default_factory=lambda: {Switch: 0.4, Dimmer: 0.3, Lock: 0.2, Thermostat: 0.1}
+    )
+    occupied: float = 0.5
+    seed: int = 0
+
+    @property
+    def devices(self) -> int:
+        return self.dwellings * self.hubs_per_dwelling * self.devices_per_hub + (
+            self.unpaired
+        )
+
+    @classmethod
+    def of_size(cls, devices: int, **kwargs) -> "FleetSpec":
+        spec = cls(**kwargs)
+        per_dwelling = spec.hubs_per_dwelling * spec.devices_per_hub
+        spec.dwellings = max(1, (devices - spec.unpaired) // per_dwelling)
+        return spec
+
+
+def generate(spec: FleetSpec, store: Optional[Store] = None) -> Store:
+    # ids are deterministic so runs against the same spec touch the same data
+    rng = random.Random(spec.seed)
+    classes = list(spec.mix)
+    weights = list(spec.mix.values())
+
+    def device(i: int) -> TypeDevice:
+        cls = rng.choices(classes, weights)[0]
+        return FACTORIES[cls](f"device-{i}", rng)
+
+    dwellings = []
+    count = 0
+    for d in range(spec.dwellings):
+        state = (
+            DwellingState.OCCUPIED
+            if rng.random() < spec.occupied
+            else DwellingState.VACANT
+        )
+        dwelling = Dwelling(id=f"dwelling-{d}", state=state)
+        for h in range(spec.hubs_per_dwelling):
+            hub = Hub(id=f"hub-{d}-{h}")
+            for _ in range(spec.devices_per_hub):
+                hub.pair_device(device(count))
+                count += 1
+            dwelling.install_hub(hub)
+        dwellings.append(dwelling)
+    unpaired = [device(count + i) for i in range(spec.unpaired)]
+
+    if store is None:
+        # built in place, so clear the change logs a save would have consumed
+        hubs = [hub for dwelling in dwellings for hub in dwelling.pop_changes()]
+        devices = [device for hub in hubs for device in hub.pop_changes()]
+        return Store(
+            devices={device.id: device for device in [*devices, *unpaired]},
+            dwellings={dwelling.id: dwelling for dwelling in dwellings},
+            hubs={hub.id: hub for hub in hubs},
+        )
+
+    with store.transaction():
+        dwelling_repo = DwellingRepository(store)
+        for dwelling in dwellings:
+            dwelling_repo.save(dwelling)
+        DeviceRepository(store).save_many(unpaired)
+    return store
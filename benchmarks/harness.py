@@ -0,0 +1,82 @@
+import gc
+import statistics
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Mapping, Optional
+
+
+@dataclass
+class Run:
+    fn: Callable[[], Any]
+    ops: int
+    # undoes what fn added so later cases see the same fleet
+    cleanup: Optional[Callable[[], Any]] = None
+
+
+# does the untimed setup for one repeat
+Prepare = Callable[[], Run]
+
+
+@dataclass
+class Measurement:
+    case: str
+    devices: int
+    ops: int
+    repeat: int
+    min_s: float
+    median_s: float
+    mean_s: float
+    per_op_us: float
+    peak_bytes: int
+
+    def to_json(self) -> Mapping[str, Any]:
+        return asdict(self)
+
+
+def measure(case: str, devices: int, prepare: Prepare, repeat: int) -> Measurement:
+    timings = []
+    for _ in range(repeat):
+        run = prepare()
+        timings.append(_timed(run.fn))
+        if run.cleanup is not None:
+            run.cleanup()
+
+    # a separate run for memory, tracing allocations slows the timed ones down
+    run = prepare()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        run.fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    if run.cleanup is not None:
+        run.cleanup()
+
+    best = min(timings)
+    return Measurement(
+        case=case,
+        devices=devices,
+        ops=run.ops,
+        repeat=repeat,
+        min_s=best,
+        median_s=statistics.median(timings),
+        mean_s=statistics.fmean(timings),
+        per_op_us=best / max(run.ops, 1) * 1e6,
+        peak_bytes=peak - base,
+    )
+
+
+def _timed(fn: Callable[[], Any]) -> float:
+    # like timeit, keep the collector from landing in the middle of a run
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        fn()
+        return time.perf_counter() - start
+    finally:
+        gc.enable()
@@ -0,0 +1,64 @@
+import argparse
+import random
+import time
+
+from idt.domains import Thermostat
+from idt.ingest import TelemetryIngestor
+from idt.repositories import DeviceRepository, Store
+from idt.usecases import DeviceUsecases
+
+
+def readings(ids, count: int, seed: int = 0):
+    rng = random.Random(seed)
+    for i in range(count):
+        # a few percent of readings arrive late or twice
+        timestamp = i - rng.randrange(50) if rng.random() < 0.03 else i
+        yield rng.choice(ids), "actual_temp_f", rng.uniform(60.0, 80.0), timestamp
+
+
+def fleet(devices: int) -> DeviceRepository:
+    repo = DeviceRepository(Store())
+    repo.save_many(
+        Thermostat(id=f"thermostat-{i}", target_temp_f=70.0, actual_temp_f=70.0)
+        for i in range(devices)
+    )
+    return repo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Thermostat telemetry ingestion")
+    parser.add_argument("--devices", type=int, default=10_000)
+    parser.add_argument("--readings", type=int, default=500_000)
+    parser.add_argument(
+        "--batch-size", type=int, nargs="+", default=[100, 1000, 10_000]
+    )
+    args = parser.parse_args()
+
+    repo = fleet(args.devices)
+    ids = [device.id for device in repo.list()]
+    data = list(readings(ids, args.readings))
+
+    usecases = DeviceUsecases(repo)
+    start = time.perf_counter()
+    for id_, attr, value, _ in data:
+        usecases.update_device(id_, **{attr: value})
+    elapsed = time.perf_counter() - start
+    print(f"update_device       {len(data) / elapsed:12,.0f} readings/s")
+
+    for batch_size in args.batch_size:
+        repo = fleet(args.devices)
+        ids = [device.id for device in repo.list()]
+        data = list(readings(ids, args.readings))
+        ingestor = TelemetryIngestor(repo, batch_size=batch_size)
+        start = time.perf_counter()
+        stats = ingestor.ingest(data)
+        elapsed = time.perf_counter() - start
+        print(
+            f"batch_size={batch_size:<8} {len(data) / elapsed:12,.0f} readings/s "
+            f"applied={stats.applied} coalesced={stats.coalesced} "
+            f"stale={stats.stale}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import argparse
+import tempfile
+import time
+
+from idt.domains import Dimmer
+from idt.journal import JournalStore
+from idt.repositories import DeviceRepository, Store
+from idt.usecases import DeviceUsecases
+
+
+def run(store: Store, devices: int, updates: int) -> float:
+    device_repo = DeviceRepository(store)
+    created = device_repo.create_many([Dimmer() for _ in range(devices)])
+    ids = [device.id for device in created]
+    device_uc = DeviceUsecases(device_repo)
+    start = time.perf_counter()
+    for i in range(updates):
+        device_uc.update_device(ids[i % devices], brightness=i % 101)
+    return updates / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Journal write throughput")
+    parser.add_argument("--devices", type=int, default=10_000)
+    parser.add_argument("--updates", type=int, default=200_000)
+    args = parser.parse_args()
+
+    results = {"memory": run(Store(), args.devices, args.updates)}
+    for name, synchronous, updates in [
+        ("journal", False, args.updates),
+        ("journal-sync", True, args.updates // 100),
+    ]:
+        with tempfile.TemporaryDirectory() as directory:
+            store = JournalStore(directory=directory, synchronous=synchronous)
+            results[name] = run(store, args.devices, updates)
+            store.close()
+
+    for name, rate in results.items():
+        print(f"{name:>12}: {rate:12,.0f} updates/s")
+
+
+if __name__ == "__main__":
+    main()
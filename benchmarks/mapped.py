@@ -0,0 +1,56 @@
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from idt.domains import Dimmer, Dwelling, Hub
+from idt.mapped import MappedStore, write_snapshot
+from idt.repositories import DeviceRepository, DwellingRepository, Store
+
+
+def build(devices: int, per_hub: int) -> Store:
+    store = Store()
+    created = DeviceRepository(store).create_many([Dimmer() for _ in range(devices)])
+    dwelling_repo = DwellingRepository(store)
+    for i in range(0, devices, per_hub):
+        hub = Hub(id=f"hub-{i}")
+        for device in created[i : i + per_hub]:
+            hub.pair_device(device)
+        dwelling = Dwelling(id=f"dwelling-{i}")
+        dwelling.install_hub(hub)
+        dwelling_repo.save(dwelling)
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory-mapped snapshot startup")
+    parser.add_argument("--devices", type=int, default=1_000_000)
+    parser.add_argument("--per-hub", type=int, default=50)
+    args = parser.parse_args()
+
+    source = build(args.devices, args.per_hub)
+    some_id = str(next(reversed(source.devices)))
+    with tempfile.TemporaryDirectory() as directory:
+        path = str(Path(directory) / "store.snap")
+        start = time.perf_counter()
+        with open(path, "wb") as file:
+            write_snapshot(source, file)
+        timings = {"write": time.perf_counter() - start}
+        del source
+
+        start = time.perf_counter()
+        store = MappedStore(path=path)
+        timings["open"] = time.perf_counter() - start
+        DeviceRepository(store).get(some_id)
+        timings["first_get"] = time.perf_counter() - start
+        start = time.perf_counter()
+        store.materialize_all()
+        timings["materialize_all"] = time.perf_counter() - start
+        store.close()
+
+    for name, seconds in timings.items():
+        print(f"{name:>15}: {seconds * 1000:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import gc
+import tracemalloc
+from itertools import cycle, islice
+from typing import Callable, Sequence
+
+from idt.domains import (
+    Device,
+    Dimmer,
+    Lock,
+    LockState,
+    Switch,
+    SwitchState,
+    Thermostat,
+)
+
+FACTORIES: Sequence[Callable[[type, int], Device]] = [
+    lambda cls, i: cls(id=str(i), state=SwitchState.ON),
+    lambda cls, i: cls(id=str(i), brightness=i % 101),
+    lambda cls, i: cls(id=str(i), state=LockState.LOCKED),
+    lambda cls, i: cls(id=str(i), target_temp_f=68.0, actual_temp_f=70.5),
+]
+
+
+def unslotted(cls: type) -> type:
+    # a plain subclass brings back the per-instance __dict__ of a regular dataclass
+    return type(cls.__name__, (cls,), {})
+
+
+def measure(classes: Sequence[type], count: int) -> int:
+    pairs = list(zip(classes, FACTORIES))
+    gc.collect()
+    tracemalloc.start()
+    devices = [
+        factory(cls, i) for i, (cls, factory) in enumerate(islice(cycle(pairs), count))
+    ]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del devices
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Device model memory benchmark")
+    parser.add_argument("--devices", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    slotted = [Switch, Dimmer, Lock, Thermostat]
+    results = {
+        "dict": measure([unslotted(cls) for cls in slotted], args.devices),
+        "slots": measure(slotted, args.devices),
+    }
+    for name, size in results.items():
+        print(
+            f"{name:>5}: {size / 2**20:8.1f} MiB total, "
+            f"{size / args.devices:6.1f} B/device"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Mapping
+
+from idt.domains import Dimmer, Dwelling, Hub
+from idt.repositories import DeviceRepository, DwellingRepository, Store
+from idt.sqlite import SqliteStore
+from idt.usecases import DeviceUsecases
+
+
+def timed(fn: Callable[[], None]) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run(store: Store, devices: int, per_hub: int) -> Mapping[str, float]:
+    device_repo = DeviceRepository(store)
+    dwelling_repo = DwellingRepository(store)
+    created = []
+
+    def create():
+        created.extend(device_repo.create_many([Dimmer() for _ in range(devices)]))
+
+    def install():
+        for i in range(0, devices, per_hub):
+            hub = Hub(id=f"hub-{i}")
+            for device in created[i : i + per_hub]:
+                hub.pair_device(device)
+            dwelling = Dwelling(id=f"dwelling-{i}")
+            dwelling.install_hub(hub)
+            dwelling_repo.save(dwelling)
+
+    def update():
+        device_uc = DeviceUsecases(device_repo)
+        for device in created:
+            device_uc.update_device(device.id, brightness=50)
+
+    return {
+        "create_many": timed(create),
+        "dwelling_save": timed(install),
+        "update_device": timed(update),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-memory vs SQLite store")
+    parser.add_argument("--devices", type=int, default=100_000)
+    parser.add_argument("--per-hub", type=int, default=50)
+    args = parser.parse_args()
+
+    results = {"memory": run(Store(), args.devices, args.per_hub)}
+    with tempfile.TemporaryDirectory() as directory:
+        path = str(Path(directory) / "store.db")
+        store = SqliteStore(path=path)
+        results["sqlite"] = run(store, args.devices, args.per_hub)
+        store.close()
+        results["sqlite"]["load"] = timed(lambda: SqliteStore(path=path).close())
+
+    for name, timings in results.items():
+        for op, seconds in timings.items():
+            print(f"{name:>6} {op:<14} {seconds * 1000:10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,487 @@
+import argparse
+import datetime
+import json
+import platform
+import random
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional, Sequence
+
+from benchmarks.fleet import FleetSpec, generate
+from benchmarks.harness import Measurement, Run, measure
+from idt.domains import Dimmer, Hub, Lock, LockState, SwitchState, TypeDevice
+from idt.repositories import DeviceRepository, DwellingRepository, HubRepository, Store
+from idt.usecases import SHUTDOWN, DeviceUsecases, DwellingUsecases, HubUsecases
+
+
+@dataclass
+class Context:
+    store: Store
+    rng: random.Random
+    ops: int
+    device_repo: DeviceRepository
+    hub_repo: HubRepository
+    dwelling_repo: DwellingRepository
+    device_uc: DeviceUsecases
+    hub_uc: HubUsecases
+    dwelling_uc: DwellingUsecases
+    dimmer_ids: Sequence[str]
+    hub_ids: Sequence[str]
+    dwelling_ids: Sequence[str]
+
+    @classmethod
+    def of(cls, store: Store, ops: int, seed: int = 0) -> "Context":
+        device_repo = DeviceRepository(store)
+        hub_repo = HubRepository(store)
+        dwelling_repo = DwellingRepository(store)
+        return cls(
+            store=store,
+            rng=random.Random(seed),
+            ops=ops,
+            device_repo=device_repo,
+            hub_repo=hub_repo,
+            dwelling_repo=dwelling_repo,
+            device_uc=DeviceUsecases(device_repo),
+            hub_uc=HubUsecases(hub_repo, device_repo),
+            dwelling_uc=DwellingUsecases(dwelling_repo, hub_repo, device_repo),
+            dimmer_ids=[d.id for d in device_repo.find(Dimmer)],
+            hub_ids=list(store.hubs),
+            dwelling_ids=list(store.dwellings),
+        )
+
+    def sample(self, ids: Sequence[str], count: Optional[int] = None) -> Sequence[str]:
+        return [self.rng.choice(ids) for _ in range(count or self.ops)]
+
+    def dimmers(self) -> Sequence[TypeDevice]:
+        return [self.store.devices[id_] for id_ in self.sample(self.dimmer_ids)]
+
+    def hubs(self) -> Sequence[Hub]:
+        return [self.store.hubs[id_] for id_ in self.sample(self.hub_ids)]
+
+    def unpaired(self) -> Sequence[TypeDevice]:
+        return self.device_repo.create_many([Dimmer() for _ in range(self.ops)])
+
+    def paired(self) -> Sequence[TypeDevice]:
+        devices = self.unpaired()
+        for device, hub_id in zip(devices, self.sample(self.hub_ids)):
+            self.hub_uc.pair_device(hub_id, device.id)
+        return devices
+
+    def remove(self, devices: Iterable[TypeDevice]) -> Callable[[], None]:
+        def cleanup():
+            for device in devices:
+                if device.hub is not None:
+                    self.hub_uc.unpair_device(device.hub.id, device.id)
+            self.device_repo.delete_many(devices)
+
+        return cleanup
+
+
+def each(fn: Callable, items: Iterable) -> Callable[[], None]:
+    def run():
+        for item in items:
+            fn(item)
+
+    return run
+
+
+def drain(iterator: Callable[[], Iterable]) -> Callable[[], None]:
+    def run():
+        for _ in iterator():
+            pass
+
+    return run
+
+
+def pages(page: Callable) -> Callable[[], None]:
+    def run():
+        after = None
+        while True:
+            after = page(after).cursor
+            if after is None:
+                return
+
+    return run
+
+
+CASES: Dict[str, Callable[[Context], Run]] = {}
+
+
+def case(name: str):
+    def register(prepare: Callable[[Context], Run]) -> Callable[[Context], Run]:
+        CASES[name] = prepare
+        return prepare
+
+    return register
+
+
+@case("DeviceRepository.create")
+def device_repo_create(c: Context) -> Run:
+    devices = [Dimmer() for _ in range(c.ops)]
+    return Run(each(c.device_repo.create, devices), c.ops, c.remove(devices))
+
+
+@case("DeviceRepository.create_many")
+def device_repo_create_many(c: Context) -> Run:
+    devices = [Dimmer() for _ in range(c.ops)]
+    return Run(lambda: c.device_repo.create_many(devices), c.ops, c.remove(devices))
+
+
+@case("DeviceRepository.delete")
+def device_repo_delete(c: Context) -> Run:
+    return Run(each(c.device_repo.delete, c.unpaired()), c.ops)
+
+
+@case("DeviceRepository.delete_many")
+def device_repo_delete_many(c: Context) -> Run:
+    devices = c.unpaired()
+    return Run(lambda: c.device_repo.delete_many(devices), c.ops)
+
+
+@case("DeviceRepository.find")
+def device_repo_find(c: Context) -> Run:
+    return Run(
+        each(
+            lambda id_: c.device_repo.find(Lock, dwelling_id=id_),
+            c.sample(c.dwelling_ids),
+        ),
+        c.ops,
+    )
+
+
+@case("DeviceRepository.find[state]")
+def device_repo_find_state(c: Context) -> Run:
+    return Run(lambda: c.device_repo.find(state=SwitchState.ON), 1)
+
+
+@case("DeviceRepository.get")
+def device_repo_get(c: Context) -> Run:
+    return Run(each(c.device_repo.get, c.sample(c.dimmer_ids)), c.ops)
+
+
+@case("DeviceRepository.iter")
+def device_repo_iter(c: Context) -> Run:
+    return Run(drain(c.device_repo.iter), 1)
+
+
+@case("DeviceRepository.list")
+def device_repo_list(c: Context) -> Run:
+    return Run(c.device_repo.list, 1)
+
+
+@case("DeviceRepository.page")
+def device_repo_page(c: Context) -> Run:
+    return Run(pages(c.device_repo.page), 1)
+
+
+@case("DeviceRepository.save")
+def device_repo_save(c: Context) -> Run:
+    return Run(each(c.device_repo.save, c.dimmers()), c.ops)
+
+
+@case("DeviceRepository.save_many")
+def device_repo_save_many(c: Context) -> Run:
+    devices = c.dimmers()
+    return Run(lambda: c.device_repo.save_many(devices), c.ops)
+
+
+@case("HubRepository.get")
+def hub_repo_get(c: Context) -> Run:
+    return Run(each(c.hub_repo.get, c.sample(c.hub_ids)), c.ops)
+
+
+@case("HubRepository.iter_devices")
+def hub_repo_iter_devices(c: Context) -> Run:
+    return Run(each(lambda hub: list(c.hub_repo.iter_devices(hub)), c.hubs()), c.ops)
+
+
+@case("HubRepository.page_devices")
+def hub_repo_page_devices(c: Context) -> Run:
+    return Run(each(c.hub_repo.page_devices, c.hubs()), c.ops)
+
+
+@case("HubRepository.save")
+def hub_repo_save(c: Context) -> Run:
+    return Run(each(c.hub_repo.save, c.hubs()), c.ops)
+
+
+@case("DwellingRepository.get")
+def dwelling_repo_get(c: Context) -> Run:
+    return Run(each(c.dwelling_repo.get, c.sample(c.dwelling_ids)), c.ops)
+
+
+@case("DwellingRepository.iter")
+def dwelling_repo_iter(c: Context) -> Run:
+    return Run(drain(c.dwelling_repo.iter), 1)
+
+
+@case("DwellingRepository.list")
+def dwelling_repo_list(c: Context) -> Run:
+    return Run(c.dwelling_repo.list, 1)
+
+
+@case("DwellingRepository.page")
+def dwelling_repo_page(c: Context) -> Run:
+    return Run(pages(c.dwelling_repo.page), 1)
+
+
+@case("DwellingRepository.save")
+def dwelling_repo_save(c: Context) -> Run:
+    dwellings = [c.store.dwellings[id_] for id_ in c.sample(c.dwelling_ids)]
+    return Run(each(c.dwelling_repo.save, dwellings), c.ops)
+
+
+@case("DeviceUsecases.create_device")
+def device_uc_create_device(c: Context) -> Run:
+    created = []
+    return Run(
+        each(
+            lambda _: created.append(c.device_uc.create_device(Dimmer, brightness=1)),
+            range(c.ops),
+        ),
+        c.ops,
+        c.remove(created),
+    )
+
+
+@case("DeviceUsecases.create_devices")
+def device_uc_create_devices(c: Context) -> Run:
+    created = []
+    specs = [(Dimmer, {"brightness": 1})] * c.ops
+    return Run(
+        lambda: created.extend(c.device_uc.create_devices(specs)),
+        c.ops,
+        c.remove(created),
+    )
+
+
+@case("DeviceUsecases.delete_device")
+def device_uc_delete_device(c: Context) -> Run:
+    ids = [device.id for device in c.unpaired()]
+    return Run(each(c.device_uc.delete_device, ids), c.ops)
+
+
+@case("DeviceUsecases.delete_devices")
+def device_uc_delete_devices(c: Context) -> Run:
+    ids = [device.id for device in c.unpaired()]
+    return Run(lambda: c.device_uc.delete_devices(ids), c.ops)
+
+
+@case("DeviceUsecases.show_device_info")
+def device_uc_show_device_info(c: Context) -> Run:
+    return Run(each(c.device_uc.show_device_info, c.sample(c.dimmer_ids)), c.ops)
+
+
+@case("DeviceUsecases.iter_devices")
+def device_uc_iter_devices(c: Context) -> Run:
+    return Run(drain(c.device_uc.iter_devices), 1)
+
+
+@case("DeviceUsecases.list_devices")
+def device_uc_list_devices(c: Context) -> Run:
+    return Run(c.device_uc.list_devices, 1)
+
+
+@case("DeviceUsecases.page_devices")
+def device_uc_page_devices(c: Context) -> Run:
+    return Run(pages(c.device_uc.page_devices), 1)
+
+
+@case("DeviceUsecases.update_device")
+def device_uc_update_device(c: Context) -> Run:
+    return Run(
+        each(
+            lambda id_: c.device_uc.update_device(id_, brightness=50),
+            c.sample(c.dimmer_ids),
+        ),
+        c.ops,
+    )
+
+
+@case("DeviceUsecases.update_devices")
+def device_uc_update_devices(c: Context) -> Run:
+    updates = {id_: {"brightness": 50} for id_ in c.sample(c.dimmer_ids)}
+    return Run(lambda: c.device_uc.update_devices(updates), len(updates))
+
+
+@case("HubUsecases.iter_hub_devices")
+def hub_uc_iter_hub_devices(c: Context) -> Run:
+    return Run(
+        each(lambda id_: list(c.hub_uc.iter_hub_devices(id_)), c.sample(c.hub_ids)),
+        c.ops,
+    )
+
+
+@case("HubUsecases.list_hub_devices")
+def hub_uc_list_hub_devices(c: Context) -> Run:
+    return Run(each(c.hub_uc.list_hub_devices, c.sample(c.hub_ids)), c.ops)
+
+
+@case("HubUsecases.page_hub_devices")
+def hub_uc_page_hub_devices(c: Context) -> Run:
+    return Run(each(c.hub_uc.page_hub_devices, c.sample(c.hub_ids)), c.ops)
+
+
+@case("HubUsecases.pair_device")
+def hub_uc_pair_device(c: Context) -> Run:
+    devices = c.unpaired()
+    pairs = list(zip(c.sample(c.hub_ids), [device.id for device in devices]))
+    return Run(
+        each(lambda pair: c.hub_uc.pair_device(*pair), pairs),
+        c.ops,
+        c.remove(devices),
+    )
+
+
+@case("HubUsecases.unpair_device")
+def hub_uc_unpair_device(c: Context) -> Run:
+    devices = c.paired()
+    pairs = [(device.hub.id, device.id) for device in devices]
+    return Run(
+        each(lambda pair: c.hub_uc.unpair_device(*pair), pairs),
+        c.ops,
+        c.remove(devices),
+    )
+
+
+@case("DwellingUsecases.install_hub")
+def dwelling_uc_install_hub(c: Context) -> Run:
+    # hubs cannot be removed, so each repeat adds empty ones
+    hub_ids = [f"bench-hub-{c.rng.getrandbits(64):x}" for _ in range(c.ops)]
+    for id_ in hub_ids:
+        c.hub_repo.save(Hub(id=id_))
+    pairs = list(zip(c.sample(c.dwelling_ids), hub_ids))
+    return Run(each(lambda pair: c.dwelling_uc.install_hub(*pair), pairs), c.ops)
+
+
+@case("DwellingUsecases.iter_dwellings")
+def dwelling_uc_iter_dwellings(c: Context) -> Run:
+    return Run(drain(c.dwelling_uc.iter_dwellings), 1)
+
+
+@case("DwellingUsecases.list_dwellings")
+def dwelling_uc_list_dwellings(c: Context) -> Run:
+    return Run(c.dwelling_uc.list_dwellings, 1)
+
+
+@case("DwellingUsecases.page_dwellings")
+def dwelling_uc_page_dwellings(c: Context) -> Run:
+    return Run(pages(c.dwelling_uc.page_dwellings), 1)
+
+
+@case("DwellingUsecases.occupy")
+def dwelling_uc_occupy(c: Context) -> Run:
+    return Run(each(c.dwelling_uc.occupy, c.sample(c.dwelling_ids)), c.ops)
+
+
+@case("DwellingUsecases.vacate")
+def dwelling_uc_vacate(c: Context) -> Run:
+    return Run(each(c.dwelling_uc.vacate, c.sample(c.dwelling_ids)), c.ops)
+
+
+@case("DwellingUsecases.apply_to_devices")
+def dwelling_uc_apply_to_devices(c: Context) -> Run:
+    state = c.rng.choice(list(LockState))
+    return Run(
+        each(
+            lambda id_: c.dwelling_uc.apply_to_devices(id_, Lock, state=state),
+            c.sample(c.dwelling_ids),
+        ),
+        c.ops,
+    )
+
+
+@case("DwellingUsecases.apply_scene")
+def dwelling_uc_apply_scene(c: Context) -> Run:
+    ids = c.sample(c.dwelling_ids)
+    return Run(lambda: c.dwelling_uc.apply_scene(ids, SHUTDOWN), len(ids))
+
+
+def run_scale(
+    devices: int, ops: int, repeat: int, only: Optional[str] = None
+) -> Sequence[Measurement]:
+    spec = FleetSpec.of_size(devices)
+    tracemalloc.start()
+    start = time.perf_counter()
+    store = generate(spec)
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results = [
+        Measurement(
+            case="fleet.generate",
+            devices=spec.devices,
+            ops=spec.devices,
+            repeat=1,
+            min_s=elapsed,
+            median_s=elapsed,
+            mean_s=elapsed,
+            per_op_us=elapsed / spec.devices * 1e6,
+            peak_bytes=size,
+        )
+    ]
+    print(_format(results[-1]), flush=True)
+
+    ctx = Context.of(store, ops)
+    for name, prepare in CASES.items():
+        if only is not None and only not in name:
+            continue
+        results.append(measure(name, spec.devices, lambda: prepare(ctx), repeat))
+        print(_format(results[-1]), flush=True)
+    return results
+
+
+def _format(m: Measurement) -> str:
+    return (
+        f"{m.devices:>9,} {m.case:<36} {m.min_s * 1000:10.2f} ms "
+        f"{m.per_op_us:10.2f} us/op {m.peak_bytes / 2**20:9.2f} MiB"
+    )
+
+
+def compare(results: Sequence[Measurement], path: str):
+    with open(path) as file:
+        baseline = {
+            (r["case"], r["devices"]): r["min_s"] for r in json.load(file)["results"]
+        }
+    for m in results:
+        before = baseline.get((m.case, m.devices))
+        if before:
+            print(f"{m.devices:>9,} {m.case:<36} {m.min_s / before:6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Repository and usecase benchmarks")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--ops", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", help="run the cases whose name contains this")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against an earlier JSON output")
+    args = parser.parse_args()
+
+    results = []
+    for devices in args.scales:
+        results.extend(run_scale(devices, args.ops, args.repeat, args.only))
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(
+                {
+                    "meta": {
+                        "date": datetime.datetime.now().isoformat(),
+                        "python": platform.python_version(),
+                        "platform": platform.platform(),
+                        "args": vars(args),
+                    },
+                    "results": [m.to_json() for m in results],
+                },
+                file,
+                indent=2,
+            )
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import threading
+from collections import Counter
+from dataclasses import dataclass, field, fields
+from typing import Dict, Mapping, Optional, Sequence, Tuple
+
+from idt.domains import DwellingState, TypeDevice
+from idt.repositories import POP_DEVICE, PUT_DEVICE, PUT_DWELLING, PUT_HUB, Store
+
+# device type, hub id, dwelling id
+Placement = Tuple[type, Optional[str], Optional[str]]
+
+
+@dataclass(frozen=True)
+class FleetStats:
+    dwellings: int
+    occupied: int
+    vacant: int
+    hubs: int
+    unpaired_hubs: int
+    devices: int
+    unpaired_devices: int
+    devices_by_type: Mapping[type, int]
+
+
+@dataclass
+class _Counts:
+    occupied: int = 0
+    unpaired_hubs: int = 0
+    unpaired_devices: int = 0
+    by_type: Counter = field(default_factory=Counter)
+    by_hub: Counter = field(default_factory=Counter)
+    by_dwelling: Counter = field(default_factory=Counter)
+    devices: Dict[str, Placement] = field(default_factory=dict)
+    hubs: Dict[str, Optional[str]] = field(default_factory=dict)
+    dwellings: Dict[str, DwellingState] = field(default_factory=dict)
+
+
+@dataclass
+class FleetAggregates:
+    store: Store
+    _counts: _Counts = field(init=False, repr=False)
+    _lock: threading.RLock = field(
+        init=False, repr=False, default_factory=threading.RLock
+    )
+
+    def __post_init__(self):
+        self.store.subscribe(self._on_change)
+        self.rebuild()
+
+    def close(self):
+        self.store.unsubscribe(self._on_change)
+
+    def stats(self) -> FleetStats:
+        with self._lock:
+            counts = self._counts
+            return FleetStats(
+                dwellings=len(counts.dwellings),
+                occupied=counts.occupied,
+                vacant=len(counts.dwellings) - counts.occupied,
+                hubs=len(counts.hubs),
+                unpaired_hubs=counts.unpaired_hubs,
+                devices=len(counts.devices),
+                unpaired_devices=counts.unpaired_devices,
+                devices_by_type={
+                    cls: count for cls, count in counts.by_type.items() if count
+                },
+            )
+
+    def devices_in_dwelling(self, id_: str) -> int:
+        return self._counts.by_dwelling[id_]
+
+    def devices_on_hub(self, id_: str) -> int:
+        return self._counts.by_hub[id_]
+
+    def rebuild(self):
+        with self._lock:
+            self._counts = _count(self.store)
+
+    def check(self) -> Sequence[str]:
+        # recounts from scratch; anything listed means the incremental
+        # counts drifted from the store
+        with self._lock:
+            expected = _count(self.store)
+            problems = []
+            for f in fields(_Counts):
+                want, got = getattr(expected, f.name), getattr(self._counts, f.name)
+                if not isinstance(want, dict):
+                    if want != got:
+                        problems.append(f"{f.name}: expected={want} actual={got}")
+                    continue
+                for key in [*want, *(key for key in got if key not in want)]:
+                    # counters keep keys that dropped to zero
+                    default = 0 if isinstance(want, Counter) else None
+                    if want.get(key, default) != got.get(key, default):
+                        problems.append(
+                            f"{f.name}[{key!r}]: expected={want.get(key, default)} "
+                            f"actual={got.get(key, default)}"
+                        )
+            return problems
+
+    def _on_change(self, event: str, id_: str):
+        with self._lock:
+            counts = self._counts
+            if event == PUT_DEVICE:
+                _put_device(counts, self.store.devices[id_])
+            elif event == POP_DEVICE:
+                placement = counts.devices.pop(id_, None)
+                if placement is not None:
+                    _unplace(counts, placement)
+            elif event == PUT_HUB:
+                hub = self.store.hubs[id_]
+                dwelling_id = hub.dwelling.id if hub.dwelling is not None else None
+                if id_ not in counts.hubs:
+                    counts.unpaired_hubs += dwelling_id is None
+                elif counts.hubs[id_] != dwelling_id:
+                    counts.unpaired_hubs += (dwelling_id is None) - (
+                        counts.hubs[id_] is None
+                    )
+                    # the hub's devices moved with it
+                    for device in hub.devices.values():
+                        if device.id in counts.devices:
+                            _put_device(counts, device)
+                counts.hubs[id_] = dwelling_id
+            elif event == PUT_DWELLING:
+                state = self.store.dwellings[id_].state
+                previous = counts.dwellings.get(id_)
+                counts.occupied += (state == DwellingState.OCCUPIED) - (
+                    previous == DwellingState.OCCUPIED
+                )
+                counts.dwellings[id_] = state
+
+
+def _placement(device: TypeDevice) -> Placement:
+    hub = device.hub
+    if hub is None:
+        return (type(device), None, None)
+    dwelling = hub.dwelling
+    return (type(device), hub.id, dwelling.id if dwelling is not None else None)
+
+
+def _put_device(counts: _Counts, device: TypeDevice):
+    placement = _placement(device)
+    previous = counts.devices.get(device.id)
+    if previous == placement:
+        return
+    if previous is not None:
+        _unplace(counts, previous)
+    counts.devices[device.id] = placement
+    cls, hub_id, dwelling_id = placement
+    counts.by_type[cls] += 1
+    if hub_id is None:
+        counts.unpaired_devices += 1
+    else:
+        counts.by_hub[hub_id] += 1
+    if dwelling_id is not None:
+        counts.by_dwelling[dwelling_id] += 1
+
+
+def _unplace(counts: _Counts, placement: Placement):
+    cls, hub_id, dwelling_id = placement
+    counts.by_type[cls] -= 1
+    if hub_id is None:
+        counts.unpaired_devices -= 1
+    else:
+        counts.by_hub[hub_id] -= 1
+    if dwelling_id is not None:
+        counts.by_dwelling[dwelling_id] -= 1
+
+
+def _count(store: Store) -> _Counts:
+    counts = _Counts()
+    for id_, dwelling in list(store.dwellings.items()):
+        counts.dwellings[id_] = dwelling.state
+        counts.occupied += dwelling.state == DwellingState.OCCUPIED
+    for id_, hub in list(store.hubs.items()):
+        counts.hubs[id_] = hub.dwelling.id if hub.dwelling is not None else None
+        counts.unpaired_hubs += hub.dwelling is None
+    for device in list(store.devices.values()):
+        _put_device(counts, device)
+    return counts
@@ -0,0 +1,332 @@
+import asyncio
+from dataclasses import dataclass, field
+from functools import partial
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Mapping,
+    Optional,
+    Protocol,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+from idt.domains import Dwelling, Hub, TypeDevice
+from idt.repositories import DeviceRepository, DwellingRepository, HubRepository, Page
+from idt.serialization import device_info
+from idt.usecases import DeviceUsecases, DwellingUsecases, HubUsecases
+
+T = TypeVar("T")
+
+
+class AsyncDeviceRepository(Protocol):
+    # writes run as the sync usecases against this, in one run call, so they
+    # hold the same locks and transactions however they are awaited
+    repo: DeviceRepository
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T: ...
+
+    async def create(self, device: TypeDevice) -> TypeDevice: ...
+
+    async def create_many(
+        self, devices: Sequence[TypeDevice]
+    ) -> Sequence[TypeDevice]: ...
+
+    async def delete(self, device: TypeDevice): ...
+
+    async def delete_many(self, devices: Sequence[TypeDevice]): ...
+
+    async def find(
+        self, device_cls: Optional[type[TypeDevice]] = None, **filters
+    ) -> Sequence[TypeDevice]: ...
+
+    async def get(self, id_: str) -> TypeDevice: ...
+
+    def iter(self) -> AsyncIterator[TypeDevice]: ...
+
+    async def list(self) -> Sequence[TypeDevice]: ...
+
+    async def page(
+        self, after: Optional[int] = None, limit: int = 500
+    ) -> Page[TypeDevice]: ...
+
+    async def save(self, device: TypeDevice): ...
+
+    async def save_many(self, devices: Iterable[TypeDevice]): ...
+
+
+class AsyncHubRepository(Protocol):
+    repo: HubRepository
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T: ...
+
+    async def get(self, id_: str) -> Hub: ...
+
+    def iter_devices(self, hub: Hub) -> AsyncIterator[TypeDevice]: ...
+
+    async def page_devices(
+        self, hub: Hub, after: Optional[int] = None, limit: int = 500
+    ) -> Page[TypeDevice]: ...
+
+    async def save(self, hub: Hub): ...
+
+
+class AsyncDwellingRepository(Protocol):
+    repo: DwellingRepository
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T: ...
+
+    async def get(self, id_: str) -> Dwelling: ...
+
+    def iter(self) -> AsyncIterator[Dwelling]: ...
+
+    async def list(self) -> Sequence[Dwelling]: ...
+
+    async def page(
+        self, after: Optional[int] = None, limit: int = 500
+    ) -> Page[Dwelling]: ...
+
+    async def save(self, dwelling: Dwelling): ...
+
+
+async def gather_bounded(
+    calls: Iterable[Callable[[], Awaitable[T]]], concurrency: int
+) -> Sequence[T]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(call: Callable[[], Awaitable[T]]) -> T:
+        async with semaphore:
+            return await call()
+
+    return await asyncio.gather(*(run(call) for call in calls))
+
+
+class _Adapter:
+    # with offload=False calls run inline, so an in-memory Store costs no more
+    # than the sync repositories; offload=True moves blocking backends to threads
+    offload: bool
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        if self.offload:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+        return fn(*args, **kwargs)
+
+    async def _iter(self, iterator) -> AsyncIterator:
+        sentinel = object()
+        while True:
+            item = await self.run(next, iterator, sentinel)
+            if item is sentinel:
+                return
+            yield item
+
+
+@dataclass
+class DeviceRepositoryAdapter(_Adapter):
+    repo: DeviceRepository
+    offload: bool = False
+
+    async def create(self, device: TypeDevice) -> TypeDevice:
+        return await self.run(self.repo.create, device)
+
+    async def create_many(self, devices: Sequence[TypeDevice]) -> Sequence[TypeDevice]:
+        return await self.run(self.repo.create_many, devices)
+
+    async def delete(self, device: TypeDevice):
+        await self.run(self.repo.delete, device)
+
+    async def delete_many(self, devices: Sequence[TypeDevice]):
+        await self.run(self.repo.delete_many, devices)
+
+    async def find(
+        self, device_cls: Optional[type[TypeDevice]] = None, **filters
+    ) -> Sequence[TypeDevice]:
+        return await self.run(self.repo.find, device_cls, **filters)
+
+    async def get(self, id_: str) -> TypeDevice:
+        return await self.run(self.repo.get, id_)
+
+    def iter(self) -> AsyncIterator[TypeDevice]:
+        return self._iter(self.repo.iter())
+
+    async def list(self) -> Sequence[TypeDevice]:
+        return await self.run(self.repo.list)
+
+    async def page(
+        self, after: Optional[int] = None, limit: int = 500
+    ) -> Page[TypeDevice]:
+        return await self.run(self.repo.page, after, limit)
+
+    async def save(self, device: TypeDevice):
+        await self.run(self.repo.save, device)
+
+    async def save_many(self, devices: Iterable[TypeDevice]):
+        await self.run(self.repo.save_many, devices)
+
+
+@dataclass
+class HubRepositoryAdapter(_Adapter):
+    repo: HubRepository
+    offload: bool = False
+
+    async def get(self, id_: str) -> Hub:
+        return await self.run(self.repo.get, id_)
+
+    def iter_devices(self, hub: Hub) -> AsyncIterator[TypeDevice]:
+        return self._iter(self.repo.iter_devices(hub))
+
+    async def page_devices(
+        self, hub: Hub, after: Optional[int] = None, limit: int = 500
+    ) -> Page[TypeDevice]:
+        return await self.run(self.repo.page_devices, hub, after, limit)
+
+    async def save(self, hub: Hub):
+        await self.run(self.repo.save, hub)
+
+
+@dataclass
+class DwellingRepositoryAdapter(_Adapter):
+    repo: DwellingRepository
+    offload: bool = False
+
+    async def get(self, id_: str) -> Dwelling:
+        return await self.run(self.repo.get, id_)
+
+    def iter(self) -> AsyncIterator[Dwelling]:
+        return self._iter(self.repo.iter())
+
+    async def list(self) -> Sequence[Dwelling]:
+        return await self.run(self.repo.list)
+
+    async def page(
+        self, after: Optional[int] = None, limit: int = 500
+    ) -> Page[Dwelling]:
+        return await self.run(self.repo.page, after, limit)
+
+    async def save(self, dwelling: Dwelling):
+        await self.run(self.repo.save, dwelling)
+
+
+@dataclass
+class AsyncDeviceUsecases:
+    repo: AsyncDeviceRepository
+    concurrency: int = 64
+    _usecases: DeviceUsecases = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._usecases = DeviceUsecases(self.repo.repo)
+
+    async def create_device(self, device_cls: type[TypeDevice], **attrs) -> TypeDevice:
+        return await self.repo.run(self._usecases.create_device, device_cls, **attrs)
+
+    async def create_devices(
+        self, specs: Iterable[Tuple[type[TypeDevice], Mapping]]
+    ) -> Sequence[TypeDevice]:
+        return await self.repo.run(self._usecases.create_devices, list(specs))
+
+    async def delete_device(self, id_: str):
+        await self.repo.run(self._usecases.delete_device, id_)
+
+    async def delete_devices(self, ids: Iterable[str]):
+        await self.repo.run(self._usecases.delete_devices, list(ids))
+
+    async def get_devices(self, ids: Iterable[str]) -> Sequence[TypeDevice]:
+        return await gather_bounded(
+            (partial(self.repo.get, id_) for id_ in ids), self.concurrency
+        )
+
+    async def show_device_info(self, id_: str) -> str:
+        return device_info(await self.repo.get(id_))
+
+    def iter_devices(self) -> AsyncIterator[TypeDevice]:
+        return self.repo.iter()
+
+    async def list_devices(self) -> Sequence[TypeDevice]:
+        return await self.repo.list()
+
+    async def page_devices(
+        self, after: Optional[int] = None, limit: int = 500
+    ) -> Page[TypeDevice]:
+        return await self.repo.page(after, limit)
+
+    async def update_device(self, id_: str, **attrs):
+        await self.repo.run(self._usecases.update_device, id_, **attrs)
+
+    async def update_devices(self, updates: Mapping[str, Mapping]):
+        await self.repo.run(self._usecases.update_devices, dict(updates))
+
+
+@dataclass
+class AsyncHubUsecases:
+    repo: AsyncHubRepository
+    device_repo: AsyncDeviceRepository
+    concurrency: int = 64
+    _usecases: HubUsecases = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._usecases = HubUsecases(self.repo.repo, self.device_repo.repo)
+
+    async def iter_hub_devices(self, id_: str) -> AsyncIterator[TypeDevice]:
+        async for device in self.repo.iter_devices(await self.repo.get(id_)):
+            yield device
+
+    async def list_hub_devices(self, id_: str) -> Sequence[TypeDevice]:
+        hub = await self.repo.get(id_)
+        return list(hub.devices.values())
+
+    async def page_hub_devices(
+        self, id_: str, after: Optional[int] = None, limit: int = 500
+    ) -> Page[TypeDevice]:
+        return await self.repo.page_devices(await self.repo.get(id_), after, limit)
+
+    async def pair_device(self, id_: str, device_id: str):
+        await self.repo.run(self._usecases.pair_device, id_, device_id)
+
+    async def pair_devices(
+        self, id_: str, device_ids: Iterable[str], move: bool = False
+    ):
+        await self.repo.run(self._usecases.pair_devices, id_, list(device_ids), move)
+
+    async def unpair_device(self, id_: str, device_id: str):
+        await self.repo.run(self._usecases.unpair_device, id_, device_id)
+
+    async def unpair_devices(self, id_: str, device_ids: Iterable[str]):
+        await self.repo.run(self._usecases.unpair_devices, id_, list(device_ids))
+
+
+@dataclass
+class AsyncDwellingUsecases:
+    repo: AsyncDwellingRepository
+    hub_repo: AsyncHubRepository
+    concurrency: int = 64
+    _usecases: DwellingUsecases = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._usecases = DwellingUsecases(self.repo.repo, self.hub_repo.repo)
+
+    async def get_dwellings(self, ids: Iterable[str]) -> Sequence[Dwelling]:
+        return await gather_bounded(
+            (partial(self.repo.get, id_) for id_ in ids), self.concurrency
+        )
+
+    async def install_hub(self, id_: str, hub_id: str):
+        await self.repo.run(self._usecases.install_hub, id_, hub_id)
+
+    def iter_dwellings(self) -> AsyncIterator[Dwelling]:
+        return self.repo.iter()
+
+    async def list_dwellings(self) -> Sequence[Dwelling]:
+        return await self.repo.list()
+
+    async def page_dwellings(
+        self, after: Optional[int] = None, limit: int = 500
+    ) -> Page[Dwelling]:
+        return await self.repo.page(after, limit)
+
+    async def occupy(self, id_: str):
+        await self.repo.run(self._usecases.occupy, id_)
+
+    async def vacate(self, id_: str):
+        await self.repo.run(self._usecases.vacate, id_)
@@ -0,0 +1,251 @@
+import math
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from idt.domains import (
+    Dimmer,
+    Dwelling,
+    DwellingState,
+    Hub,
+    Switch,
+    SwitchState,
+    Thermostat,
+    TypeDevice,
+)
+from idt.repositories import POP_DEVICE, PUT_DEVICE, PUT_DWELLING, PUT_HUB, Store
+
+NO_GROUP = -1
+
+# each analysed device type gets a table whose first column is the row of its
+# hub in the hub table, followed by the values extracted from the device
+KINDS: Sequence[Tuple[type[TypeDevice], Mapping[str, type], Callable]] = [
+    (
+        Thermostat,
+        {"target": np.float64, "actual": np.float64},
+        lambda d: (d.target_temp_f, d.actual_temp_f),
+    ),
+    (Dimmer, {"brightness": np.int64}, lambda d: (d.brightness,)),
+    (Switch, {"on": np.bool_}, lambda d: (d.state == SwitchState.ON,)),
+]
+
+
+@dataclass
+class _Table:
+    dtypes: Mapping[str, type]
+    ids: List[str] = field(default_factory=list)
+    rows: Dict[str, int] = field(default_factory=dict)
+    columns: Dict[str, np.ndarray] = field(init=False)
+
+    def __post_init__(self):
+        self.columns = {
+            name: np.empty(16, dtype) for name, dtype in self.dtypes.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def column(self, name: str) -> np.ndarray:
+        return self.columns[name][: len(self.ids)]
+
+    def put(self, id_: str, values: Sequence) -> int:
+        row = self.rows.get(id_)
+        if row is None:
+            row = self.rows[id_] = len(self.ids)
+            self.ids.append(id_)
+            self._reserve(len(self.ids))
+        for column, value in zip(self.columns.values(), values):
+            column[row] = value
+        return row
+
+    def extend(self, ids: Sequence[str], rows: Sequence[Sequence]):
+        start = len(self.ids)
+        for id_ in ids:
+            self.rows[id_] = len(self.ids)
+            self.ids.append(id_)
+        self._reserve(len(self.ids))
+        for i, column in enumerate(self.columns.values()):
+            column[start : len(self.ids)] = [row[i] for row in rows]
+
+    def discard(self, id_: str):
+        # the last row moves into the hole so the columns stay dense
+        row = self.rows.pop(id_, None)
+        if row is None:
+            return
+        last = len(self.ids) - 1
+        if row != last:
+            moved = self.ids[last]
+            self.ids[row] = moved
+            self.rows[moved] = row
+            for column in self.columns.values():
+                column[row] = column[last]
+        self.ids.pop()
+
+    def clear(self):
+        self.ids.clear()
+        self.rows.clear()
+
+    def _reserve(self, size: int):
+        capacity = len(next(iter(self.columns.values())))
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        for name, column in self.columns.items():
+            grown = np.empty(capacity, column.dtype)
+            grown[: len(column)] = column
+            self.columns[name] = grown
+
+
+@dataclass
+class FleetAnalytics:
+    store: Store
+    _devices: Mapping[type, _Table] = field(init=False, repr=False)
+    _hubs: _Table = field(init=False, repr=False)
+    _dwellings: _Table = field(init=False, repr=False)
+    _pending: Tuple[Set[str], Set[str], Set[str]] = field(init=False, repr=False)
+    _pending_lock: threading.Lock = field(init=False, repr=False)
+    _refresh_lock: threading.Lock = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._devices = {
+            cls: _Table({"hub": np.int64, **dtypes}) for cls, dtypes, _ in KINDS
+        }
+        self._hubs = _Table({"dwelling": np.int64})
+        self._dwellings = _Table({"occupied": np.bool_})
+        self._pending = (set(), set(), set())
+        self._pending_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.store.subscribe(self._on_change)
+        self.rebuild()
+
+    def close(self):
+        self.store.unsubscribe(self._on_change)
+
+    def rebuild(self):
+        with self._refresh_lock:
+            with self._pending_lock:
+                self._pending = (set(), set(), set())
+            for table in (self._dwellings, self._hubs, *self._devices.values()):
+                table.clear()
+
+            for dwelling in list(self.store.dwellings.values()):
+                self._put_dwelling(dwelling)
+            for hub in list(self.store.hubs.values()):
+                self._put_hub(hub)
+            extracted = {cls: ([], []) for cls in self._devices}
+            for device in list(self.store.devices.values()):
+                kind = _kind(device)
+                if kind is not None:
+                    cls, extract = kind
+                    ids, rows = extracted[cls]
+                    ids.append(device.id)
+                    rows.append((self._hub_row(device.hub), *extract(device)))
+            for cls, (ids, rows) in extracted.items():
+                self._devices[cls].extend(ids, rows)
+
+    def refresh(self):
+        with self._refresh_lock:
+            with self._pending_lock:
+                dwellings, hubs, devices = self._pending
+                self._pending = (set(), set(), set())
+            for id_ in dwellings:
+                self._put_dwelling(self.store.dwellings[id_])
+            for id_ in hubs:
+                self._put_hub(self.store.hubs[id_])
+            for id_ in devices:
+                device = self.store.devices.get(id_)
+                kind = _kind(device) if device is not None else None
+                for cls, table in self._devices.items():
+                    if kind is None or kind[0] is not cls:
+                        table.discard(id_)
+                if kind is not None:
+                    cls, extract = kind
+                    self._devices[cls].put(
+                        id_, (self._hub_row(device.hub), *extract(device))
+                    )
+
+    def temperature_deltas(self) -> np.ndarray:
+        self.refresh()
+        table = self._devices[Thermostat]
+        return table.column("target") - table.column("actual")
+
+    def temperature_delta_histogram(
+        self, bins: int = 10
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        return np.histogram(self.temperature_deltas(), bins=bins)
+
+    def mean_brightness_by_hub(self) -> Mapping[str, float]:
+        self.refresh()
+        table = self._devices[Dimmer]
+        return _group_mean(
+            table.column("hub"), table.column("brightness"), self._hubs.ids
+        )
+
+    def mean_brightness_by_dwelling(self) -> Mapping[str, float]:
+        self.refresh()
+        table = self._devices[Dimmer]
+        return _group_mean(
+            self._dwelling_rows(table.column("hub")),
+            table.column("brightness"),
+            self._dwellings.ids,
+        )
+
+    def occupied_switch_on_share(self) -> float:
+        self.refresh()
+        table = self._devices[Switch]
+        # a trailing False lets NO_GROUP index straight into the lookup
+        occupied = np.append(self._dwellings.column("occupied"), False)
+        on = table.column("on")[occupied[self._dwelling_rows(table.column("hub"))]]
+        return float(on.mean()) if len(on) else math.nan
+
+    def _dwelling_rows(self, hub_rows: np.ndarray) -> np.ndarray:
+        return np.append(self._hubs.column("dwelling"), NO_GROUP)[hub_rows]
+
+    def _on_change(self, event: str, id_: str):
+        with self._pending_lock:
+            dwellings, hubs, devices = self._pending
+            if event == PUT_DWELLING:
+                dwellings.add(id_)
+            elif event == PUT_HUB:
+                hubs.add(id_)
+            elif event in (PUT_DEVICE, POP_DEVICE):
+                devices.add(id_)
+
+    def _put_dwelling(self, dwelling: Dwelling) -> int:
+        return self._dwellings.put(
+            dwelling.id, (dwelling.state == DwellingState.OCCUPIED,)
+        )
+
+    def _put_hub(self, hub: Hub) -> int:
+        return self._hubs.put(hub.id, (self._dwelling_row(hub.dwelling),))
+
+    def _dwelling_row(self, dwelling: Optional[Dwelling]) -> int:
+        if dwelling is None:
+            return NO_GROUP
+        row = self._dwellings.rows.get(dwelling.id)
+        return row if row is not None else self._put_dwelling(dwelling)
+
+    def _hub_row(self, hub: Optional[Hub]) -> int:
+        if hub is None:
+            return NO_GROUP
+        row = self._hubs.rows.get(hub.id)
+        return row if row is not None else self._put_hub(hub)
+
+
+def _kind(device: TypeDevice) -> Optional[Tuple[type, Callable]]:
+    for cls, _, extract in KINDS:
+        if isinstance(device, cls):
+            return cls, extract
+    return None
+
+
+def _group_mean(
+    groups: np.ndarray, values: np.ndarray, ids: Sequence[str]
+) -> Mapping[str, float]:
+    grouped = groups >= 0
+    sums = np.bincount(groups[grouped], weights=values[grouped], minlength=len(ids))
+    counts = np.bincount(groups[grouped], minlength=len(ids))
+    return {ids[i]: float(sums[i] / counts[i]) for i in np.flatnonzero(counts)}
@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, ClassVar, Generic, Hashable, Optional, Tuple, TypeVar
+
+from idt.domains import Dwelling, Hub, TypeDevice
+from idt.repositories import (
+    POP_DEVICE,
+    PUT_DEVICE,
+    PUT_DWELLING,
+    PUT_HUB,
+    DeviceRepository,
+    DwellingRepository,
+    HubRepository,
+)
+
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+@dataclass
+class LRUCache(Generic[V]):
+    maxsize: int = 1024
+    # optional bounds on top of maxsize, by what sizeof reports and by age;
+    # there is no default sizeof, since sys.getsizeof only counts the outer
+    # object and would let a cache of entities grow far past maxbytes
+    maxbytes: Optional[int] = None
+    ttl: Optional[float] = None
+    sizeof: Optional[Callable[[V], int]] = None
+    clock: Callable[[], float] = time.monotonic
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    bytes: int = 0
+    # key -> (value, expires at, size)
+    _entries: OrderedDict = field(init=False, repr=False, default_factory=OrderedDict)
+    _lock: threading.Lock = field(
+        init=False, repr=False, default_factory=threading.Lock
+    )
+
+    def __post_init__(self):
+        if self.maxbytes is not None and self.sizeof is None:
+            raise ValueError(f"No sizeof for maxbytes: maxbytes={self.maxbytes}")
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Optional[V] = None) -> Optional[V]:
+        with self._lock:
+            try:
+                value, expires, size = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires is not None and expires <= self.clock():
+                del self._entries[key]
+                self.bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: V):
+        expires = None if self.ttl is None else self.clock() + self.ttl
+        size = 0 if self.maxbytes is None else self.sizeof(value)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[2]
+            self._entries[key] = (value, expires, size)
+            self.bytes += size
+            while len(self._entries) > self.maxsize or (
+                self.maxbytes is not None and self.bytes > self.maxbytes
+            ):
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def discard(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.bytes -= entry[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+
+@dataclass
+class _ReadThrough(Generic[V]):
+    cache: LRUCache[V] = field(default_factory=LRUCache)
+    # store events that make a cached entry stale
+    events: ClassVar[Tuple[str, ...]] = ()
+    _invalidations: int = field(init=False, repr=False, default=0)
+
+    def __post_init__(self):
+        self.store.subscribe(self._invalidate)
+
+    def close(self):
+        self.store.unsubscribe(self._invalidate)
+
+    def get(self, id_: str) -> V:
+        value = self.cache.get(id_, _MISSING)
+        if value is not _MISSING:
+            return value
+        # a write landing while we load may already be in what we loaded, or
+        # not, so only cache what was loaded without one
+        invalidations = self._invalidations
+        value = super().get(id_)
+        # store events carry the stored id, so only that key is ever cached;
+        # another spelling of it misses and is resolved by the store again
+        if invalidations == self._invalidations:
+            self.cache.put(value.id, value)
+        return value
+
+    def _invalidate(self, event: str, id_: str):
+        if event in self.events:
+            self._invalidations += 1
+            self.cache.discard(id_)
+
+
+@dataclass
+class CachingDeviceRepository(_ReadThrough[TypeDevice], DeviceRepository):
+    events: ClassVar[Tuple[str, ...]] = (PUT_DEVICE, POP_DEVICE)
+
+
+@dataclass
+class CachingHubRepository(_ReadThrough[Hub], HubRepository):
+    events: ClassVar[Tuple[str, ...]] = (PUT_HUB,)
+
+
+@dataclass
+class CachingDwellingRepository(_ReadThrough[Dwelling], DwellingRepository):
+    events: ClassVar[Tuple[str, ...]] = (PUT_DWELLING,)
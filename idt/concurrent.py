@@ -0,0 +1,96 @@
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Iterable, Iterator, Optional, Sequence, Set, Tuple
+
+from idt.domains import Dwelling, Hub, TypeDevice
+from idt.indexes import DeviceIndex, InsertionOrder
+from idt.repositories import Store
+
+
+@dataclass
+class LockStripes:
+    count: int = 64
+    locks: Sequence[threading.RLock] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.locks = [threading.RLock() for _ in range(self.count)]
+
+    @contextmanager
+    def locked(self, *ids: str) -> Iterator[None]:
+        # stripes are always taken in ascending order, so callers locking
+        # overlapping ids (a hub and a device, a dwelling and a hub) can't deadlock
+        stripes = sorted({hash(id_) % self.count for id_ in ids})
+        locks = [self.locks[i] for i in stripes]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+
+@dataclass
+class _LockedIndex(DeviceIndex):
+    lock: Optional[threading.RLock] = field(default=None, repr=False, compare=False)
+
+    def find(self, *args, **kwargs) -> Set[str]:
+        with self.lock:
+            return super().find(*args, **kwargs)
+
+
+@dataclass
+class _LockedOrder(InsertionOrder):
+    lock: Optional[threading.RLock] = field(default=None, repr=False, compare=False)
+    chunk: int = field(default=256, repr=False, compare=False)
+
+    def after(self, cursor: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+        # walk in short chunks so a long iteration never holds the lock
+        while True:
+            with self.lock:
+                entries = list(islice(super().after(cursor), self.chunk))
+            if not entries:
+                return
+            yield from entries
+            cursor = entries[-1][0]
+
+    def after_of(self, keys: Iterable[str], *args, **kwargs):
+        with self.lock:
+            return iter(list(super().after_of(list(keys), *args, **kwargs)))
+
+
+@dataclass(kw_only=True)
+class ConcurrentStore(Store):
+    stripes: LockStripes = field(default_factory=LockStripes)
+    _structure: threading.RLock = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._structure = threading.RLock()
+        self.index = _LockedIndex(lock=self._structure)
+        self.device_order = _LockedOrder(lock=self._structure)
+        self.dwelling_order = _LockedOrder(lock=self._structure)
+        super().__post_init__()
+
+    def locked(self, *ids: str) -> Iterator[None]:
+        return self.stripes.locked(*ids)
+
+    # single dict assignments are atomic, so list reads copy the dicts without
+    # locking; the indexes span several containers and are only touched under
+    # one short leaf lock, taken after any stripes
+    def put_device(self, device: TypeDevice):
+        with self._structure:
+            super().put_device(device)
+
+    def pop_device(self, id_: str) -> TypeDevice:
+        with self._structure:
+            return super().pop_device(id_)
+
+    def put_hub(self, hub: Hub):
+        with self._structure:
+            super().put_hub(hub)
+
+    def put_dwelling(self, dwelling: Dwelling):
+        with self._structure:
+            super().put_dwelling(dwelling)
@@ -5,7 +5,7 @@ from typing import Mapping, Optional, Sequence, TypeVar
 TypeDevice = TypeVar("TypeDevice", bound="Device")
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class Device:
     id: Optional[str] = None
     hub: Optional["Hub"] = None
@@ -16,12 +16,12 @@ class SwitchState(Enum):
     ON = auto()
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class Switch(Device):
     state: SwitchState = SwitchState.OFF
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class Dimmer(Device):
     brightness: int = 0  # TODO: validate this within range with a setter
 
@@ -31,35 +31,46 @@ class LockState(Enum):
     LOCKED = auto()
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class Lock(Device):
     state: LockState = LockState.UNLOCKED
     code: Sequence[str] = field(default_factory=list)
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class Thermostat(Device):
     target_temp_f: float  # TODO: validate this within range with a setter
     actual_temp_f: float  # TODO: validate this within range with a setter
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class Hub:
     id: Optional[str] = None
     devices: Mapping[str, TypeDevice] = field(default_factory=dict)
     dwelling: Optional["Dwelling"] = None
+    changes: Mapping[str, TypeDevice] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
 
     def __post_init__(self):
         for device in self.devices.values():
             device.hub = self
+        self.changes.update(self.devices)
 
     def pair_device(self, device: TypeDevice):
         self.devices[device.id] = device
         device.hub = self
+        self.changes[device.id] = device
 
     def unpair_device(self, device: TypeDevice):
         device.hub = None
         del self.devices[device.id]
+        self.changes[device.id] = device
+
+    def pop_changes(self) -> Sequence[TypeDevice]:
+        changes = list(self.changes.values())
+        self.changes.clear()
+        return changes
 
 
 class DwellingState(Enum):
@@ -67,16 +78,26 @@ class DwellingState(Enum):
     OCCUPIED = auto()
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class Dwelling:
     id: Optional[str] = None
     hubs: Mapping[str, Hub] = field(default_factory=dict)
     state: DwellingState = DwellingState.VACANT
+    changes: Mapping[str, Hub] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
 
     def __post_init__(self):
         for hub in self.hubs.values():
             hub.dwelling = self
+        self.changes.update(self.hubs)
 
     def install_hub(self, hub: Hub):
         self.hubs[hub.id] = hub
         hub.dwelling = self
+        self.changes[hub.id] = hub
+
+    def pop_changes(self) -> Sequence[Hub]:
+        changes = list(self.changes.values())
+        self.changes.clear()
+        return changes
@@ -0,0 +1,229 @@
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from enum import Enum, auto
+from typing import Collection, Dict, Optional, Sequence, Set, Union
+
+from idt.domains import Dwelling, Hub, TypeDevice
+from idt.indexes import InsertionOrder
+
+
+class Change(Enum):
+    CREATED = auto()
+    UPDATED = auto()
+    PAIRED = auto()
+    UNPAIRED = auto()
+    DELETED = auto()
+    HUB_INSTALLED = auto()
+    OCCUPIED = auto()
+    VACATED = auto()
+
+
+@dataclass(frozen=True, kw_only=True, slots=True)
+class DeviceEvent:
+    change: Change
+    device_id: str
+    device_type: type[TypeDevice]
+    hub_id: Optional[str] = None
+    dwelling_id: Optional[str] = None
+    seq: int = -1
+
+
+@dataclass(frozen=True, kw_only=True, slots=True)
+class DwellingEvent:
+    change: Change
+    dwelling_id: str
+    hub_id: Optional[str] = None
+    seq: int = -1
+
+
+Event = Union[DeviceEvent, DwellingEvent]
+
+
+class SubscriptionLagged(Exception):
+    pass
+
+
+def device_event(
+    change: Change, device: TypeDevice, hub: Optional[Hub] = None
+) -> DeviceEvent:
+    hub = hub if hub is not None else device.hub
+    return DeviceEvent(
+        change=change,
+        device_id=device.id,
+        device_type=type(device),
+        hub_id=hub.id if hub is not None else None,
+        dwelling_id=(
+            hub.dwelling.id if hub is not None and hub.dwelling is not None else None
+        ),
+    )
+
+
+def dwelling_event(
+    change: Change, dwelling: Dwelling, hub: Optional[Hub] = None
+) -> DwellingEvent:
+    return DwellingEvent(
+        change=change,
+        dwelling_id=dwelling.id,
+        hub_id=hub.id if hub is not None else None,
+    )
+
+
+@dataclass(eq=False)
+class Subscription:
+    feed: "ChangeFeed"
+    cursor: int
+    device_types: Optional[tuple] = None
+    dwelling_ids: Optional[Collection[str]] = None
+    lagged: bool = False
+
+    def read(self, limit: int = 100, timeout: Optional[float] = 0) -> Sequence[Event]:
+        return self.feed._read(self, limit, timeout)
+
+    def close(self):
+        self.feed._unsubscribe(self)
+
+    def matches(self, event: Event) -> bool:
+        if self.device_types is not None and not (
+            isinstance(event, DeviceEvent)
+            and issubclass(event.device_type, self.device_types)
+        ):
+            return False
+        if self.dwelling_ids is not None and event.dwelling_id not in self.dwelling_ids:
+            return False
+        return True
+
+
+@dataclass
+class ChangeFeed:
+    capacity: int = 10_000
+    # how long a publisher waits for slow subscribers before dropping them;
+    # None waits for as long as it takes. The usecases publish while holding
+    # their locks, so that keeps events in the order the writes landed, and
+    # any wait here stalls every writer on the same locks; the default drops
+    # a slow subscriber at once instead
+    timeout: Optional[float] = 0
+    _order: InsertionOrder = field(
+        init=False, repr=False, default_factory=InsertionOrder
+    )
+    _events: Dict[int, Event] = field(init=False, repr=False, default_factory=dict)
+    _updates: Dict[str, DeviceEvent] = field(
+        init=False, repr=False, default_factory=dict
+    )
+    _subscriptions: Set[Subscription] = field(
+        init=False, repr=False, default_factory=set
+    )
+    _trimmed: int = field(init=False, repr=False, default=-1)
+    _changed: threading.Condition = field(
+        init=False, repr=False, default_factory=threading.Condition
+    )
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    @property
+    def head(self) -> int:
+        return self._order.next_seq - 1
+
+    def publish(self, *events: Event):
+        with self._changed:
+            for event in events:
+                self._append(event)
+            self._changed.notify_all()
+
+    def subscribe(
+        self,
+        after: Optional[int] = None,
+        *,
+        device_types: Optional[Collection[type[TypeDevice]]] = None,
+        dwelling_ids: Optional[Collection[str]] = None,
+    ) -> Subscription:
+        with self._changed:
+            if after is None:
+                after = self.head
+            elif after < self._trimmed:
+                raise SubscriptionLagged(
+                    f"Events trimmed: after={after} trimmed={self._trimmed}"
+                )
+            subscription = Subscription(
+                self,
+                after,
+                tuple(device_types) if device_types is not None else None,
+                set(dwelling_ids) if dwelling_ids is not None else None,
+            )
+            self._subscriptions.add(subscription)
+            return subscription
+
+    def _append(self, event: Event):
+        # an update replaces the device's previous update if nothing else about
+        # the device happened in between; readers only ever need the latest
+        if isinstance(event, DeviceEvent):
+            previous = self._updates.pop(event.device_id, None)
+            if previous is not None and event.change == Change.UPDATED:
+                self._order.discard(previous.seq)
+                del self._events[previous.seq]
+
+        if len(self._events) >= self.capacity:
+            self._make_room()
+
+        event = replace(event, seq=self._order.next_seq)
+        self._order.add(event.seq)
+        self._events[event.seq] = event
+        if isinstance(event, DeviceEvent) and event.change == Change.UPDATED:
+            self._updates[event.device_id] = event
+
+    def _make_room(self):
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while len(self._events) >= self.capacity:
+            oldest = next(iter(self._events))
+            slow = [s for s in self._subscriptions if s.cursor < oldest]
+            if slow:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is None or remaining > 0:
+                    self._changed.notify_all()
+                    self._changed.wait(remaining)
+                    continue
+                for subscription in slow:
+                    subscription.lagged = True
+                    self._subscriptions.discard(subscription)
+
+            event = self._events.pop(oldest)
+            self._order.discard(oldest)
+            if (
+                isinstance(event, DeviceEvent)
+                and self._updates.get(event.device_id) is event
+            ):
+                del self._updates[event.device_id]
+            self._trimmed = oldest
+
+    def _read(
+        self, subscription: Subscription, limit: int, timeout: Optional[float]
+    ) -> Sequence[Event]:
+        with self._changed:
+            self._changed.wait_for(
+                lambda: subscription.lagged or self.head > subscription.cursor,
+                timeout,
+            )
+            if subscription.lagged:
+                raise SubscriptionLagged(
+                    f"Subscriber fell behind: cursor={subscription.cursor}"
+                )
+
+            events = []
+            for seq, _ in self._order.after(subscription.cursor):
+                if len(events) == limit:
+                    break
+                subscription.cursor = seq
+                event = self._events[seq]
+                if subscription.matches(event):
+                    events.append(event)
+            # a cursor past the last event lets the next read skip the wait
+            if len(events) < limit:
+                subscription.cursor = self.head
+            self._changed.notify_all()
+            return events
+
+    def _unsubscribe(self, subscription: Subscription):
+        with self._changed:
+            self._subscriptions.discard(subscription)
+            self._changed.notify_all()
@@ -0,0 +1,200 @@
+import bisect
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass, field, fields
+from enum import Enum
+from functools import cache
+from typing import Any, Callable, Dict, Iterator, Mapping, Optional, Sequence, Tuple
+
+from idt.domains import TypeDevice
+from idt.repositories import POP_DEVICE, PUT_DEVICE, Store
+
+TRACKED = ("state", "brightness", "target_temp_f", "actual_temp_f")
+# a timestamp and a value, both stored as doubles
+ENTRY_BYTES = 16
+
+# to and from the double a value is packed as
+Codec = Tuple[Callable[[Any], float], Callable[[float], Any]]
+
+
+@cache
+def _tracked(device_cls: type[TypeDevice]) -> Mapping[str, Codec]:
+    codecs = {}
+    for f in fields(device_cls):
+        if f.name not in TRACKED:
+            continue
+        if isinstance(f.type, type) and issubclass(f.type, Enum):
+            codecs[f.name] = (lambda member: member.value, f.type)
+        else:
+            codecs[f.name] = (float, f.type)
+    return codecs
+
+
+@dataclass
+class _Ring:
+    capacity: int
+    times: array = field(default_factory=lambda: array("d"))
+    values: array = field(default_factory=lambda: array("d"))
+    # where the oldest entry is once the buffer has wrapped
+    start: int = 0
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def append(self, at: float, value: float) -> bool:
+        if len(self.times) < self.capacity:
+            self.times.append(at)
+            self.values.append(value)
+            return True
+        self.times[self.start] = at
+        self.values[self.start] = value
+        self.start = (self.start + 1) % self.capacity
+        return False
+
+    def time(self, i: int) -> float:
+        return self.times[(self.start + i) % len(self.times)]
+
+    def value(self, i: int) -> float:
+        return self.values[(self.start + i) % len(self.values)]
+
+    def between(
+        self, since: Optional[float], until: Optional[float]
+    ) -> Iterator[Tuple[float, float]]:
+        positions = range(len(self))
+        lo = 0 if since is None else bisect.bisect_left(positions, since, key=self.time)
+        hi = (
+            len(self)
+            if until is None
+            else bisect.bisect_right(positions, until, key=self.time)
+        )
+        for i in range(lo, hi):
+            yield self.time(i), self.value(i)
+
+
+@dataclass(frozen=True)
+class HistoryUsage:
+    # the entries' payload, which is what max_bytes bounds; the arrays, rings
+    # and dicts holding them add a fixed overhead per device on top
+    bytes: int
+    max_bytes: int
+    devices: int
+    entries: int
+    evictions: int
+
+
+@dataclass
+class DeviceHistory:
+    store: Store
+    # entries kept per device attribute, the oldest are overwritten first
+    capacity: int = 1024
+    # across all devices; the least recently changed device is dropped first,
+    # and a device's buffers are shortened to fit in it on their own
+    max_bytes: int = 64 * 2**20
+    clock: Callable[[], float] = time.time
+    evictions: int = 0
+    _devices: "OrderedDict[str, Dict[str, _Ring]]" = field(
+        init=False, repr=False, default_factory=OrderedDict
+    )
+    _entries: int = field(init=False, repr=False, default=0)
+    _lock: threading.Lock = field(
+        init=False, repr=False, default_factory=threading.Lock
+    )
+
+    def __post_init__(self):
+        self.store.subscribe(self._on_change)
+
+    def close(self):
+        self.store.unsubscribe(self._on_change)
+
+    def record(self, device: TypeDevice, at: Optional[float] = None):
+        codecs = _tracked(type(device))
+        if not codecs:
+            return
+        at = self.clock() if at is None else at
+        with self._lock:
+            capacity = min(
+                self.capacity, max(1, self.max_bytes // (ENTRY_BYTES * len(codecs)))
+            )
+            rings = self._devices.get(device.id)
+            if rings is None:
+                rings = self._devices[device.id] = {}
+            written = False
+            for attr, (encode, _) in codecs.items():
+                value = encode(getattr(device, attr))
+                ring = rings.get(attr)
+                stamp = at
+                if ring is None:
+                    ring = rings[attr] = _Ring(capacity)
+                elif ring.value(len(ring) - 1) == value:
+                    continue
+                else:
+                    # keep each buffer sorted even if the clock steps back
+                    stamp = max(at, ring.time(len(ring) - 1))
+                self._entries += ring.append(stamp, value)
+                written = True
+            # only a change counts as use, or a device polled without ever
+            # changing would never be evicted
+            if written:
+                self._devices.move_to_end(device.id)
+            # only a budget too small for one entry per attribute drops the
+            # device just recorded
+            while self._entries * ENTRY_BYTES > self.max_bytes:
+                _, evicted = self._devices.popitem(last=False)
+                self._entries -= sum(len(ring) for ring in evicted.values())
+                self.evictions += 1
+
+    def history(
+        self,
+        id_: str,
+        attr: str,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> Sequence[Tuple[float, Any]]:
+        with self._lock:
+            ring = self._devices.get(id_, {}).get(attr)
+            if ring is None:
+                return []
+            decode = _tracked(type(self.store.devices[id_]))[attr][1]
+            return [(at, decode(value)) for at, value in ring.between(since, until)]
+
+    def value_at(self, id_: str, attr: str, at: float) -> Optional[Any]:
+        with self._lock:
+            ring = self._devices.get(id_, {}).get(attr)
+            if ring is None:
+                return None
+            i = bisect.bisect_right(range(len(ring)), at, key=ring.time)
+            if i == 0:
+                return None
+            decode = _tracked(type(self.store.devices[id_]))[attr][1]
+            return decode(ring.value(i - 1))
+
+    def when(
+        self,
+        id_: str,
+        attr: str,
+        value: Any,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> Sequence[float]:
+        return [at for at, v in self.history(id_, attr, since, until) if v == value]
+
+    def usage(self) -> HistoryUsage:
+        with self._lock:
+            return HistoryUsage(
+                bytes=self._entries * ENTRY_BYTES,
+                max_bytes=self.max_bytes,
+                devices=len(self._devices),
+                entries=self._entries,
+                evictions=self.evictions,
+            )
+
+    def _on_change(self, event: str, id_: str):
+        if event == PUT_DEVICE:
+            self.record(self.store.devices[id_])
+        elif event == POP_DEVICE:
+            with self._lock:
+                rings = self._devices.pop(id_, None)
+                if rings is not None:
+                    self._entries -= sum(len(ring) for ring in rings.values())
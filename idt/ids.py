@@ -0,0 +1,163 @@
+import os
+import sys
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Protocol, Sequence
+
+# Crockford's base32: no I, L, O or U, and decoding forgives case and the
+# characters people confuse with 0 and 1
+ALPHABET = "0123456789abcdefghjkmnpqrstvwxyz"
+# 64 bits in fixed width, so ids sort as strings in the order they were allocated
+WIDTH = 13
+SEQ_BITS = 16
+
+_PAIRS = [a + b for a in ALPHABET for b in ALPHABET]
+_DECODE = {
+    **{c: i for i, c in enumerate(ALPHABET)},
+    **{c.upper(): i for i, c in enumerate(ALPHABET)},
+    **{c: 0 for c in "oO"},
+    **{c: 1 for c in "iIlL"},
+}
+_MAX = (1 << 64) - 1
+
+_VERSION_MASK = ~(0xF000 << 64) & ~(0xC000 << 48)
+_VERSION_BITS = (0x4000 << 64) | (0x8000 << 48)
+
+
+def encode(value: int) -> str:
+    if not 0 <= value <= _MAX:
+        raise ValueError(f"Id out of range: value={value}")
+    pairs = _PAIRS
+    return (
+        ALPHABET[value >> 60]
+        + pairs[value >> 50 & 1023]
+        + pairs[value >> 40 & 1023]
+        + pairs[value >> 30 & 1023]
+        + pairs[value >> 20 & 1023]
+        + pairs[value >> 10 & 1023]
+        + pairs[value & 1023]
+    )
+
+
+def decode(text: str) -> int:
+    if len(text) != WIDTH:
+        raise ValueError(f"Invalid id: text={text!r}")
+    value = 0
+    try:
+        for c in text:
+            value = value << 5 | _DECODE[c]
+    except KeyError:
+        raise ValueError(f"Invalid id: text={text!r}") from None
+    if value > _MAX:
+        raise ValueError(f"Invalid id: text={text!r}")
+    return value
+
+
+class IdAllocator(Protocol):
+    def allocate(self) -> str: ...
+
+    def allocate_many(self, count: int) -> Sequence[str]: ...
+
+    def canonical(self, text: str) -> str: ...
+
+    # never allocate any of these again, e.g. the ids a reloaded store holds
+    def advance(self, ids: Iterable[str]): ...
+
+
+def _last(ids: Iterable[str]) -> int:
+    last = 0
+    for id_ in ids:
+        try:
+            last = max(last, decode(id_))
+        except ValueError:
+            continue
+    return last
+
+
+@dataclass
+class UUIDAllocator:
+    def allocate(self) -> str:
+        return sys.intern(str(uuid.uuid4()))
+
+    def allocate_many(self, count: int) -> Sequence[str]:
+        # one urandom call for the batch, and formatted without UUID objects
+        data = os.urandom(16 * count)
+        ids = []
+        for i in range(0, len(data), 16):
+            value = int.from_bytes(data[i : i + 16]) & _VERSION_MASK | _VERSION_BITS
+            h = f"{value:032x}"
+            ids.append(sys.intern(f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"))
+        return ids
+
+    def canonical(self, text: str) -> str:
+        return sys.intern(str(uuid.UUID(text)))
+
+    def advance(self, ids: Iterable[str]):
+        pass
+
+
+@dataclass
+class _CompactAllocator(ABC):
+    _lock: threading.Lock = field(
+        init=False, repr=False, compare=False, default_factory=threading.Lock
+    )
+
+    def allocate(self) -> str:
+        return self.allocate_many(1)[0]
+
+    def allocate_many(self, count: int) -> Sequence[str]:
+        with self._lock:
+            first = self._reserve(count)
+        return [sys.intern(encode(value)) for value in range(first, first + count)]
+
+    def canonical(self, text: str) -> str:
+        return sys.intern(encode(decode(text)))
+
+    def advance(self, ids: Iterable[str]):
+        last = _last(ids)
+        with self._lock:
+            self._advance(last)
+
+    @abstractmethod
+    def _reserve(self, count: int) -> int: ...
+
+    @abstractmethod
+    def _advance(self, last: int): ...
+
+
+@dataclass
+class MonotonicAllocator(_CompactAllocator):
+    next_value: int = 1
+
+    @classmethod
+    def after(cls, ids: Iterable[str]) -> "MonotonicAllocator":
+        return cls(next_value=_last(ids) + 1)
+
+    def _reserve(self, count: int) -> int:
+        first = self.next_value
+        if first + count - 1 > _MAX:
+            raise ValueError(f"Ids exhausted: next_value={first}")
+        self.next_value += count
+        return first
+
+    def _advance(self, last: int):
+        self.next_value = max(self.next_value, last + 1)
+
+
+@dataclass
+class TimeOrderedAllocator(_CompactAllocator):
+    # milliseconds in the high 48 bits and a sequence in the low 16; a burst
+    # past 65536 ids in a millisecond borrows from the next one
+    clock: Callable[[], int] = lambda: time.time_ns() // 1_000_000
+    last: int = 0
+
+    def _reserve(self, count: int) -> int:
+        first = max(self.clock() << SEQ_BITS, self.last + 1)
+        self.last = first + count - 1
+        return first
+
+    def _advance(self, last: int):
+        self.last = max(self.last, last)
@@ -0,0 +1,206 @@
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import (
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from idt.domains import Hub, TypeDevice
+
+DeviceKeys = Tuple[type, Optional[str], Optional[Enum]]
+
+_REMOVED = object()
+
+
+def _hub_id(device: TypeDevice) -> Optional[str]:
+    return device.hub.id if device.hub is not None else None
+
+
+def _dwelling_id(hub: Hub) -> Optional[str]:
+    return hub.dwelling.id if hub.dwelling is not None else None
+
+
+@dataclass
+class DeviceIndex:
+    by_type: Mapping[type, Set[str]] = field(default_factory=dict)
+    by_hub: Mapping[Optional[str], Set[str]] = field(default_factory=dict)
+    by_state: Mapping[Enum, Set[str]] = field(default_factory=dict)
+    hubs_by_dwelling: Mapping[Optional[str], Set[str]] = field(default_factory=dict)
+    device_keys: Mapping[str, DeviceKeys] = field(default_factory=dict)
+    hub_keys: Mapping[str, Optional[str]] = field(default_factory=dict)
+
+    def add(self, device: TypeDevice):
+        keys = (type(device), _hub_id(device), getattr(device, "state", None))
+        old = self.device_keys.get(device.id)
+        if old == keys:
+            return
+        if old is not None:
+            self._unlink(device.id, old)
+
+        self.device_keys[device.id] = keys
+        type_, hub_id, state = keys
+        self.by_type.setdefault(type_, set()).add(device.id)
+        self.by_hub.setdefault(hub_id, set()).add(device.id)
+        if state is not None:
+            self.by_state.setdefault(state, set()).add(device.id)
+
+    def discard(self, id_: str):
+        keys = self.device_keys.pop(id_, None)
+        if keys is not None:
+            self._unlink(id_, keys)
+
+    def add_hub(self, hub: Hub):
+        dwelling_id = _dwelling_id(hub)
+        if hub.id in self.hub_keys:
+            old = self.hub_keys[hub.id]
+            if old == dwelling_id:
+                return
+            _remove(self.hubs_by_dwelling, old, hub.id)
+
+        self.hub_keys[hub.id] = dwelling_id
+        self.hubs_by_dwelling.setdefault(dwelling_id, set()).add(hub.id)
+
+    def find(
+        self,
+        device_cls: Optional[type] = None,
+        *,
+        hub_id: Optional[str] = None,
+        dwelling_id: Optional[str] = None,
+        dwelling_ids: Optional[Iterable[str]] = None,
+        state: Optional[Enum] = None,
+        paired: Optional[bool] = None,
+    ) -> Set[str]:
+        candidates = []
+        if hub_id is not None:
+            candidates.append(self.by_hub.get(hub_id, set()))
+        if dwelling_id is not None:
+            candidates.append(self._in_dwellings((dwelling_id,)))
+        if dwelling_ids is not None:
+            candidates.append(self._in_dwellings(dwelling_ids))
+        if state is not None:
+            candidates.append(self.by_state.get(state, set()))
+        if paired is False:
+            candidates.append(self.by_hub.get(None, set()))
+
+        # the type filter is a union over every matching type; when another
+        # filter is narrower, checking each of its ids is cheaper than that
+        type_sets = None
+        if device_cls is not None:
+            type_sets = [
+                ids
+                for type_, ids in self.by_type.items()
+                if issubclass(type_, device_cls)
+            ]
+            if not candidates or sum(map(len, type_sets)) <= min(map(len, candidates)):
+                candidates.append(_union(type_sets))
+                type_sets = None
+
+        if not candidates:
+            ids = set(self.device_keys)
+        else:
+            candidates.sort(key=len)
+            ids = set(candidates[0]).intersection(*candidates[1:])
+
+        if type_sets is not None:
+            ids = {
+                id_ for id_ in ids if issubclass(self.device_keys[id_][0], device_cls)
+            }
+        if paired:
+            ids.difference_update(self.by_hub.get(None, ()))
+        return ids
+
+    def _in_dwellings(self, dwelling_ids: Iterable[str]) -> Set[str]:
+        return _union(
+            self.by_hub.get(hub_id, set())
+            for dwelling_id in dwelling_ids
+            for hub_id in self.hubs_by_dwelling.get(dwelling_id, ())
+        )
+
+    def _unlink(self, id_: str, keys: DeviceKeys):
+        type_, hub_id, state = keys
+        _remove(self.by_type, type_, id_)
+        _remove(self.by_hub, hub_id, id_)
+        if state is not None:
+            _remove(self.by_state, state, id_)
+
+
+def _remove(index: Mapping, key, id_: str):
+    ids = index.get(key)
+    if ids is None:
+        return
+    ids.discard(id_)
+    if not ids:
+        del index[key]
+
+
+def _union(sets: Iterable[Set[str]]) -> Set[str]:
+    return set().union(*sets)
+
+
+@dataclass
+class InsertionOrder:
+    seqs: array = field(default_factory=lambda: array("q"))
+    keys: List[Hashable] = field(default_factory=list)
+    positions: Mapping[Hashable, int] = field(default_factory=dict)
+    next_seq: int = 0
+    removed: int = 0
+    generation: int = 0
+
+    def add(self, key: Hashable):
+        if key in self.positions:
+            return
+        self.positions[key] = self.next_seq
+        self.seqs.append(self.next_seq)
+        self.keys.append(key)
+        self.next_seq += 1
+
+    def discard(self, key: Hashable):
+        seq = self.positions.pop(key, None)
+        if seq is None:
+            return
+        self.keys[bisect_right(self.seqs, seq) - 1] = _REMOVED
+        self.removed += 1
+        if self.removed > len(self.keys) // 2:
+            self._compact()
+
+    def after(self, cursor: Optional[int] = None) -> Iterator[Tuple[int, Hashable]]:
+        seq = -1 if cursor is None else cursor
+        generation = self.generation
+        i = bisect_right(self.seqs, seq)
+        while True:
+            if generation != self.generation:
+                generation = self.generation
+                i = bisect_right(self.seqs, seq)
+            if i >= len(self.keys):
+                return
+            key = self.keys[i]
+            seq = self.seqs[i]
+            i += 1
+            if key is not _REMOVED:
+                yield seq, key
+
+    def after_of(
+        self, keys: Iterable[Hashable], cursor: Optional[int] = None
+    ) -> Iterator[Tuple[int, Hashable]]:
+        seq = -1 if cursor is None else cursor
+        entries = sorted(
+            (self.positions[key], key)
+            for key in keys
+            if self.positions.get(key, -1) > seq
+        )
+        return iter(entries)
+
+    def _compact(self):
+        live = [(s, k) for s, k in zip(self.seqs, self.keys) if k is not _REMOVED]
+        self.seqs = array("q", (s for s, _ in live))
+        self.keys = [k for _, k in live]
+        self.removed = 0
+        self.generation += 1
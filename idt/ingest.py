@@ -0,0 +1,103 @@
+import itertools
+import math
+from collections import OrderedDict
+from dataclasses import dataclass, field, fields
+from functools import cache
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, Optional, Sequence, Tuple
+
+from idt.domains import TypeDevice
+from idt.feed import Change, ChangeFeed, device_event
+from idt.repositories import DeviceRepository
+
+# device id, field, value, timestamp
+Reading = Tuple[str, str, Any, float]
+
+
+@dataclass
+class IngestStats:
+    received: int = 0
+    applied: int = 0
+    coalesced: int = 0
+    stale: int = 0
+    rejected: int = 0
+    batches: int = 0
+
+
+def batches(readings: Iterable[Reading], size: int) -> Iterator[Sequence[Reading]]:
+    readings = iter(readings)
+    while batch := list(itertools.islice(readings, size)):
+        yield batch
+
+
+@dataclass
+class TelemetryIngestor:
+    repo: DeviceRepository
+    batch_size: int = 1000
+    feed: Optional[ChangeFeed] = None
+    stats: IngestStats = field(default_factory=IngestStats)
+    # how many (device id, field) timestamps are remembered; the least
+    # recently applied are forgotten first, and a duplicate of one of those
+    # arriving later is applied again
+    max_seen: int = 100_000
+    # newest timestamp applied per (device id, field), across batches
+    _seen: "OrderedDict[Tuple[str, str], float]" = field(
+        init=False, repr=False, default_factory=OrderedDict
+    )
+
+    def ingest(self, readings: Iterable[Reading]) -> IngestStats:
+        for batch in batches(readings, self.batch_size):
+            self.apply(batch)
+        return self.stats
+
+    def apply(self, batch: Sequence[Reading]):
+        # the last write per device wins within a batch; anything not newer
+        # than what was already applied is a duplicate or arrived out of order
+        latest: Dict[str, Dict[str, Tuple[Any, float]]] = {}
+        seen = self._seen
+        stats = self.stats
+        stale = coalesced = 0
+        for id_, attr, value, timestamp in batch:
+            attrs = latest.get(id_)
+            if attrs is None:
+                attrs = latest[id_] = {}
+            pending = attrs.get(attr)
+            if pending is not None:
+                if timestamp <= pending[1]:
+                    stale += 1
+                    continue
+                coalesced += 1
+            elif timestamp <= seen.get((id_, attr), -math.inf):
+                stale += 1
+                continue
+            attrs[attr] = (value, timestamp)
+        stats.received += len(batch)
+        stats.stale += stale
+        stats.coalesced += coalesced
+        stats.batches += 1
+
+        devices = self.repo.store.devices
+        with self.repo.locked(*latest):
+            updated = []
+            for id_, attrs in latest.items():
+                device = devices.get(id_)
+                if device is None or not _fields(type(device)).issuperset(attrs):
+                    stats.rejected += len(attrs)
+                    continue
+                for attr, (value, timestamp) in attrs.items():
+                    setattr(device, attr, value)
+                    seen[id_, attr] = timestamp
+                    seen.move_to_end((id_, attr))
+                stats.applied += len(attrs)
+                updated.append(device)
+            self.repo.save_many(updated)
+            while len(seen) > self.max_seen:
+                seen.popitem(last=False)
+            if self.feed is not None:
+                self.feed.publish(
+                    *(device_event(Change.UPDATED, device) for device in updated)
+                )
+
+
+@cache
+def _fields(device_cls: type[TypeDevice]) -> FrozenSet[str]:
+    return frozenset(f.name for f in fields(device_cls)) - {"id", "hub"}
@@ -0,0 +1,246 @@
+import os
+import pickle
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Optional, Sequence, Tuple
+
+from idt.domains import Dwelling, Hub, TypeDevice
+from idt.repositories import Store
+from idt.serialization import (
+    device_from_record,
+    device_record,
+    dwelling_from_record,
+    dwelling_record,
+    hub_from_record,
+    hub_record,
+    link_device,
+    link_hub,
+    read_frames,
+    ref,
+    write_frame,
+)
+
+SNAPSHOT = "snapshot"
+SEGMENT = "journal.{:08d}"
+
+# every journal entry carries the full state of what it writes, so replaying
+# an entry twice is harmless; that is what lets snapshots be taken without
+# stopping writers
+PUT_DEVICE = "d"
+POP_DEVICE = "x"
+PUT_HUB = "h"
+PUT_DWELLING = "w"
+
+Entry = Tuple
+
+
+def _device_entry(device: TypeDevice) -> Entry:
+    record = device_record(device)
+    return (PUT_DEVICE, record["id"], record["type"], record["hub_id"], record["attrs"])
+
+
+def _hub_entry(hub: Hub) -> Entry:
+    record = hub_record(hub)
+    return (PUT_HUB, record["id"], record["dwelling_id"])
+
+
+def _dwelling_entry(dwelling: Dwelling) -> Entry:
+    record = dwelling_record(dwelling)
+    return (PUT_DWELLING, record["id"], record["state"])
+
+
+def _encode(entry: Entry) -> bytes:
+    return pickle.dumps(entry, protocol=5)
+
+
+@dataclass(kw_only=True)
+class JournalStore(Store):
+    directory: str
+    commit_interval: float = 0.005
+    snapshot_interval: Optional[float] = 300.0
+    synchronous: bool = False
+    _file: BinaryIO = field(init=False, repr=False)
+    _segment: int = field(init=False, repr=False, default=0)
+    _written: int = field(init=False, repr=False, default=0)
+    _durable: int = field(init=False, repr=False, default=0)
+    _lock: threading.Lock = field(init=False, repr=False)
+    _committed: threading.Condition = field(init=False, repr=False)
+    _sync_lock: threading.Lock = field(init=False, repr=False)
+    _closed: threading.Event = field(init=False, repr=False)
+    _threads: Sequence[threading.Thread] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+        self._committed = threading.Condition(self._lock)
+        self._sync_lock = threading.Lock()
+        self._closed = threading.Event()
+
+        path = Path(self.directory)
+        path.mkdir(parents=True, exist_ok=True)
+        self._recover(path)
+        super().__post_init__()
+
+        # never append to a recovered segment, its tail may be torn
+        self._segment = max(self._segments(), default=0) + 1
+        self._file = open(path / SEGMENT.format(self._segment), "ab")
+
+        self._threads = [threading.Thread(target=self._commit_loop, daemon=True)]
+        if self.snapshot_interval is not None:
+            self._threads.append(
+                threading.Thread(target=self._snapshot_loop, daemon=True)
+            )
+        for thread in self._threads:
+            thread.start()
+
+    def close(self):
+        self._closed.set()
+        for thread in self._threads:
+            thread.join()
+        self.sync()
+        self._file.close()
+
+    def put_device(self, device: TypeDevice):
+        super().put_device(device)
+        self._append(_device_entry(device))
+
+    def pop_device(self, id_: str) -> TypeDevice:
+        device = super().pop_device(id_)
+        self._append((POP_DEVICE, ref(id_)))
+        return device
+
+    def put_hub(self, hub: Hub):
+        super().put_hub(hub)
+        self._append(_hub_entry(hub))
+
+    def put_dwelling(self, dwelling: Dwelling):
+        super().put_dwelling(dwelling)
+        self._append(_dwelling_entry(dwelling))
+
+    def snapshot(self):
+        path = Path(self.directory)
+        with self._sync_lock, self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._durable = self._written
+            self._committed.notify_all()
+            self._file.close()
+            self._segment += 1
+            self._file = open(path / SEGMENT.format(self._segment), "ab")
+            segment = self._segment
+
+        # copying the dicts is atomic; entries written meanwhile land in the new
+        # segment and are replayed over the snapshot on recovery
+        dwellings = list(self.dwellings.values())
+        hubs = list(self.hubs.values())
+        devices = list(self.devices.values())
+
+        tmp = path / f"{SNAPSHOT}.tmp"
+        with open(tmp, "wb") as file:
+            write_frame(file, _encode(("s", segment)))
+            for dwelling in dwellings:
+                write_frame(file, _encode(_dwelling_entry(dwelling)))
+            for hub in hubs:
+                write_frame(file, _encode(_hub_entry(hub)))
+            for device in devices:
+                write_frame(file, _encode(_device_entry(device)))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp, path / SNAPSHOT)
+        _fsync_directory(path)
+
+        for old in self._segments():
+            if old < segment:
+                os.remove(path / SEGMENT.format(old))
+
+    def sync(self):
+        with self._sync_lock:
+            with self._lock:
+                if self._durable == self._written:
+                    return
+                self._file.flush()
+                written = self._written
+            os.fsync(self._file.fileno())
+            with self._lock:
+                self._durable = written
+                self._committed.notify_all()
+
+    def _append(self, entry: Entry):
+        payload = _encode(entry)
+        with self._lock:
+            write_frame(self._file, payload)
+            self._written += 1
+            if self.synchronous:
+                written = self._written
+                self._committed.wait_for(lambda: self._durable >= written)
+
+    def _commit_loop(self):
+        while not self._closed.wait(self.commit_interval):
+            self.sync()
+
+    def _snapshot_loop(self):
+        while not self._closed.wait(self.snapshot_interval):
+            self.snapshot()
+
+    def _segments(self) -> Sequence[int]:
+        prefix = SEGMENT.split(".")[0] + "."
+        return sorted(
+            int(path.name[len(prefix) :])
+            for path in Path(self.directory).glob(prefix + "*")
+        )
+
+    def _recover(self, path: Path):
+        first = 0
+        if (path / SNAPSHOT).exists():
+            with open(path / SNAPSHOT, "rb") as file:
+                frames = read_frames(file)
+                _, first = pickle.loads(next(frames))
+                for frame in frames:
+                    self._replay(pickle.loads(frame))
+        for segment in self._segments():
+            if segment < first:
+                continue
+            with open(path / SEGMENT.format(segment), "rb") as file:
+                for frame in read_frames(file):
+                    self._replay(pickle.loads(frame))
+
+    def _replay(self, entry: Entry):
+        kind, id_, *rest = entry
+        if kind == PUT_DWELLING:
+            (state,) = rest
+            dwelling = dwelling_from_record({"id": id_, "state": state})
+            if id_ in self.dwellings:
+                self.dwellings[id_].state = dwelling.state
+            else:
+                self.dwellings[id_] = dwelling
+        elif kind == PUT_HUB:
+            (dwelling_id,) = rest
+            hub = self.hubs.get(id_)
+            if hub is None:
+                hub = self.hubs[id_] = hub_from_record({"id": id_})
+            if hub.dwelling is not None and hub.dwelling.id != dwelling_id:
+                hub.dwelling.hubs.pop(id_, None)
+                hub.dwelling = None
+            link_hub(hub, self.dwellings.get(dwelling_id))
+        elif kind == PUT_DEVICE:
+            type_, hub_id, attrs = rest
+            self._unlink_device(id_)
+            device = device_from_record({"id": id_, "type": type_, "attrs": attrs})
+            link_device(device, self.hubs.get(hub_id))
+            self.devices[id_] = device
+        elif kind == POP_DEVICE:
+            self._unlink_device(id_)
+            self.devices.pop(id_, None)
+
+    def _unlink_device(self, id_: str):
+        device = self.devices.get(id_)
+        if device is not None and device.hub is not None:
+            device.hub.devices.pop(id_, None)
+
+
+def _fsync_directory(path: Path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,360 @@
+import mmap
+import pickle
+import struct
+from array import array
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterable, Iterator, Optional, Sequence, Set, Tuple
+
+from idt.domains import Dwelling, Hub, TypeDevice
+from idt.indexes import DeviceIndex, InsertionOrder
+from idt.repositories import Store
+from idt.serialization import (
+    device_from_record,
+    device_record,
+    dwelling_from_record,
+    hub_from_record,
+    link_device,
+    link_hub,
+    ref,
+)
+
+# layout: header, then for each section a blob of (key, record) pairs, a
+# fixed-size entry table in insertion order and a key-sorted permutation of it
+MAGIC = b"IDTSNAP1"
+HEADER = struct.Struct("<8s9Q")
+ENTRY = struct.Struct("<QII")
+
+DWELLINGS, HUBS, DEVICES = range(3)
+
+
+def write_snapshot(store: Store, file: BinaryIO):
+    sections = [
+        (
+            (
+                ref(d.id),
+                (ref(d.id), d.state.name, [ref(h) for h in d.hubs]),
+            )
+            for d in list(store.dwellings.values())
+        ),
+        (
+            (
+                ref(h.id),
+                (
+                    ref(h.id),
+                    ref(h.dwelling.id if h.dwelling is not None else None),
+                    [ref(d) for d in h.devices],
+                ),
+            )
+            for h in list(store.hubs.values())
+        ),
+        (_device_entry(device) for device in list(store.devices.values())),
+    ]
+
+    file.write(b"\0" * HEADER.size)
+    header = []
+    for entries in sections:
+        offsets = array("Q")
+        lengths = array("I")
+        keys = []
+        for key, record in entries:
+            key_bytes = key.encode()
+            payload = pickle.dumps(record, protocol=5)
+            offsets.append(file.tell())
+            lengths.append(len(key_bytes))
+            lengths.append(len(payload))
+            keys.append(key_bytes)
+            file.write(key_bytes)
+            file.write(payload)
+
+        entries_offset = file.tell()
+        for i, offset in enumerate(offsets):
+            file.write(ENTRY.pack(offset, lengths[2 * i], lengths[2 * i + 1]))
+        sorted_offset = file.tell()
+        file.write(array("I", sorted(range(len(keys)), key=keys.__getitem__)))
+        header.extend((len(keys), entries_offset, sorted_offset))
+
+    file.seek(0)
+    file.write(HEADER.pack(MAGIC, *header))
+
+
+def _device_entry(device: TypeDevice) -> Tuple[str, Tuple]:
+    record = device_record(device)
+    return record["id"], (
+        record["id"],
+        record["type"],
+        record["hub_id"],
+        record["attrs"],
+    )
+
+
+@dataclass
+class _Section:
+    buffer: mmap.mmap
+    count: int
+    entries_offset: int
+    sorted_offset: int
+
+    def entry(self, i: int) -> Tuple[int, int, int]:
+        return ENTRY.unpack_from(self.buffer, self.entries_offset + i * ENTRY.size)
+
+    def key(self, i: int) -> bytes:
+        offset, key_length, _ = self.entry(i)
+        return self.buffer[offset : offset + key_length]
+
+    def record(self, i: int) -> Tuple:
+        offset, key_length, length = self.entry(i)
+        start = offset + key_length
+        return pickle.loads(self.buffer[start : start + length])
+
+    def sorted_index(self, rank: int) -> int:
+        (i,) = struct.unpack_from("<I", self.buffer, self.sorted_offset + rank * 4)
+        return i
+
+    def find(self, key: str) -> Optional[int]:
+        target = key.encode()
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            i = self.sorted_index(mid)
+            found = self.key(i)
+            if found == target:
+                return i
+            if found < target:
+                low = mid + 1
+            else:
+                high = mid
+        return None
+
+    def keys(self) -> Iterator[str]:
+        for i in range(self.count):
+            yield self.key(i).decode()
+
+
+class _LazyMapping(dict):
+    # hits are plain dict lookups; misses fault the entity in from the snapshot,
+    # and whole-collection reads materialize everything first
+    def __init__(self, store: "MappedStore", section: int):
+        super().__init__()
+        self.store = store
+        self.section = section
+
+    def __missing__(self, key):
+        self.store._fault(self.section, key)
+        return dict.__getitem__(self, key)
+
+    def __contains__(self, key) -> bool:
+        return dict.__contains__(self, key) or self.store._exists(self.section, key)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def __iter__(self):
+        self.store.materialize_all()
+        return dict.__iter__(self)
+
+    def __len__(self) -> int:
+        self.store.materialize_all()
+        return dict.__len__(self)
+
+    def keys(self):
+        self.store.materialize_all()
+        return dict.keys(self)
+
+    def values(self):
+        self.store.materialize_all()
+        return dict.values(self)
+
+    def items(self):
+        self.store.materialize_all()
+        return dict.items(self)
+
+
+def _reorder(mapping: dict, order: Iterator[Tuple[int, str]]):
+    # faulting fills the dicts in access order; put them back in insertion order
+    items = [(key, dict.__getitem__(mapping, key)) for _, key in order]
+    dict.clear(mapping)
+    for key, value in items:
+        dict.__setitem__(mapping, key, value)
+
+
+@dataclass
+class _LazyIndex(DeviceIndex):
+    store: Optional["MappedStore"] = field(default=None, repr=False, compare=False)
+
+    def find(self, *args, **kwargs) -> Set[str]:
+        self.store.materialize_all()
+        return super().find(*args, **kwargs)
+
+
+@dataclass
+class _LazyOrder(InsertionOrder):
+    store: Optional["MappedStore"] = field(default=None, repr=False, compare=False)
+
+    def after(self, cursor: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+        self.store.materialize_all()
+        return super().after(cursor)
+
+    def after_of(self, keys: Iterable[str], *args, **kwargs):
+        self.store.materialize_all()
+        return super().after_of(keys, *args, **kwargs)
+
+    def reset(self, keys: Iterable[str]):
+        existing = [key for _, key in super().after()]
+        InsertionOrder.__init__(self)
+        for key in keys:
+            self.add(key)
+        for key in existing:
+            self.add(key)
+
+
+@dataclass(kw_only=True)
+class MappedStore(Store):
+    path: str
+    _file: BinaryIO = field(init=False, repr=False)
+    _buffer: mmap.mmap = field(init=False, repr=False)
+    _sections: Sequence[_Section] = field(init=False, repr=False)
+    _removed: Set[str] = field(init=False, repr=False, default_factory=set)
+    _complete: bool = field(init=False, repr=False, default=False)
+
+    def __post_init__(self):
+        self._file = open(self.path, "rb")
+        self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, *header = HEADER.unpack_from(self._buffer)
+        if magic != MAGIC:
+            raise ValueError(f"Not a store snapshot: path={self.path}")
+        self._sections = [
+            _Section(self._buffer, *header[i : i + 3]) for i in range(0, 9, 3)
+        ]
+
+        self.dwellings = _LazyMapping(self, DWELLINGS)
+        self.hubs = _LazyMapping(self, HUBS)
+        self.devices = _LazyMapping(self, DEVICES)
+        self.index = _LazyIndex(store=self)
+        self.device_order = _LazyOrder(store=self)
+        self.dwelling_order = _LazyOrder(store=self)
+        self.ids.advance(self._last_ids())
+
+    def close(self):
+        self._buffer.close()
+        self._file.close()
+
+    def _last_ids(self) -> Iterator[str]:
+        # keys are sorted as bytes, and canonical compact ids sort by value
+        # that way, so the greatest id is the last key that is its own
+        # canonical form; an allocator that ignores the ids never reads any
+        devices = self._sections[DEVICES]
+        for rank in reversed(range(devices.count)):
+            key = devices.key(devices.sorted_index(rank)).decode()
+            try:
+                if self.ids.canonical(key) == key:
+                    yield key
+                    return
+            except ValueError:
+                continue
+
+    def pop_device(self, id_: str) -> TypeDevice:
+        self.devices[id_]  # fault it in so the hub side is live too
+        device = super().pop_device(id_)
+        self._removed.add(id_)
+        return device
+
+    def put_device(self, device: TypeDevice):
+        super().put_device(device)
+        self._removed.discard(device.id)
+
+    def materialize_all(self):
+        if self._complete:
+            return
+        self._complete = True
+
+        # a sequential pass over the sections; anything already faulted in came
+        # with its whole dwelling, so new objects only ever link to new objects
+        dwellings, hubs, devices = self._sections
+        new_dwellings = {}
+        for i in range(dwellings.count):
+            id_, state, _ = dwellings.record(i)
+            if not dict.__contains__(self.dwellings, id_):
+                dwelling = dwelling_from_record({"id": id_, "state": state})
+                dict.__setitem__(self.dwellings, id_, dwelling)
+                new_dwellings[id_] = dwelling
+        new_hubs = {}
+        for i in range(hubs.count):
+            id_, dwelling_id, _ = hubs.record(i)
+            if not dict.__contains__(self.hubs, id_):
+                hub = hub_from_record({"id": id_})
+                link_hub(hub, new_dwellings.get(dwelling_id))
+                dict.__setitem__(self.hubs, id_, hub)
+                new_hubs[id_] = hub
+        for i in range(devices.count):
+            record = devices.record(i)
+            id_ = record[0]
+            if id_ not in self._removed and not dict.__contains__(self.devices, id_):
+                self._load_device(record, new_hubs.get(record[2]))
+
+        for hub in dict.values(self.hubs):
+            self.index.add_hub(hub)
+        for device in dict.values(self.devices):
+            self.index.add(device)
+        self.dwelling_order.reset(dwellings.keys())
+        self.device_order.reset(
+            id_ for id_ in devices.keys() if id_ not in self._removed
+        )
+        _reorder(self.dwellings, InsertionOrder.after(self.dwelling_order))
+        _reorder(self.devices, InsertionOrder.after(self.device_order))
+
+    def _exists(self, section: int, key) -> bool:
+        if section == DEVICES and key in self._removed:
+            return False
+        return isinstance(key, str) and self._sections[section].find(key) is not None
+
+    def _fault(self, section: int, key):
+        if section == DEVICES and key in self._removed:
+            raise KeyError(key)
+        mapping = (self.dwellings, self.hubs, self.devices)[section]
+        if dict.__contains__(mapping, key):
+            return
+        i = self._sections[section].find(key) if isinstance(key, str) else None
+        if i is None:
+            raise KeyError(key)
+
+        # entities are materialized a whole dwelling (or hub) at a time, so
+        # back-references always point at live objects
+        record = self._sections[section].record(i)
+        if section == DWELLINGS:
+            self._load_dwelling(record)
+        elif section == HUBS:
+            if record[1] is not None:
+                self._fault(DWELLINGS, record[1])
+            if not dict.__contains__(self.hubs, key):
+                self._load_hub(record, None)
+        else:
+            if record[2] is not None:
+                self._fault(HUBS, record[2])
+            if not dict.__contains__(self.devices, key):
+                self._load_device(record, None)
+
+    def _load_dwelling(self, record: Tuple):
+        id_, state, hub_ids = record
+        dwelling = dwelling_from_record({"id": id_, "state": state})
+        dict.__setitem__(self.dwellings, id_, dwelling)
+        hubs = self._sections[HUBS]
+        for hub_id in hub_ids:
+            if not dict.__contains__(self.hubs, hub_id):
+                self._load_hub(hubs.record(hubs.find(hub_id)), dwelling)
+
+    def _load_hub(self, record: Tuple, dwelling: Optional[Dwelling]):
+        id_, _, device_ids = record
+        hub = hub_from_record({"id": id_})
+        link_hub(hub, dwelling)
+        dict.__setitem__(self.hubs, id_, hub)
+        devices = self._sections[DEVICES]
+        for device_id in device_ids:
+            if device_id in self._removed or dict.__contains__(self.devices, device_id):
+                continue
+            self._load_device(devices.record(devices.find(device_id)), hub)
+
+    def _load_device(self, record: Tuple, hub: Optional[Hub]):
+        id_, type_, _, attrs = record
+        device = device_from_record({"id": id_, "type": type_, "attrs": attrs})
+        link_device(device, hub)
+        dict.__setitem__(self.devices, id_, device)
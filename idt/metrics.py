@@ -0,0 +1,308 @@
+import collections.abc
+import contextlib
+import functools
+import inspect
+import os
+import threading
+import time
+import typing
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+T = TypeVar("T")
+
+# buckets are log-linear like HdrHistogram: every power of two is split into
+# 2**SUB_BITS / 2 buckets, which keeps any recorded value within ~6%
+SUB_BITS = 5
+SUB_MASK = (1 << SUB_BITS) - 1
+# enough for about 18 minutes in nanoseconds, anything longer lands in the last
+BUCKETS = 40 << SUB_BITS
+
+# upper bounds, in seconds, of the buckets exported to Prometheus
+EXPORT_BOUNDS = (
+    1e-6,
+    2.5e-6,
+    5e-6,
+    1e-5,
+    2.5e-5,
+    5e-5,
+    1e-4,
+    2.5e-4,
+    5e-4,
+    1e-3,
+    2.5e-3,
+    5e-3,
+    1e-2,
+    2.5e-2,
+    5e-2,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+)
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+_now = time.perf_counter_ns
+
+
+def _bucket_max(index: int) -> int:
+    shift = index >> SUB_BITS
+    if shift == 0:
+        return index
+    return (((index & SUB_MASK) + 1) << shift) - 1
+
+
+@dataclass
+class Histogram:
+    counts: List[int] = field(default_factory=lambda: [0] * BUCKETS)
+    count: int = 0
+    total: int = 0
+    max: int = 0
+
+    def record(self, value: int):
+        shift = value.bit_length() - SUB_BITS
+        index = value if shift <= 0 else (shift << SUB_BITS) + (value >> shift)
+        self.counts[min(index, BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q: float) -> int:
+        if not self.count:
+            return 0
+        rank = max(1, round(q * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(_bucket_max(index), self.max)
+        return self.max
+
+    def cumulative(self, bounds: Tuple[int, ...]) -> Tuple[int, ...]:
+        # a bucket counts towards a bound once its whole range is below it
+        buckets = [(i, count) for i, count in enumerate(self.counts) if count]
+        result = []
+        seen = 0
+        i = 0
+        for bound in bounds:
+            while i < len(buckets) and _bucket_max(buckets[i][0]) <= bound:
+                seen += buckets[i][1]
+                i += 1
+            result.append(seen)
+        return tuple(result)
+
+
+@dataclass
+class MethodStats:
+    calls: int = 0
+    errors: int = 0
+    latency: Histogram = field(default_factory=Histogram)
+    _lock: threading.Lock = field(
+        init=False, repr=False, compare=False, default_factory=threading.Lock
+    )
+
+    def record(self, elapsed_ns: int, failed: bool):
+        with self._lock:
+            self.calls += 1
+            if failed:
+                self.errors += 1
+            # Histogram.record inlined, this runs on every instrumented call
+            latency = self.latency
+            shift = elapsed_ns.bit_length() - SUB_BITS
+            index = (
+                elapsed_ns
+                if shift <= 0
+                else (shift << SUB_BITS) + (elapsed_ns >> shift)
+            )
+            latency.counts[index if index < BUCKETS else BUCKETS - 1] += 1
+            latency.count += 1
+            latency.total += elapsed_ns
+            if elapsed_ns > latency.max:
+                latency.max = elapsed_ns
+
+    def reset(self):
+        with self._lock:
+            self.calls = self.errors = 0
+            self.latency = Histogram()
+
+    def summary(self) -> Mapping[str, Any]:
+        with self._lock:
+            latency = self.latency
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "mean_us": latency.total / latency.count / 1000 if latency.count else 0,
+                "max_us": latency.max / 1000,
+                **{
+                    f"p{round(q * 100)}_us": latency.percentile(q) / 1000
+                    for q in QUANTILES
+                },
+            }
+
+
+@dataclass
+class Metrics:
+    enabled: bool = True
+    prefix: str = "idt"
+    methods: Dict[Tuple[str, str], MethodStats] = field(default_factory=dict)
+    _lock: threading.Lock = field(
+        init=False, repr=False, compare=False, default_factory=threading.Lock
+    )
+
+    def stats(self, component: str, method: str) -> MethodStats:
+        key = (component, method)
+        stats = self.methods.get(key)
+        if stats is None:
+            with self._lock:
+                stats = self.methods.setdefault(key, MethodStats())
+        return stats
+
+    def reset(self):
+        # instrumented methods hold on to their stats, so clear them in place
+        for stats in list(self.methods.values()):
+            stats.reset()
+
+    def snapshot(self) -> Mapping[str, Mapping[str, Any]]:
+        return {
+            f"{component}.{method}": stats.summary()
+            for (component, method), stats in sorted(self.methods.items())
+        }
+
+    def to_prometheus(self) -> str:
+        name = self.prefix
+        methods = sorted(self.methods.items())
+        bounds = tuple(round(bound * 1e9) for bound in EXPORT_BOUNDS)
+        lines = [
+            f"# HELP {name}_calls_total Calls per method.",
+            f"# TYPE {name}_calls_total counter",
+        ]
+        for key, stats in methods:
+            lines.append(f"{name}_calls_total{{{_labels(*key)}}} {stats.calls}")
+        lines += [
+            f"# HELP {name}_errors_total Calls per method that raised.",
+            f"# TYPE {name}_errors_total counter",
+        ]
+        for key, stats in methods:
+            lines.append(f"{name}_errors_total{{{_labels(*key)}}} {stats.errors}")
+        lines += [
+            f"# HELP {name}_latency_seconds Latency per method.",
+            f"# TYPE {name}_latency_seconds histogram",
+        ]
+        for key, stats in methods:
+            labels = _labels(*key)
+            with stats._lock:
+                latency = stats.latency
+                counts = latency.cumulative(bounds)
+                count, total = latency.count, latency.total
+            for bound, seen in zip(EXPORT_BOUNDS, counts):
+                lines.append(
+                    f'{name}_latency_seconds_bucket{{{labels},le="{bound}"}} {seen}'
+                )
+            lines += [
+                f'{name}_latency_seconds_bucket{{{labels},le="+Inf"}} {count}',
+                f"{name}_latency_seconds_sum{{{labels}}} {total / 1e9}",
+                f"{name}_latency_seconds_count{{{labels}}} {count}",
+            ]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        # written aside and renamed so a collector never reads half a file
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as file:
+            file.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+    def serve(self, port: int = 9464, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def _labels(component: str, method: str) -> str:
+    return f'component="{component}",method="{method}"'
+
+
+def _timed(metrics: Metrics, stats: MethodStats, fn: Callable[..., T]) -> Callable:
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs) -> T:
+        if not metrics.enabled:
+            return fn(*args, **kwargs)
+        start = _now()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException:
+            stats.record(_now() - start, True)
+            raise
+        stats.record(_now() - start, False)
+        return result
+
+    return wrapper
+
+
+def _timed_iter(metrics: Metrics, stats: MethodStats, fn: Callable) -> Callable:
+    # an iterator's cost is in consuming it, so time until it is exhausted
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs) -> Iterator:
+        if not metrics.enabled:
+            return fn(*args, **kwargs)
+        return _consume(stats, fn, args, kwargs)
+
+    return wrapper
+
+
+def _consume(stats: MethodStats, fn: Callable, args, kwargs) -> Iterator:
+    start = _now()
+    try:
+        yield from fn(*args, **kwargs)
+    except BaseException:
+        stats.record(_now() - start, True)
+        raise
+    stats.record(_now() - start, False)
+
+
+def _returns(fn: Callable, *types: type) -> bool:
+    annotation = inspect.signature(fn).return_annotation
+    return (typing.get_origin(annotation) or annotation) in types
+
+
+def instrument(target: T, metrics: Metrics, component: Optional[str] = None) -> T:
+    # wraps the instance's public methods in place, so anything already holding
+    # the instance (usecases holding a repository) is measured too
+    component = component or type(target).__name__
+    for name, fn in inspect.getmembers(type(target), inspect.isfunction):
+        if name.startswith("_") or _returns(fn, contextlib.AbstractContextManager):
+            continue
+        method = getattr(target, name)
+        stats = metrics.stats(component, name)
+        if _returns(fn, collections.abc.Iterator):
+            setattr(target, name, _timed_iter(metrics, stats, method))
+        else:
+            setattr(target, name, _timed(metrics, stats, method))
+    return target
@@ -0,0 +1,220 @@
+import bisect
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Set, Tuple
+
+from idt.domains import Dwelling, Hub, TypeDevice
+from idt.repositories import Store
+from idt.serialization import (
+    Record,
+    device_from_record,
+    device_record,
+    dwelling_from_record,
+    dwelling_record,
+    hub_from_record,
+    hub_record,
+    link_device,
+    link_hub,
+)
+
+DEVICES = "devices"
+HUBS = "hubs"
+DWELLINGS = "dwellings"
+
+# (version, record) oldest first; a None record is a delete
+Chain = List[Tuple[int, Optional[Record]]]
+
+
+def _at(chain: Optional[Chain], version: int) -> Optional[Record]:
+    if chain is None:
+        return None
+    i = bisect.bisect_right(chain, version, key=lambda entry: entry[0])
+    return chain[i - 1][1] if i else None
+
+
+@dataclass(eq=False)
+class Snapshot:
+    store: "VersionedStore"
+    version: int
+    _keys: Mapping[str, Sequence[str]] = field(repr=False)
+    _closed: bool = field(init=False, repr=False, default=False)
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.store._release(self.version)
+
+    def device(self, id_: str) -> Optional[Record]:
+        return self._get(DEVICES, id_)
+
+    def hub(self, id_: str) -> Optional[Record]:
+        return self._get(HUBS, id_)
+
+    def dwelling(self, id_: str) -> Optional[Record]:
+        return self._get(DWELLINGS, id_)
+
+    def devices(self) -> Iterator[Record]:
+        return self._iter(DEVICES)
+
+    def hubs(self) -> Iterator[Record]:
+        return self._iter(HUBS)
+
+    def dwellings(self) -> Iterator[Record]:
+        return self._iter(DWELLINGS)
+
+    def to_store(self) -> Store:
+        # a private object graph, so the repositories can read it as usual
+        dwellings = {r["id"]: dwelling_from_record(r) for r in self.dwellings()}
+        hubs = {}
+        for record in self.hubs():
+            hub = hubs[record["id"]] = hub_from_record(record)
+            link_hub(hub, dwellings.get(record["dwelling_id"]))
+        devices = {}
+        for record in self.devices():
+            device = devices[record["id"]] = device_from_record(record)
+            link_device(device, hubs.get(record["hub_id"]))
+        return Store(devices=devices, dwellings=dwellings, hubs=hubs)
+
+    def _get(self, kind: str, id_: str) -> Optional[Record]:
+        if self._closed:
+            raise ValueError(f"Snapshot closed: version={self.version}")
+        return _at(self.store._chains[kind].get(id_), self.version)
+
+    def _iter(self, kind: str) -> Iterator[Record]:
+        for id_ in self._keys[kind]:
+            record = self._get(kind, id_)
+            if record is not None:
+                yield record
+
+
+@dataclass(kw_only=True)
+class VersionedStore(Store):
+    # the last committed version; writes in a transaction share the next one
+    # and become visible together when it ends
+    version: int = field(init=False, default=0)
+    _chains: Dict[str, Dict[str, Chain]] = field(init=False, repr=False)
+    _dirty: Set[Tuple[str, str]] = field(init=False, repr=False)
+    _readers: Counter = field(init=False, repr=False)
+    _depth: int = field(init=False, repr=False, default=0)
+    _versions_lock: threading.Lock = field(init=False, repr=False)
+    # the pending version is shared, so a transaction holds this for its
+    # whole extent and another thread's writes wait rather than join it
+    _write_lock: threading.RLock = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._chains = {DEVICES: {}, HUBS: {}, DWELLINGS: {}}
+        self._dirty = set()
+        self._readers = Counter()
+        self._versions_lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        super().__post_init__()
+        for dwelling in self.dwellings.values():
+            self._chains[DWELLINGS][dwelling.id] = [(0, dwelling_record(dwelling))]
+        for hub in self.hubs.values():
+            self._chains[HUBS][hub.id] = [(0, hub_record(hub))]
+        for device in self.devices.values():
+            self._chains[DEVICES][device.id] = [(0, device_record(device))]
+
+    def put_device(self, device: TypeDevice):
+        with self._write_lock:
+            super().put_device(device)
+            self._write(DEVICES, device.id, device_record(device))
+
+    def pop_device(self, id_: str) -> TypeDevice:
+        with self._write_lock:
+            device = super().pop_device(id_)
+            self._write(DEVICES, id_, None)
+            return device
+
+    def put_hub(self, hub: Hub):
+        with self._write_lock:
+            super().put_hub(hub)
+            self._write(HUBS, hub.id, hub_record(hub))
+
+    def put_dwelling(self, dwelling: Dwelling):
+        with self._write_lock:
+            super().put_dwelling(dwelling)
+            self._write(DWELLINGS, dwelling.id, dwelling_record(dwelling))
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        with self._write_lock:
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    with self._versions_lock:
+                        self._commit()
+
+    def snapshot(self) -> Snapshot:
+        with self._versions_lock:
+            self._readers[self.version] += 1
+            # what exists now is all the snapshot can see; copying the keys is
+            # the only time it holds writers up
+            keys = {kind: list(chains) for kind, chains in self._chains.items()}
+            return Snapshot(self, self.version, keys)
+
+    def chain_lengths(self) -> Mapping[str, int]:
+        with self._versions_lock:
+            return {
+                kind: sum(len(chain) for chain in chains.values())
+                for kind, chains in self._chains.items()
+            }
+
+    def _write(self, kind: str, id_: str, record: Optional[Record]):
+        with self._versions_lock:
+            version = self.version + 1
+            chains = self._chains[kind]
+            chain = chains.get(id_)
+            if chain is None:
+                chains[id_] = [(version, record)]
+            elif chain[-1][0] == version:
+                # written again in the same transaction
+                chain[-1] = (version, record)
+            else:
+                chain.append((version, record))
+                self._dirty.add((kind, id_))
+            if record is None:
+                self._dirty.add((kind, id_))
+            if self._depth == 0:
+                self._commit()
+
+    def _commit(self):
+        self.version += 1
+        # while a snapshot is open the horizon cannot move until one closes,
+        # so collecting here would only rescan the same chains
+        if self._dirty and not self._readers:
+            self._collect()
+
+    def _release(self, version: int):
+        with self._versions_lock:
+            self._readers[version] -= 1
+            if not self._readers[version]:
+                del self._readers[version]
+            self._collect()
+
+    def _collect(self):
+        # entries older than the last one every open snapshot can see are
+        # unreachable; chains are replaced rather than edited so readers
+        # walking the old list are unaffected
+        horizon = min(self._readers, default=self.version)
+        for kind, id_ in list(self._dirty):
+            chains = self._chains[kind]
+            chain = chains[id_]
+            i = bisect.bisect_right(chain, horizon, key=lambda entry: entry[0])
+            if i > 1:
+                chain = chains[id_] = chain[i - 1 :]
+            if len(chain) == 1 and chain[0][0] <= horizon:
+                self._dirty.discard((kind, id_))
+                if chain[0][1] is None:
+                    del chains[id_]
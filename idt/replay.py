@@ -0,0 +1,534 @@
+import argparse
+import collections.abc
+import functools
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+    TypeVar,
+)
+
+from idt.domains import Dwelling, Hub, TypeDevice
+from idt.metrics import MethodStats
+from idt.repositories import (
+    DeviceRepository,
+    DwellingRepository,
+    HubRepository,
+    Store,
+)
+from idt.serialization import (
+    DEVICE_TYPES,
+    attrs_from_record,
+    attrs_record,
+    device_attrs,
+)
+from idt.transfer import import_store
+from idt.usecases import DeviceUsecases, DwellingUsecases, HubUsecases
+
+T = TypeVar("T")
+
+# one JSON object per line: {"at": <unix seconds>, "op": <op>, ...arguments}
+Entry = Mapping[str, Any]
+
+CREATE_DEVICE = "create_device"
+UPDATE_DEVICE = "update_device"
+DELETE_DEVICE = "delete_device"
+PAIR_DEVICE = "pair_device"
+UNPAIR_DEVICE = "unpair_device"
+APPLY_SCENE = "apply_scene"
+INSTALL_HUB = "install_hub"
+OCCUPY = "occupy"
+VACATE = "vacate"
+# there are no usecases that create these, so only hand-written logs have them;
+# a captured log is replayed over an import of the store it was captured from
+CREATE_HUB = "create_hub"
+CREATE_DWELLING = "create_dwelling"
+
+
+@dataclass
+class CommandLog:
+    file: TextIO
+    clock: Callable[[], float] = time.time
+    _lock: threading.Lock = field(
+        init=False, repr=False, compare=False, default_factory=threading.Lock
+    )
+
+    def write(self, op: str, **args):
+        line = json.dumps({"at": self.clock(), "op": op, **args})
+        with self._lock:
+            self.file.write(line + "\n")
+
+
+def _created(device: TypeDevice) -> Tuple[str, Mapping]:
+    return CREATE_DEVICE, {
+        "type": type(device).__name__,
+        "id": device.id,
+        "attrs": device_attrs(device),
+    }
+
+
+def _create_device(device: TypeDevice, device_cls, **attrs):
+    return [_created(device)]
+
+
+def _create_devices(devices: Sequence[TypeDevice], specs):
+    return [_created(device) for device in devices]
+
+
+def _update_device(result, id_: str, **attrs):
+    return [(UPDATE_DEVICE, {"id": id_, "attrs": attrs_record(attrs)})]
+
+
+def _update_devices(result, updates: Mapping[str, Mapping]):
+    return [
+        (UPDATE_DEVICE, {"id": id_, "attrs": attrs_record(attrs)})
+        for id_, attrs in updates.items()
+    ]
+
+
+def _delete_device(result, id_: str):
+    return [(DELETE_DEVICE, {"id": id_})]
+
+
+def _delete_devices(result, ids: Iterable[str]):
+    return [(DELETE_DEVICE, {"id": id_}) for id_ in ids]
+
+
+def _pair_device(result, id_: str, device_id: str):
+    return [(PAIR_DEVICE, {"hub_id": id_, "device_id": device_id})]
+
+
+def _pair_devices(result, id_: str, device_ids: Iterable[str], move: bool = False):
+    extra = {"move": True} if move else {}
+    return [
+        (PAIR_DEVICE, {"hub_id": id_, "device_id": device_id, **extra})
+        for device_id in dict.fromkeys(device_ids)
+    ]
+
+
+def _unpair_device(result, id_: str, device_id: str):
+    return [(UNPAIR_DEVICE, {"hub_id": id_, "device_id": device_id})]
+
+
+def _unpair_devices(result, id_: str, device_ids: Iterable[str]):
+    return [
+        (UNPAIR_DEVICE, {"hub_id": id_, "device_id": device_id})
+        for device_id in dict.fromkeys(device_ids)
+    ]
+
+
+def _apply_scene(result, ids: Iterable[str], scene):
+    return [
+        (
+            APPLY_SCENE,
+            {
+                "ids": list(ids),
+                "scene": {cls.__name__: attrs_record(a) for cls, a in scene.items()},
+            },
+        )
+    ]
+
+
+def _install_hub(result, id_: str, hub_id: str):
+    return [(INSTALL_HUB, {"dwelling_id": id_, "hub_id": hub_id})]
+
+
+def _occupy(result, id_: str):
+    return [(OCCUPY, {"id": id_})]
+
+
+def _vacate(result, id_: str):
+    return [(VACATE, {"id": id_})]
+
+
+# what each captured method writes, from its result and arguments; the other
+# usecases either only read or (apply_to_devices) go through one of these
+CAPTURED: Mapping[type, Mapping[str, Callable]] = {
+    DeviceUsecases: {
+        "create_device": _create_device,
+        "create_devices": _create_devices,
+        "update_device": _update_device,
+        "update_devices": _update_devices,
+        "delete_device": _delete_device,
+        "delete_devices": _delete_devices,
+    },
+    HubUsecases: {
+        "pair_device": _pair_device,
+        "pair_devices": _pair_devices,
+        "unpair_device": _unpair_device,
+        "unpair_devices": _unpair_devices,
+    },
+    DwellingUsecases: {
+        "apply_scene": _apply_scene,
+        "install_hub": _install_hub,
+        "occupy": _occupy,
+        "vacate": _vacate,
+    },
+}
+
+
+def capture(target: T, log: CommandLog) -> T:
+    # like metrics.instrument, wraps the instance's methods in place; only
+    # calls that succeed are written, a failed one changed nothing
+    # a subclass of a usecase records the same calls as the usecase
+    captured = next(
+        (CAPTURED[cls] for cls in type(target).__mro__ if cls in CAPTURED), None
+    )
+    if captured is None:
+        raise TypeError(f"Nothing to capture: type={type(target).__name__}")
+    for name, entries in captured.items():
+        setattr(target, name, _captured(log, getattr(target, name), entries))
+    return target
+
+
+def _captured(log: CommandLog, method: Callable, entries: Callable) -> Callable:
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        # one-shot iterables are read here so both the call and the log see them
+        args = [_materialized(a) for a in args]
+        kwargs = {k: _materialized(v) for k, v in kwargs.items()}
+        result = method(*args, **kwargs)
+        for op, values in entries(result, *args, **kwargs):
+            log.write(op, **values)
+        return result
+
+    return wrapper
+
+
+def _materialized(value: Any) -> Any:
+    return list(value) if isinstance(value, collections.abc.Iterator) else value
+
+
+def read_log(file: TextIO) -> Iterator[Entry]:
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+@dataclass
+class ReplayReport:
+    entries: int
+    errors: int
+    elapsed_s: float
+    # the furthest a paced replay fell behind the recorded timing
+    behind_s: float
+    calls: Mapping[str, Mapping[str, Any]]
+    failures: Mapping[str, int]
+
+    @property
+    def throughput(self) -> float:
+        return self.entries / self.elapsed_s if self.elapsed_s else 0.0
+
+
+@dataclass
+class Replayer:
+    devices: DeviceUsecases
+    hubs: HubUsecases
+    dwellings: DwellingUsecases
+    # consecutive entries merged into one batch usecase call, at most
+    batch_size: int = 1
+    # None replays as fast as possible; otherwise the recorded gaps between
+    # entries are kept, divided by this
+    speed: Optional[float] = None
+    strict: bool = False
+    clock: Callable[[], float] = time.monotonic
+    sleep: Callable[[float], None] = time.sleep
+    # recorded id to the id the replay created for it; anything else is taken
+    # to exist already under its recorded id
+    ids: Dict[str, str] = field(default_factory=dict)
+    stats: Dict[str, MethodStats] = field(default_factory=dict)
+    entries: Counter = field(default_factory=Counter)
+    failures: Counter = field(default_factory=Counter)
+
+    @classmethod
+    def of(cls, store: Store, **options) -> "Replayer":
+        device_repo = DeviceRepository(store)
+        hub_repo = HubRepository(store)
+        return cls(
+            DeviceUsecases(device_repo),
+            HubUsecases(hub_repo, device_repo),
+            DwellingUsecases(DwellingRepository(store), hub_repo, device_repo),
+            **options,
+        )
+
+    def replay(self, entries: Iterable[Entry]) -> ReplayReport:
+        entries = iter(entries)
+        pending = next(entries, None)
+        start = self.clock()
+        origin = pending["at"] if pending is not None else 0.0
+        behind = 0.0
+        while pending is not None:
+            if self.speed is not None:
+                delay = self._due(pending, start, origin) - self.clock()
+                if delay > 0:
+                    self.sleep(delay)
+                else:
+                    behind = max(behind, -delay)
+
+            group = [pending]
+            key = _batch_key(pending)
+            # a device touched twice is applied in two calls, keeping log order
+            touched = {_target(pending)}
+            pending = next(entries, None)
+            while (
+                pending is not None
+                and key is not None
+                and len(group) < self.batch_size
+                and _batch_key(pending) == key
+                and (_target(pending) is None or _target(pending) not in touched)
+                and (
+                    self.speed is None
+                    or self._due(pending, start, origin) <= self.clock()
+                )
+            ):
+                group.append(pending)
+                touched.add(_target(pending))
+                pending = next(entries, None)
+            self._apply(group)
+
+        return ReplayReport(
+            entries=sum(self.entries.values()),
+            errors=sum(self.failures.values()),
+            elapsed_s=self.clock() - start,
+            behind_s=behind,
+            calls={name: stats.summary() for name, stats in sorted(self.stats.items())},
+            failures=dict(self.failures),
+        )
+
+    def _due(self, entry: Entry, start: float, origin: float) -> float:
+        return start + (entry["at"] - origin) / self.speed
+
+    def _apply(self, group: Sequence[Entry]):
+        op = group[0]["op"]
+        self.entries[op] += len(group)
+        if len(group) > 1:
+            if self._call(BATCHED[op], group, quiet=True):
+                return
+            # a batch is validated before anything changes, so retrying its
+            # entries one at a time finds the bad ones without doubling writes
+        for entry in group:
+            self._call(op, [entry])
+
+    def _call(self, name: str, group: Sequence[Entry], quiet: bool = False) -> bool:
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = MethodStats()
+        start = time.perf_counter_ns()
+        try:
+            APPLY.get(name, Replayer._unknown)(self, group)
+        except Exception as e:
+            stats.record(time.perf_counter_ns() - start, True)
+            if self.strict:
+                raise
+            if not quiet:
+                self.failures[f"{name}: {type(e).__name__}"] += 1
+            return False
+        stats.record(time.perf_counter_ns() - start, False)
+        return True
+
+    def _id(self, id_: Optional[str]) -> Optional[str]:
+        return self.ids.get(id_, id_)
+
+    def _device_attrs(self, entry: Entry) -> Mapping[str, Any]:
+        device_cls = type(self.devices.repo.get(self._id(entry["id"])))
+        return attrs_from_record(device_cls, entry["attrs"])
+
+    def _unknown(self, group: Sequence[Entry]):
+        raise ValueError(f"Unknown op: op={group[0]['op']}")
+
+    def _create_devices(self, group: Sequence[Entry]):
+        specs = [
+            (
+                DEVICE_TYPES[entry["type"]],
+                attrs_from_record(DEVICE_TYPES[entry["type"]], entry["attrs"]),
+            )
+            for entry in group
+        ]
+        if len(group) == 1:
+            devices = [self.devices.create_device(specs[0][0], **specs[0][1])]
+        else:
+            devices = self.devices.create_devices(specs)
+        for entry, device in zip(group, devices):
+            if entry.get("id") is not None:
+                self.ids[entry["id"]] = device.id
+
+    def _update_devices(self, group: Sequence[Entry]):
+        if len(group) == 1:
+            (entry,) = group
+            self.devices.update_device(
+                self._id(entry["id"]), **self._device_attrs(entry)
+            )
+        else:
+            self.devices.update_devices(
+                {self._id(entry["id"]): self._device_attrs(entry) for entry in group}
+            )
+
+    def _delete_devices(self, group: Sequence[Entry]):
+        if len(group) == 1:
+            self.devices.delete_device(self._id(group[0]["id"]))
+        else:
+            self.devices.delete_devices([self._id(entry["id"]) for entry in group])
+
+    def _pair_devices(self, group: Sequence[Entry]):
+        hub_id = self._id(group[0]["hub_id"])
+        move = group[0].get("move", False)
+        if len(group) == 1 and not move:
+            self.hubs.pair_device(hub_id, self._id(group[0]["device_id"]))
+        else:
+            self.hubs.pair_devices(
+                hub_id, [self._id(entry["device_id"]) for entry in group], move=move
+            )
+
+    def _unpair_devices(self, group: Sequence[Entry]):
+        hub_id = self._id(group[0]["hub_id"])
+        if len(group) == 1:
+            self.hubs.unpair_device(hub_id, self._id(group[0]["device_id"]))
+        else:
+            self.hubs.unpair_devices(
+                hub_id, [self._id(entry["device_id"]) for entry in group]
+            )
+
+    def _apply_scene(self, group: Sequence[Entry]):
+        (entry,) = group
+        scene = {
+            DEVICE_TYPES[name]: attrs_from_record(DEVICE_TYPES[name], attrs)
+            for name, attrs in entry["scene"].items()
+        }
+        self.dwellings.apply_scene([self._id(id_) for id_ in entry["ids"]], scene)
+
+    def _install_hub(self, group: Sequence[Entry]):
+        (entry,) = group
+        self.dwellings.install_hub(
+            self._id(entry["dwelling_id"]), self._id(entry["hub_id"])
+        )
+
+    def _occupy(self, group: Sequence[Entry]):
+        self.dwellings.occupy(self._id(group[0]["id"]))
+
+    def _vacate(self, group: Sequence[Entry]):
+        self.dwellings.vacate(self._id(group[0]["id"]))
+
+    def _create_hub(self, group: Sequence[Entry]):
+        repo = self.hubs.repo
+        hub = Hub(id=repo.store.ids.allocate())
+        repo.save(hub)
+        self.ids[group[0]["id"]] = hub.id
+
+    def _create_dwelling(self, group: Sequence[Entry]):
+        repo = self.dwellings.repo
+        dwelling = Dwelling(id=repo.store.ids.allocate())
+        repo.save(dwelling)
+        self.ids[group[0]["id"]] = dwelling.id
+
+
+APPLY: Mapping[str, Callable[[Replayer, Sequence[Entry]], None]] = {
+    CREATE_DEVICE: Replayer._create_devices,
+    UPDATE_DEVICE: Replayer._update_devices,
+    DELETE_DEVICE: Replayer._delete_devices,
+    PAIR_DEVICE: Replayer._pair_devices,
+    UNPAIR_DEVICE: Replayer._unpair_devices,
+    APPLY_SCENE: Replayer._apply_scene,
+    INSTALL_HUB: Replayer._install_hub,
+    OCCUPY: Replayer._occupy,
+    VACATE: Replayer._vacate,
+    CREATE_HUB: Replayer._create_hub,
+    CREATE_DWELLING: Replayer._create_dwelling,
+}
+
+# the batch usecase consecutive entries of an op are merged into
+BATCHED: Mapping[str, str] = {
+    CREATE_DEVICE: "create_devices",
+    UPDATE_DEVICE: "update_devices",
+    DELETE_DEVICE: "delete_devices",
+    PAIR_DEVICE: "pair_devices",
+    UNPAIR_DEVICE: "unpair_devices",
+}
+APPLY = {**APPLY, **{batch: APPLY[op] for op, batch in BATCHED.items()}}
+
+
+def _batch_key(entry: Entry) -> Optional[Hashable]:
+    op = entry["op"]
+    if op not in BATCHED:
+        return None
+    if op in (PAIR_DEVICE, UNPAIR_DEVICE):
+        return op, entry["hub_id"], entry.get("move", False)
+    return op
+
+
+def _target(entry: Entry) -> Optional[str]:
+    return entry.get("device_id", entry.get("id"))
+
+
+def _format(name: str, summary: Mapping[str, Any], elapsed: float) -> str:
+    rate = summary["calls"] / elapsed if elapsed else 0.0
+    return (
+        f"{name:<16} {summary['calls']:>9,} {summary['errors']:>7,} "
+        f"{rate:>12,.0f}/s {summary['p50_us']:>9.1f} {summary['p90_us']:>9.1f} "
+        f"{summary['p99_us']:>9.1f} {summary['max_us']:>10.1f}"
+    )
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Replay a log of usecase calls")
+    parser.add_argument("log", help="JSON Lines command log, - for stdin")
+    parser.add_argument("--store", help="replay over a store export")
+    parser.add_argument("--store-format", default="binary", choices=["binary", "jsonl"])
+    parser.add_argument("--batch", type=int, default=1)
+    parser.add_argument(
+        "--speed",
+        type=float,
+        help="keep the recorded timing, sped up by this; as fast as possible if unset",
+    )
+    parser.add_argument("--strict", action="store_true", help="stop at the first error")
+    parser.add_argument("--output", help="write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    store = Store()
+    if args.store:
+        with open(args.store, "rb") as file:
+            store = import_store(file, fmt=args.store_format)
+
+    replayer = Replayer.of(
+        store, batch_size=args.batch, speed=args.speed, strict=args.strict
+    )
+    log = sys.stdin if args.log == "-" else open(args.log)
+    with log:
+        report = replayer.replay(read_log(log))
+
+    print(
+        f"{report.entries:,} entries in {report.elapsed_s:.2f}s "
+        f"({report.throughput:,.0f}/s), {report.errors:,} errors, "
+        f"{report.behind_s * 1000:.1f} ms behind at worst"
+    )
+    print(
+        f"{'call':<16} {'calls':>9} {'errors':>7} {'rate':>14} "
+        f"{'p50 us':>9} {'p90 us':>9} {'p99 us':>9} {'max us':>10}"
+    )
+    for name, summary in report.calls.items():
+        print(_format(name, summary, report.elapsed_s))
+    for failure, count in sorted(report.failures.items()):
+        print(f"failed {failure}: {count:,}")
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(
+                {**asdict(report), "throughput": report.throughput}, file, indent=2
+            )
+
+
+if __name__ == "__main__":
+    main()
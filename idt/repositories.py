@@ -1,8 +1,80 @@
-import uuid
+import itertools
+from contextlib import contextmanager
 from dataclasses import dataclass, field
-from typing import Mapping, Sequence
+from enum import Enum
+from typing import (
+    Callable,
+    ContextManager,
+    Generic,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
 
 from idt.domains import Dwelling, Hub, TypeDevice
+from idt.ids import IdAllocator, UUIDAllocator
+from idt.indexes import DeviceIndex, InsertionOrder
+
+T = TypeVar("T")
+
+PUT_DEVICE = "put_device"
+POP_DEVICE = "pop_device"
+PUT_HUB = "put_hub"
+PUT_DWELLING = "put_dwelling"
+
+# called with the event and the id of what it touched, after the store applied it
+Listener = Callable[[str, str], None]
+
+
+def _iter(order: InsertionOrder, entities: Mapping[str, T]) -> Iterator[T]:
+    for _, id_ in order.after():
+        entity = entities.get(id_)
+        if entity is not None:
+            yield entity
+
+
+def _save_hub(store: "Store", hub: Hub):
+    # an aggregate the store already holds only writes what its change log
+    # names; a new or replaced object is written out in full
+    stored = store.hubs.get(hub.id) is hub
+    store.put_hub(hub)
+    devices = {device.id: device for device in hub.pop_changes()}
+    if not stored:
+        devices.update(hub.devices)
+    for device in devices.values():
+        store.put_device(device)
+
+
+@dataclass
+class Page(Generic[T]):
+    items: Sequence[T]
+    cursor: Optional[int] = None
+
+
+def _page(
+    entries: Iterator[Tuple[int, str]], entities: Mapping[str, T], limit: int
+) -> Page[T]:
+    # an empty page reads as the end of the list, so it is never a valid ask
+    if limit < 1:
+        raise ValueError(f"Invalid page limit: limit={limit}")
+    # an id removed after the order was read is skipped and the page filled
+    # from the entries after it, so concurrent deletes never fail a read
+    items = []
+    last = None
+    for seq, id_ in entries:
+        entity = entities.get(id_)
+        if entity is None:
+            continue
+        if len(items) == limit:
+            return Page(items, last)
+        items.append(entity)
+        last = seq
+    return Page(items, None)
 
 
 @dataclass
@@ -10,6 +82,80 @@ class Store:
     devices: Mapping[str, TypeDevice] = field(default_factory=dict)
     dwellings: Mapping[str, Dwelling] = field(default_factory=dict)
     hubs: Mapping[str, Hub] = field(default_factory=dict)
+    index: DeviceIndex = field(default_factory=DeviceIndex)
+    device_order: InsertionOrder = field(default_factory=InsertionOrder)
+    dwelling_order: InsertionOrder = field(default_factory=InsertionOrder)
+    # one clock across all devices, so a deleted and recreated id never
+    # reuses a version
+    versions: Mapping[str, int] = field(init=False, repr=False, default_factory=dict)
+    _clock: Iterator[int] = field(
+        init=False, repr=False, default_factory=lambda: itertools.count(1)
+    )
+    listeners: List[Listener] = field(init=False, repr=False, default_factory=list)
+    ids: IdAllocator = field(default_factory=UUIDAllocator, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.ids.advance(self.devices)
+        for hub in self.hubs.values():
+            self.index.add_hub(hub)
+        for device in self.devices.values():
+            self.index.add(device)
+            self.device_order.add(device.id)
+        for id_ in self.dwellings:
+            self.dwelling_order.add(id_)
+
+    def put_device(self, device: TypeDevice):
+        self.devices[device.id] = device
+        self.index.add(device)
+        self.device_order.add(device.id)
+        self.versions[device.id] = next(self._clock)
+        self._notify(PUT_DEVICE, device.id)
+
+    def put_devices(self, devices: Iterable[TypeDevice]):
+        with self.transaction():
+            for device in devices:
+                self.put_device(device)
+
+    def pop_device(self, id_: str) -> TypeDevice:
+        device = self.devices.pop(id_)
+        self.index.discard(id_)
+        self.device_order.discard(id_)
+        self.versions.pop(id_, None)
+        self._notify(POP_DEVICE, id_)
+        return device
+
+    def pop_devices(self, ids: Iterable[str]):
+        with self.transaction():
+            for id_ in ids:
+                self.pop_device(id_)
+
+    def put_hub(self, hub: Hub):
+        self.hubs[hub.id] = hub
+        self.index.add_hub(hub)
+        self._notify(PUT_HUB, hub.id)
+
+    def put_dwelling(self, dwelling: Dwelling):
+        self.dwellings[dwelling.id] = dwelling
+        self.dwelling_order.add(dwelling.id)
+        self._notify(PUT_DWELLING, dwelling.id)
+
+    def subscribe(self, listener: Listener):
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener: Listener):
+        self.listeners.remove(listener)
+
+    @contextmanager
+    def locked(self, *ids: str) -> Iterator[None]:
+        yield
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        yield
+
+    def _notify(self, event: str, id_: str):
+        for listener in self.listeners:
+            listener(event, id_)
 
 
 @dataclass
@@ -20,25 +166,100 @@ class DeviceRepository:
         if device.id is not None:
             raise ValueError(f"Device exists: id={device.id}")
 
-        device.id = uuid.uuid4()
+        id_ = self.store.ids.allocate()
+        # an allocator that was not told what a reloaded store holds could
+        # hand out a live id; never let that overwrite a device
+        if id_ in self.store.devices:
+            raise ValueError(f"Device exists: id={id_}")
+        device.id = id_
         self.save(device)
         return device
 
+    def create_many(self, devices: Sequence[TypeDevice]) -> Sequence[TypeDevice]:
+        for device in devices:
+            if device.id is not None:
+                raise ValueError(f"Device exists: id={device.id}")
+
+        ids = self.store.ids.allocate_many(len(devices))
+        for id_ in ids:
+            if id_ in self.store.devices:
+                raise ValueError(f"Device exists: id={id_}")
+        for device, id_ in zip(devices, ids):
+            device.id = id_
+        self.save_many(devices)
+        return devices
+
     def delete(self, device: TypeDevice):
         if device.hub is not None:
             raise ValueError(
                 f"Device associated with a hub: id={device.id} hub_id={device.hub.id}"
             )
-        del self.store.devices[device.id]
+        self.store.pop_device(device.id)
+
+    def delete_many(self, devices: Sequence[TypeDevice]):
+        for device in devices:
+            if device.hub is not None:
+                raise ValueError(
+                    f"Device associated with a hub: id={device.id} hub_id={device.hub.id}"
+                )
+            if device.id not in self.store.devices:
+                raise KeyError(device.id)
+        self.store.pop_devices({device.id: None for device in devices})
+
+    def find(
+        self,
+        device_cls: Optional[type[TypeDevice]] = None,
+        *,
+        hub_id: Optional[str] = None,
+        dwelling_id: Optional[str] = None,
+        dwelling_ids: Optional[Iterable[str]] = None,
+        state: Optional[Enum] = None,
+        paired: Optional[bool] = None,
+    ) -> Sequence[TypeDevice]:
+        ids = self.store.index.find(
+            device_cls,
+            hub_id=hub_id,
+            dwelling_id=dwelling_id,
+            dwelling_ids=dwelling_ids,
+            state=state,
+            paired=paired,
+        )
+        return [self.store.devices[id_] for id_ in ids]
 
     def get(self, id_: str) -> TypeDevice:
-        return self.store.devices[id_]
+        device = self.store.devices.get(id_)
+        if device is None:
+            # only a miss pays for parsing; another spelling of a stored id
+            # resolves to its canonical, interned form
+            try:
+                canonical = self.store.ids.canonical(id_)
+            except (ValueError, TypeError, AttributeError):
+                raise KeyError(id_) from None
+            device = self.store.devices.get(canonical)
+            if device is None:
+                raise KeyError(id_)
+        return device
+
+    def iter(self) -> Iterator[TypeDevice]:
+        return _iter(self.store.device_order, self.store.devices)
 
     def list(self) -> Sequence[TypeDevice]:
-        return [device for _, device in self.store.devices.items()]
+        return list(self.store.devices.values())
+
+    def locked(self, *ids: str) -> ContextManager[None]:
+        return self.store.locked(*ids)
+
+    def page(self, after: Optional[int] = None, limit: int = 500) -> Page[TypeDevice]:
+        return _page(self.store.device_order.after(after), self.store.devices, limit)
 
     def save(self, device: TypeDevice):
-        self.store.devices[device.id] = device
+        self.store.put_device(device)
+
+    def version(self, id_: str) -> int:
+        return self.store.versions.get(id_, 0)
+
+    def save_many(self, devices: Iterable[TypeDevice]):
+        self.store.put_devices(devices)
 
 
 @dataclass
@@ -48,10 +269,27 @@ class HubRepository:
     def get(self, id_: str) -> Hub:
         return self.store.hubs[id_]
 
+    def iter_devices(self, hub: Hub) -> Iterator[TypeDevice]:
+        after = None
+        while True:
+            page = self.page_devices(hub, after)
+            yield from page.items
+            if page.cursor is None:
+                return
+            after = page.cursor
+
+    def page_devices(
+        self, hub: Hub, after: Optional[int] = None, limit: int = 500
+    ) -> Page[TypeDevice]:
+        entries = self.store.device_order.after_of(hub.devices, after)
+        return _page(entries, hub.devices, limit)
+
+    def locked(self, *ids: str) -> ContextManager[None]:
+        return self.store.locked(*ids)
+
     def save(self, hub: Hub):
-        self.store.hubs[hub.id] = hub
-        for _, device in hub.devices.items():
-            self.store.devices[device.id] = device
+        with self.store.locked(hub.id), self.store.transaction():
+            _save_hub(self.store, hub)
 
 
 @dataclass
@@ -61,12 +299,26 @@ class DwellingRepository:
     def get(self, id_: str) -> Dwelling:
         return self.store.dwellings[id_]
 
+    def iter(self) -> Iterator[Dwelling]:
+        return _iter(self.store.dwelling_order, self.store.dwellings)
+
     def list(self) -> Sequence[Dwelling]:
-        return [dwelling for _, dwelling in self.store.dwellings.items()]
+        return list(self.store.dwellings.values())
+
+    def locked(self, *ids: str) -> ContextManager[None]:
+        return self.store.locked(*ids)
+
+    def page(self, after: Optional[int] = None, limit: int = 500) -> Page[Dwelling]:
+        return _page(
+            self.store.dwelling_order.after(after), self.store.dwellings, limit
+        )
 
     def save(self, dwelling: Dwelling):
-        self.store.dwellings[dwelling.id] = dwelling
-        for _, hub in dwelling.hubs.items():
-            self.store.hubs[hub.id] = hub
-            for _, device in hub.devices.items():
-                self.store.devices[device.id] = device
+        with self.store.locked(dwelling.id), self.store.transaction():
+            stored = self.store.dwellings.get(dwelling.id) is dwelling
+            self.store.put_dwelling(dwelling)
+            hubs = {hub.id: hub for hub in dwelling.pop_changes()}
+            if not stored:
+                hubs.update(dwelling.hubs)
+            for hub in hubs.values():
+                _save_hub(self.store, hub)
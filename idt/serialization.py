@@ -0,0 +1,154 @@
+import struct
+import zlib
+from dataclasses import fields
+from enum import Enum
+from functools import cache
+from typing import Any, BinaryIO, Iterator, Mapping, Optional, Sequence
+
+from idt.domains import (
+    Device,
+    Dimmer,
+    Dwelling,
+    DwellingState,
+    Hub,
+    Lock,
+    Switch,
+    Thermostat,
+    TypeDevice,
+)
+
+DEVICE_TYPES: Mapping[str, type[TypeDevice]] = {
+    cls.__name__: cls for cls in (Device, Switch, Dimmer, Lock, Thermostat)
+}
+
+Record = Mapping[str, Any]
+
+FRAME = struct.Struct("<II")
+
+
+def ref(id_) -> Optional[str]:
+    return None if id_ is None else str(id_)
+
+
+@cache
+def _attrs(device_cls: type[TypeDevice]) -> Mapping[str, Optional[type[Enum]]]:
+    return {
+        f.name: (
+            f.type if isinstance(f.type, type) and issubclass(f.type, Enum) else None
+        )
+        for f in fields(device_cls)
+        if f.name not in ("id", "hub")
+    }
+
+
+@cache
+def _info_fields(device_cls: type[TypeDevice]) -> Sequence[str]:
+    return [
+        f.name for f in fields(device_cls) if f.repr and f.name not in ("id", "hub")
+    ]
+
+
+def device_info(device: TypeDevice) -> str:
+    # the hub is shown by id so the output never walks the rest of the graph
+    hub_id = device.hub.id if device.hub is not None else None
+    attrs = "".join(
+        f", {name}={getattr(device, name)!r}" for name in _info_fields(type(device))
+    )
+    return f"{type(device).__name__}(id={device.id!r}, hub={hub_id!r}{attrs})"
+
+
+def device_attrs(device: TypeDevice) -> Record:
+    attrs = {}
+    for name, enum in _attrs(type(device)).items():
+        value = getattr(device, name)
+        if enum is not None:
+            value = value.name
+        elif not isinstance(value, (str, int, float)):
+            value = list(value)
+        attrs[name] = value
+    return attrs
+
+
+def device_record(device: TypeDevice) -> Record:
+    return {
+        "type": type(device).__name__,
+        "id": ref(device.id),
+        "hub_id": ref(device.hub.id if device.hub is not None else None),
+        "attrs": device_attrs(device),
+    }
+
+
+def device_from_record(record: Record) -> TypeDevice:
+    device_cls = DEVICE_TYPES[record["type"]]
+    return device_cls(id=record["id"], **attrs_from_record(device_cls, record["attrs"]))
+
+
+def attrs_record(attrs: Mapping[str, Any]) -> Record:
+    # a partial set of attributes, as an update carries them
+    record = {}
+    for name, value in attrs.items():
+        if isinstance(value, Enum):
+            value = value.name
+        elif value is not None and not isinstance(value, (str, int, float)):
+            value = list(value)
+        record[name] = value
+    return record
+
+
+def attrs_from_record(device_cls: type[TypeDevice], attrs: Record) -> Record:
+    # names the class does not have pass through for the caller to reject
+    enums = _attrs(device_cls)
+    return {
+        name: value if enums.get(name) is None else enums[name][value]
+        for name, value in attrs.items()
+    }
+
+
+def hub_record(hub: Hub) -> Record:
+    return {
+        "id": ref(hub.id),
+        "dwelling_id": ref(hub.dwelling.id if hub.dwelling is not None else None),
+    }
+
+
+def hub_from_record(record: Record) -> Hub:
+    return Hub(id=record["id"])
+
+
+def dwelling_record(dwelling: Dwelling) -> Record:
+    return {"id": ref(dwelling.id), "state": dwelling.state.name}
+
+
+def dwelling_from_record(record: Record) -> Dwelling:
+    return Dwelling(id=record["id"], state=DwellingState[record["state"]])
+
+
+def link_hub(hub: Hub, dwelling: Optional[Dwelling]):
+    # set both sides directly; restoring must not re-walk the aggregate
+    if dwelling is not None:
+        dwelling.hubs[hub.id] = hub
+        hub.dwelling = dwelling
+
+
+def link_device(device: TypeDevice, hub: Optional[Hub]):
+    if hub is not None:
+        hub.devices[device.id] = device
+        device.hub = hub
+
+
+def write_frame(file: BinaryIO, payload: bytes):
+    file.write(FRAME.pack(len(payload), zlib.crc32(payload)))
+    file.write(payload)
+
+
+def read_frames(file: BinaryIO) -> Iterator[bytes]:
+    while True:
+        header = file.read(FRAME.size)
+        if len(header) < FRAME.size:
+            return
+        size, crc = FRAME.unpack(header)
+        payload = file.read(size)
+        # a short or corrupt frame is a torn write at the tail; stop there
+        if len(payload) < size or zlib.crc32(payload) != crc:
+            return
+        yield payload
@@ -0,0 +1,214 @@
+import json
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, List, Sequence, Tuple
+
+from idt.domains import Dwelling, Hub, TypeDevice
+from idt.repositories import Store
+from idt.serialization import (
+    device_from_record,
+    device_record,
+    dwelling_from_record,
+    dwelling_record,
+    hub_from_record,
+    hub_record,
+    link_device,
+    link_hub,
+    ref,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dwellings (
+    id TEXT PRIMARY KEY,
+    state TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS hubs (
+    id TEXT PRIMARY KEY,
+    dwelling_id TEXT
+);
+CREATE TABLE IF NOT EXISTS devices (
+    id TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    hub_id TEXT,
+    attrs TEXT NOT NULL
+);
+"""
+
+# upserts rather than INSERT OR REPLACE keep each row's rowid, which is what
+# load() orders by to restore the insertion order of the store
+UPSERT_DWELLING = (
+    "INSERT INTO dwellings (id, state) VALUES (?, ?) "
+    "ON CONFLICT (id) DO UPDATE SET state = excluded.state"
+)
+UPSERT_HUB = (
+    "INSERT INTO hubs (id, dwelling_id) VALUES (?, ?) "
+    "ON CONFLICT (id) DO UPDATE SET dwelling_id = excluded.dwelling_id"
+)
+UPSERT_DEVICE = (
+    "INSERT INTO devices (id, type, hub_id, attrs) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (id) DO UPDATE SET "
+    "type = excluded.type, hub_id = excluded.hub_id, attrs = excluded.attrs"
+)
+DELETE_DEVICE = "DELETE FROM devices WHERE id = ?"
+
+SELECT_DWELLINGS = "SELECT id, state FROM dwellings ORDER BY rowid"
+SELECT_HUBS = "SELECT id, dwelling_id FROM hubs ORDER BY rowid"
+SELECT_DEVICES = "SELECT id, type, hub_id, attrs FROM devices ORDER BY rowid"
+
+
+@dataclass
+class ConnectionPool:
+    path: str
+    size: int = 4
+    _idle: queue.LifoQueue = field(init=False, repr=False)
+    _connections: List[sqlite3.Connection] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        uri = f"{Path(self.path).absolute().as_uri()}?mode=ro"
+        self._idle = queue.LifoQueue()
+        self._connections = [
+            sqlite3.connect(uri, uri=True, check_same_thread=False)
+            for _ in range(self.size)
+        ]
+        for connection in self._connections:
+            self._idle.put(connection)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        connection = self._idle.get()
+        try:
+            yield connection
+        finally:
+            self._idle.put(connection)
+
+    def close(self):
+        for connection in self._connections:
+            connection.close()
+
+
+@dataclass(kw_only=True)
+class SqliteStore(Store):
+    path: str
+    pool_size: int = 4
+    _connection: sqlite3.Connection = field(init=False, repr=False)
+    _pool: ConnectionPool = field(init=False, repr=False)
+    _pending: List[Tuple[str, List[Sequence]]] = field(init=False, repr=False)
+    _depth: int = field(init=False, repr=False, default=0)
+    # one connection and one pending buffer serve every writer; a transaction
+    # holds this for its whole extent so threads never interleave in one
+    _write_lock: threading.RLock = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._write_lock = threading.RLock()
+        self._connection = sqlite3.connect(
+            self.path, isolation_level=None, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("PRAGMA synchronous = NORMAL")
+        self._connection.executescript(SCHEMA)
+        self._pool = ConnectionPool(self.path, self.pool_size)
+        self._pending = []
+        self.load()
+        super().__post_init__()
+
+    def close(self):
+        with self._write_lock:
+            self._flush()
+        self._pool.close()
+        self._connection.close()
+
+    def load(self):
+        with self.reader() as connection:
+            for id_, state in connection.execute(SELECT_DWELLINGS):
+                self.dwellings[id_] = dwelling_from_record({"id": id_, "state": state})
+            for id_, dwelling_id in connection.execute(SELECT_HUBS):
+                hub = hub_from_record({"id": id_})
+                link_hub(hub, self.dwellings.get(dwelling_id))
+                self.hubs[id_] = hub
+            for id_, type_, hub_id, attrs in connection.execute(SELECT_DEVICES):
+                device = device_from_record(
+                    {"id": id_, "type": type_, "attrs": json.loads(attrs)}
+                )
+                link_device(device, self.hubs.get(hub_id))
+                self.devices[id_] = device
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        with self._pool.connection() as connection:
+            yield connection
+
+    def put_device(self, device: TypeDevice):
+        with self._write_lock:
+            super().put_device(device)
+            record = device_record(device)
+            self._write(
+                UPSERT_DEVICE,
+                (
+                    record["id"],
+                    record["type"],
+                    record["hub_id"],
+                    json.dumps(record["attrs"]),
+                ),
+            )
+
+    def pop_device(self, id_: str) -> TypeDevice:
+        with self._write_lock:
+            device = super().pop_device(id_)
+            self._write(DELETE_DEVICE, (ref(id_),))
+            return device
+
+    def put_hub(self, hub: Hub):
+        with self._write_lock:
+            super().put_hub(hub)
+            record = hub_record(hub)
+            self._write(UPSERT_HUB, (record["id"], record["dwelling_id"]))
+
+    def put_dwelling(self, dwelling: Dwelling):
+        with self._write_lock:
+            super().put_dwelling(dwelling)
+            record = dwelling_record(dwelling)
+            self._write(UPSERT_DWELLING, (record["id"], record["state"]))
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        # only the file rolls back: objects the body changed keep their
+        # changes in memory, and a reopened store reads what was committed
+        with self._write_lock:
+            self._depth += 1
+            try:
+                yield
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._pending = []
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                self._flush()
+
+    def _write(self, sql: str, params: Sequence):
+        # consecutive writes of the same statement share one executemany call;
+        # runs are kept in order so a delete never overtakes an earlier upsert
+        if self._pending and self._pending[-1][0] == sql:
+            self._pending[-1][1].append(params)
+        else:
+            self._pending.append((sql, [params]))
+        if self._depth == 0:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        self._connection.execute("BEGIN")
+        try:
+            for sql, rows in pending:
+                self._connection.executemany(sql, rows)
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
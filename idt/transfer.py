@@ -0,0 +1,189 @@
+import io
+import json
+import pickle
+from itertools import islice, takewhile
+from typing import BinaryIO, Iterable, Iterator, Mapping, Optional, Tuple, Union
+
+from idt.mvcc import Snapshot
+from idt.repositories import Store
+from idt.serialization import (
+    Record,
+    device_from_record,
+    device_record,
+    dwelling_from_record,
+    dwelling_record,
+    hub_from_record,
+    hub_record,
+    link_device,
+    link_hub,
+    read_frames,
+    write_frame,
+)
+
+BINARY = "binary"
+JSONL = "jsonl"
+
+MAGIC = b"IDTXPRT1"
+
+DWELLING = "dwelling"
+HUB = "hub"
+DEVICE = "device"
+END = "end"
+
+# records per binary frame; one pickle call per batch rather than per record,
+# and all an export or import ever holds in memory
+BATCH = 1024
+
+
+class _Unpickler(pickle.Unpickler):
+    # exports only hold plain containers and scalars; never resolve a global
+    # from a file that came from somewhere else
+    def find_class(self, module: str, name: str):
+        raise ValueError(f"Unexpected global in export: {module}.{name}")
+
+
+def _sections(source: Union[Store, Snapshot]) -> Iterator[Tuple[str, Iterator]]:
+    # a live store must not be written while it is exported; a snapshot of a
+    # VersionedStore can be exported while writers carry on
+    if isinstance(source, Snapshot):
+        yield DWELLING, source.dwellings()
+        yield HUB, source.hubs()
+        yield DEVICE, source.devices()
+    else:
+        yield DWELLING, map(dwelling_record, source.dwellings.values())
+        yield HUB, map(hub_record, source.hubs.values())
+        yield DEVICE, map(device_record, source.devices.values())
+
+
+def _rows(kind: str, records: Iterable[Record]) -> Iterator[Tuple]:
+    if kind == DWELLING:
+        return ((r["id"], r["state"]) for r in records)
+    if kind == HUB:
+        return ((r["id"], r["dwelling_id"]) for r in records)
+    return ((r["id"], r["type"], r["hub_id"], r["attrs"]) for r in records)
+
+
+def _records(kind: str, rows: Iterable[Tuple]) -> Iterator[Record]:
+    if kind == DWELLING:
+        return ({"id": id_, "state": state} for id_, state in rows)
+    if kind == HUB:
+        return ({"id": id_, "dwelling_id": dwelling_id} for id_, dwelling_id in rows)
+    return (
+        {"id": id_, "type": type_, "hub_id": hub_id, "attrs": attrs}
+        for id_, type_, hub_id, attrs in rows
+    )
+
+
+def export_store(
+    source: Union[Store, Snapshot], file: BinaryIO, fmt: str = BINARY
+) -> Mapping[str, int]:
+    counts = {}
+    if fmt == BINARY:
+        write_frame(file, MAGIC)
+        for kind, records in _sections(source):
+            counts[kind] = 0
+            rows = _rows(kind, records)
+            while batch := list(islice(rows, BATCH)):
+                write_frame(file, pickle.dumps((kind, batch), protocol=5))
+                counts[kind] += len(batch)
+        write_frame(file, pickle.dumps((END, counts), protocol=5))
+    elif fmt == JSONL:
+        for kind, records in _sections(source):
+            counts[kind] = 0
+            for record in records:
+                file.write(json.dumps({"kind": kind, **record}).encode())
+                file.write(b"\n")
+                counts[kind] += 1
+        file.write(json.dumps({"kind": END, **counts}).encode())
+        file.write(b"\n")
+    else:
+        raise ValueError(f"Unknown export format: fmt={fmt}")
+    return counts
+
+
+def _binary_batches(file: BinaryIO) -> Iterator[Tuple[str, Iterable]]:
+    frames = read_frames(file)
+    if next(frames, None) != MAGIC:
+        raise ValueError("Not a store export")
+    for frame in frames:
+        yield _Unpickler(io.BytesIO(frame)).load()
+
+
+def _jsonl_batches(file: BinaryIO) -> Iterator[Tuple[str, Iterable]]:
+    # like a torn frame, an unterminated last line is where the writer stopped
+    lines = takewhile(lambda line: line.endswith(b"\n"), file)
+    while batch := [json.loads(line) for line in islice(lines, BATCH)]:
+        # consecutive lines of a kind are applied together
+        start = 0
+        for i in range(1, len(batch) + 1):
+            if i == len(batch) or batch[i]["kind"] != batch[start]["kind"]:
+                kind = batch[start]["kind"]
+                if kind == END:
+                    yield END, {k: v for k, v in batch[start].items() if k != "kind"}
+                else:
+                    yield kind, _rows(kind, batch[start:i])
+                start = i
+
+
+def import_store(
+    file: BinaryIO, store: Optional[Store] = None, fmt: str = BINARY
+) -> Store:
+    if fmt == BINARY:
+        batches = _binary_batches(file)
+    elif fmt == JSONL:
+        batches = _jsonl_batches(file)
+    else:
+        raise ValueError(f"Unknown export format: fmt={fmt}")
+
+    store = Store() if store is None else store
+    counts = {DWELLING: 0, HUB: 0, DEVICE: 0}
+    for kind, rows in batches:
+        if kind == END:
+            if rows != counts:
+                raise ValueError(f"Incomplete export: expected={rows} got={counts}")
+            return store
+        with store.transaction():
+            loaded = _load(store, kind, _records(kind, rows))
+        counts[kind] += loaded
+    raise ValueError(f"Truncated export: got={counts}")
+
+
+def _load(store: Store, kind: str, records: Iterable[Record]) -> int:
+    # the objects are built unlinked and joined from the child side, so no
+    # aggregate is walked and no change log is filled while importing
+    count = 0
+    if kind == DWELLING:
+        for record in records:
+            if record["id"] in store.dwellings:
+                raise ValueError(f"Dwelling exists: id={record['id']}")
+            store.put_dwelling(dwelling_from_record(record))
+            count += 1
+    elif kind == HUB:
+        for record in records:
+            if record["id"] in store.hubs:
+                raise ValueError(f"Hub exists: id={record['id']}")
+            hub = hub_from_record(record)
+            link_hub(hub, _parent(store.dwellings, record, "dwelling_id"))
+            store.put_hub(hub)
+            count += 1
+    elif kind == DEVICE:
+        for record in records:
+            if record["id"] in store.devices:
+                raise ValueError(f"Device exists: id={record['id']}")
+            device = device_from_record(record)
+            link_device(device, _parent(store.hubs, record, "hub_id"))
+            store.put_device(device)
+            count += 1
+    else:
+        raise ValueError(f"Unknown record kind: kind={kind}")
+    return count
+
+
+def _parent(entities: Mapping, record: Record, key: str):
+    id_ = record[key]
+    if id_ is None:
+        return None
+    parent = entities.get(id_)
+    if parent is None:
+        raise ValueError(f"Dangling reference: id={record['id']} {key}={id_}")
+    return parent
@@ -1,78 +1,361 @@
-from dataclasses import dataclass
-from typing import Sequence
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
-from idt.domains import Dwelling, DwellingState, TypeDevice
-from idt.repositories import DeviceRepository, DwellingRepository, HubRepository
+from idt.caching import LRUCache
+from idt.domains import (
+    Dimmer,
+    Dwelling,
+    DwellingState,
+    Lock,
+    LockState,
+    Switch,
+    SwitchState,
+    TypeDevice,
+)
+from idt.feed import Change, ChangeFeed, device_event, dwelling_event
+from idt.repositories import (
+    DeviceRepository,
+    DwellingRepository,
+    HubRepository,
+    Page,
+)
+from idt.serialization import device_info
+
+# attributes to set, per device class; a device takes the attributes of every
+# class in the scene it is an instance of, in order
+Scene = Mapping[type[TypeDevice], Mapping[str, Any]]
+
+SHUTDOWN: Scene = {
+    Lock: {"state": LockState.LOCKED},
+    Switch: {"state": SwitchState.OFF},
+    Dimmer: {"brightness": 0},
+}
+
+
+@dataclass
+class BulkResult:
+    updated: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
 
 
 @dataclass
 class DeviceUsecases:
     repo: DeviceRepository
+    # id -> (version, info), one entry per device however often it changes
+    info_cache: LRUCache[Tuple[int, str]] = field(default_factory=LRUCache)
+    feed: Optional[ChangeFeed] = None
 
     def create_device(self, device_cls: type[TypeDevice], **attrs) -> TypeDevice:
-        return self.repo.create(device_cls(**attrs))
+        device = self.repo.create(device_cls(**attrs))
+        if self.feed is not None:
+            self.feed.publish(device_event(Change.CREATED, device))
+        return device
+
+    def create_devices(
+        self, specs: Iterable[Tuple[type[TypeDevice], Mapping]]
+    ) -> Sequence[TypeDevice]:
+        devices = self.repo.create_many(
+            [device_cls(**attrs) for device_cls, attrs in specs]
+        )
+        if self.feed is not None:
+            self.feed.publish(
+                *(device_event(Change.CREATED, device) for device in devices)
+            )
+        return devices
 
     def delete_device(self, id_: str):
-        self.repo.delete(self.repo.get(id_))
+        with self.repo.locked(id_):
+            device = self.repo.get(id_)
+            self.repo.delete(device)
+            if self.feed is not None:
+                self.feed.publish(device_event(Change.DELETED, device))
+
+    def delete_devices(self, ids: Iterable[str]):
+        ids = list(ids)
+        with self.repo.locked(*ids):
+            devices = [self.repo.get(id_) for id_ in ids]
+            self.repo.delete_many(devices)
+            if self.feed is not None:
+                self.feed.publish(
+                    *(device_event(Change.DELETED, device) for device in devices)
+                )
 
     def show_device_info(self, id_: str) -> str:
-        return str(self.repo.get(id_))
+        # every save bumps the device's version, so updates, pairing and
+        # unpairing all miss the cache without any explicit invalidation; the
+        # version is read first so a racing save never caches newer info
+        # under an older version, and both are keyed by the stored id so
+        # every spelling of it shares one entry
+        id_ = self.repo.get(id_).id
+        version = self.repo.version(id_)
+        device = self.repo.get(id_)
+        cached = self.info_cache.get(id_)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        info = device_info(device)
+        self.info_cache.put(id_, (version, info))
+        return info
+
+    def iter_devices(self) -> Iterator[TypeDevice]:
+        return self.repo.iter()
 
     def list_devices(self) -> Sequence[TypeDevice]:
         return self.repo.list()
 
+    def page_devices(
+        self, after: Optional[int] = None, limit: int = 500
+    ) -> Page[TypeDevice]:
+        return self.repo.page(after, limit)
+
     def update_device(self, id_: str, **attrs):
-        device = self.repo.get(id_)
-        for attr, value in attrs.items():
-            setattr(device, attr, value)
-        self.repo.save(device)
+        with self.repo.locked(id_):
+            device = self.repo.get(id_)
+            for attr, value in attrs.items():
+                setattr(device, attr, value)
+            self.repo.save(device)
+            if self.feed is not None:
+                self.feed.publish(device_event(Change.UPDATED, device))
+
+    def update_devices(self, updates: Mapping[str, Mapping]):
+        with self.repo.locked(*updates):
+            devices = [self.repo.get(id_) for id_ in updates]
+            for device, attrs in zip(devices, updates.values()):
+                for attr in attrs:
+                    if not hasattr(device, attr):
+                        raise AttributeError(
+                            f"'{type(device).__name__}' object has no attribute '{attr}'"
+                        )
+
+            for device, attrs in zip(devices, updates.values()):
+                for attr, value in attrs.items():
+                    setattr(device, attr, value)
+            self.repo.save_many(devices)
+            if self.feed is not None:
+                self.feed.publish(
+                    *(device_event(Change.UPDATED, device) for device in devices)
+                )
 
 
 @dataclass
 class HubUsecases:
     repo: HubRepository
     device_repo: DeviceRepository
+    feed: Optional[ChangeFeed] = None
+
+    def iter_hub_devices(self, id_: str) -> Iterator[TypeDevice]:
+        return self.repo.iter_devices(self.repo.get(id_))
 
     def list_hub_devices(self, id_: str) -> Sequence[TypeDevice]:
         hub = self.repo.get(id_)
-        return [hub for _, hub in hub.devices.items()]
+        return list(hub.devices.values())
+
+    def page_hub_devices(
+        self, id_: str, after: Optional[int] = None, limit: int = 500
+    ) -> Page[TypeDevice]:
+        return self.repo.page_devices(self.repo.get(id_), after, limit)
 
     def pair_device(self, id_: str, device_id: str):
-        hub = self.repo.get(id_)
-        device = self.device_repo.get(device_id)
+        with self.repo.locked(id_, device_id):
+            hub = self.repo.get(id_)
+            device = self.device_repo.get(device_id)
 
-        hub.pair_device(device)
-        self.repo.save(hub)
+            hub.pair_device(device)
+            self.repo.save(hub)
+            if self.feed is not None:
+                self.feed.publish(device_event(Change.PAIRED, device))
 
     def unpair_device(self, id_: str, device_id: str):
-        hub = self.repo.get(id_)
-        device = self.device_repo.get(device_id)
+        with self.repo.locked(id_, device_id):
+            hub = self.repo.get(id_)
+            device = self.device_repo.get(device_id)
+
+            hub.unpair_device(device)
+            self.repo.save(hub)
+            if self.feed is not None:
+                self.feed.publish(device_event(Change.UNPAIRED, device, hub))
+
+    def pair_devices(self, id_: str, device_ids: Iterable[str], move: bool = False):
+        device_ids = list(dict.fromkeys(device_ids))
+        while True:
+            # the hubs devices move from are only known after reading them, so
+            # lock them too and start over if one changed before the lock
+            sources = self._sources(device_ids)
+            with self.repo.locked(id_, *device_ids, *sources):
+                if self._sources(device_ids) != sources:
+                    continue
+                hub = self.repo.get(id_)
+                devices = [self.device_repo.get(device_id) for device_id in device_ids]
+                for device in devices:
+                    if device.hub is not None and device.hub is not hub and not move:
+                        raise ValueError(
+                            f"Device paired to another hub: id={device.id} "
+                            f"hub_id={device.hub.id}"
+                        )
+
+                paired, moved = [], []
+                for device in devices:
+                    if device.hub is hub:
+                        continue
+                    if device.hub is not None:
+                        moved.append((device, device.hub))
+                        device.hub.unpair_device(device)
+                    hub.pair_device(device)
+                    paired.append(device)
+                with self.repo.store.transaction():
+                    for source in {source.id: source for _, source in moved}.values():
+                        self.repo.save(source)
+                    self.repo.save(hub)
+                if self.feed is not None:
+                    self.feed.publish(
+                        *(
+                            device_event(Change.UNPAIRED, device, source)
+                            for device, source in moved
+                        ),
+                        *(device_event(Change.PAIRED, device) for device in paired),
+                    )
+                return
+
+    def unpair_devices(self, id_: str, device_ids: Iterable[str]):
+        device_ids = list(dict.fromkeys(device_ids))
+        with self.repo.locked(id_, *device_ids):
+            hub = self.repo.get(id_)
+            devices = [self.device_repo.get(device_id) for device_id in device_ids]
+            for device in devices:
+                if device.hub is not hub:
+                    raise ValueError(
+                        f"Device not paired to hub: id={device.id} hub_id={hub.id}"
+                    )
+
+            for device in devices:
+                hub.unpair_device(device)
+            self.repo.save(hub)
+            if self.feed is not None:
+                self.feed.publish(
+                    *(device_event(Change.UNPAIRED, device, hub) for device in devices)
+                )
 
-        hub.unpair_device(device)
-        self.repo.save(hub)
+    def _sources(self, device_ids: Sequence[str]) -> Sequence[str]:
+        devices = self.device_repo.store.devices
+        return sorted(
+            {
+                device.hub.id
+                for device in map(devices.get, device_ids)
+                if device is not None and device.hub is not None
+            }
+        )
 
 
 @dataclass
 class DwellingUsecases:
     repo: DwellingRepository
     hub_repo: HubRepository
+    device_repo: Optional[DeviceRepository] = None
+    feed: Optional[ChangeFeed] = None
+
+    def __post_init__(self):
+        if self.device_repo is None:
+            self.device_repo = DeviceRepository(self.repo.store)
+
+    def apply_to_devices(
+        self, id_: str, device_cls: type[TypeDevice], **attrs
+    ) -> BulkResult:
+        return self.apply_scene([id_], {device_cls: attrs})
+
+    def apply_scene(self, ids: Iterable[str], scene: Scene) -> BulkResult:
+        ids = list(ids)
+        for id_ in ids:
+            self.repo.get(id_)
+
+        devices = {}
+        for device_cls in scene:
+            for device in self.device_repo.find(device_cls, dwelling_ids=ids):
+                devices[device.id] = device
+
+        result = BulkResult()
+        dwelling_ids = set(ids)
+        stored = self.device_repo.store.devices
+        with self.device_repo.locked(*devices):
+            changed = []
+            for id_, device in devices.items():
+                # the targets were found before locking; one deleted or moved
+                # out of the dwellings since must not be written back
+                hub = device.hub
+                if (
+                    stored.get(id_) is not device
+                    or hub is None
+                    or hub.dwelling is None
+                    or hub.dwelling.id not in dwelling_ids
+                ):
+                    result.failed[id_] = "Device no longer in the dwellings"
+                    continue
+                attrs = {}
+                for device_cls, values in scene.items():
+                    if isinstance(device, device_cls):
+                        attrs.update(values)
+                missing = [attr for attr in attrs if not hasattr(device, attr)]
+                if missing:
+                    result.failed[id_] = (
+                        f"'{type(device).__name__}' object has no attribute "
+                        f"'{missing[0]}'"
+                    )
+                elif all(getattr(device, a) == v for a, v in attrs.items()):
+                    result.unchanged.append(id_)
+                else:
+                    for attr, value in attrs.items():
+                        setattr(device, attr, value)
+                    changed.append(device)
+                    result.updated.append(id_)
+            self.device_repo.save_many(changed)
+            if self.feed is not None:
+                self.feed.publish(
+                    *(device_event(Change.UPDATED, device) for device in changed)
+                )
+        return result
 
     def install_hub(self, id_: str, hub_id: str):
-        dwelling = self.repo.get(id_)
-        hub = self.hub_repo.get(hub_id)
+        with self.repo.locked(id_, hub_id):
+            dwelling = self.repo.get(id_)
+            hub = self.hub_repo.get(hub_id)
+
+            dwelling.install_hub(hub)
+            self.repo.save(dwelling)
+            if self.feed is not None:
+                self.feed.publish(dwelling_event(Change.HUB_INSTALLED, dwelling, hub))
 
-        dwelling.install_hub(hub)
-        self.repo.save(dwelling)
+    def iter_dwellings(self) -> Iterator[Dwelling]:
+        return self.repo.iter()
 
     def list_dwellings(self) -> Sequence[Dwelling]:
         return self.repo.list()
 
+    def page_dwellings(
+        self, after: Optional[int] = None, limit: int = 500
+    ) -> Page[Dwelling]:
+        return self.repo.page(after, limit)
+
     def occupy(self, id_: str):
-        dwelling = self.repo.get(id_)
-        dwelling.state = DwellingState.OCCUPIED
-        self.repo.save(dwelling)
+        with self.repo.locked(id_):
+            dwelling = self.repo.get(id_)
+            dwelling.state = DwellingState.OCCUPIED
+            self.repo.save(dwelling)
+            if self.feed is not None:
+                self.feed.publish(dwelling_event(Change.OCCUPIED, dwelling))
 
     def vacate(self, id_: str):
-        dwelling = self.repo.get(id_)
-        dwelling.state = DwellingState.VACANT
-        self.repo.save(dwelling)
+        with self.repo.locked(id_):
+            dwelling = self.repo.get(id_)
+            dwelling.state = DwellingState.VACANT
+            self.repo.save(dwelling)
+            if self.feed is not None:
+                self.feed.publish(dwelling_event(Change.VACATED, dwelling))
@@ -0,0 +1,136 @@
+import pytest
+
+from idt.aggregates import FleetAggregates, FleetStats
+from idt.domains import Dimmer, Dwelling, DwellingState, Hub, Lock, Switch
+from idt.repositories import (
+    DeviceRepository,
+    DwellingRepository,
+    HubRepository,
+    Store,
+)
+from idt.usecases import DeviceUsecases, DwellingUsecases, HubUsecases
+
+
+@pytest.fixture
+def store() -> Store:
+    return Store()
+
+
+@pytest.fixture
+def fleet(store: Store) -> Store:
+    hubs = [Hub(id="hub-1"), Hub(id="hub-2"), Hub(id="hub-3")]
+    occupied = Dwelling(id="occupied", state=DwellingState.OCCUPIED)
+    vacant = Dwelling(id="vacant")
+    occupied.install_hub(hubs[0])
+    vacant.install_hub(hubs[1])
+
+    hubs[0].pair_device(Dimmer(id="dimmer-1"))
+    hubs[0].pair_device(Switch(id="switch-1"))
+    hubs[1].pair_device(Switch(id="switch-2"))
+    hubs[2].pair_device(Lock(id="lock-1"))
+
+    dwellings = DwellingRepository(store)
+    dwellings.save(occupied)
+    dwellings.save(vacant)
+    HubRepository(store).save(hubs[2])
+    DeviceRepository(store).save(Dimmer(id="dimmer-2"))
+    return store
+
+
+@pytest.fixture
+def aggregates(fleet: Store) -> FleetAggregates:
+    return FleetAggregates(fleet)
+
+
+@pytest.fixture
+def device_usecases(fleet: Store) -> DeviceUsecases:
+    return DeviceUsecases(DeviceRepository(fleet))
+
+
+@pytest.fixture
+def hub_usecases(fleet: Store) -> HubUsecases:
+    return HubUsecases(HubRepository(fleet), DeviceRepository(fleet))
+
+
+@pytest.fixture
+def dwelling_usecases(fleet: Store) -> DwellingUsecases:
+    return DwellingUsecases(DwellingRepository(fleet), HubRepository(fleet))
+
+
+class TestFleetAggregates:
+    def test_stats(self, aggregates: FleetAggregates):
+        assert aggregates.stats() == FleetStats(
+            dwellings=2,
+            occupied=1,
+            vacant=1,
+            hubs=3,
+            unpaired_hubs=1,
+            devices=5,
+            unpaired_devices=1,
+            devices_by_type={Dimmer: 2, Switch: 2, Lock: 1},
+        )
+        assert aggregates.devices_in_dwelling("occupied") == 2
+        assert aggregates.devices_in_dwelling("missing") == 0
+        assert aggregates.devices_on_hub("hub-3") == 1
+
+    def test_occupy_and_vacate(
+        self, aggregates: FleetAggregates, dwelling_usecases: DwellingUsecases
+    ):
+        dwelling_usecases.occupy("vacant")
+        assert aggregates.stats().occupied == 2
+
+        dwelling_usecases.vacate("occupied")
+        dwelling_usecases.vacate("vacant")
+        assert aggregates.stats().occupied == 0
+        assert aggregates.check() == []
+
+    def test_install_hub(
+        self, aggregates: FleetAggregates, dwelling_usecases: DwellingUsecases
+    ):
+        dwelling_usecases.install_hub("vacant", "hub-3")
+
+        assert aggregates.stats().unpaired_hubs == 0
+        assert aggregates.devices_in_dwelling("vacant") == 2
+        assert aggregates.check() == []
+
+    def test_pair_and_unpair(
+        self, aggregates: FleetAggregates, hub_usecases: HubUsecases
+    ):
+        hub_usecases.pair_device("hub-1", "dimmer-2")
+        assert aggregates.stats().unpaired_devices == 0
+        assert aggregates.devices_in_dwelling("occupied") == 3
+
+        hub_usecases.unpair_device("hub-1", "switch-1")
+        assert aggregates.stats().unpaired_devices == 1
+        assert aggregates.devices_on_hub("hub-1") == 2
+        assert aggregates.check() == []
+
+    def test_create_and_delete(
+        self, aggregates: FleetAggregates, device_usecases: DeviceUsecases
+    ):
+        device = device_usecases.create_device(Lock)
+        assert aggregates.stats().devices_by_type[Lock] == 2
+
+        device_usecases.delete_device(device.id)
+        device_usecases.delete_device("dimmer-2")
+        stats = aggregates.stats()
+        assert stats.devices == 4
+        assert stats.devices_by_type == {Dimmer: 1, Switch: 2, Lock: 1}
+        assert aggregates.check() == []
+
+    def test_check_drift(self, aggregates: FleetAggregates, fleet: Store):
+        # written around the store, so no listener sees it
+        fleet.dwellings["vacant"].state = DwellingState.OCCUPIED
+
+        assert aggregates.check() == [
+            "occupied: expected=2 actual=1",
+            "dwellings['vacant']: expected=DwellingState.OCCUPIED "
+            "actual=DwellingState.VACANT",
+        ]
+        aggregates.rebuild()
+        assert aggregates.check() == []
+
+    def test_close(self, aggregates: FleetAggregates, fleet: Store):
+        aggregates.close()
+
+        assert fleet.listeners == []
@@ -0,0 +1,137 @@
+import math
+
+import numpy as np
+import pytest
+
+from idt.analytics import FleetAnalytics
+from idt.domains import (
+    Dimmer,
+    Dwelling,
+    DwellingState,
+    Hub,
+    Switch,
+    SwitchState,
+    Thermostat,
+)
+from idt.repositories import (
+    DeviceRepository,
+    DwellingRepository,
+    HubRepository,
+    Store,
+)
+
+
+@pytest.fixture
+def store() -> Store:
+    return Store()
+
+
+@pytest.fixture
+def fleet(store: Store) -> Store:
+    hubs = [Hub(id="hub-1"), Hub(id="hub-2"), Hub(id="hub-3")]
+    occupied = Dwelling(id="occupied", state=DwellingState.OCCUPIED)
+    vacant = Dwelling(id="vacant")
+    occupied.install_hub(hubs[0])
+    vacant.install_hub(hubs[1])
+
+    hubs[0].pair_device(Dimmer(id="dimmer-1", brightness=20))
+    hubs[0].pair_device(Dimmer(id="dimmer-2", brightness=40))
+    hubs[1].pair_device(Dimmer(id="dimmer-3", brightness=90))
+    hubs[2].pair_device(Dimmer(id="dimmer-4", brightness=10))
+    hubs[0].pair_device(Switch(id="switch-1", state=SwitchState.ON))
+    hubs[0].pair_device(Switch(id="switch-2"))
+    hubs[1].pair_device(Switch(id="switch-3", state=SwitchState.ON))
+    hubs[0].pair_device(Thermostat(id="thermo", target_temp_f=70, actual_temp_f=65))
+
+    dwellings = DwellingRepository(store)
+    dwellings.save(occupied)
+    dwellings.save(vacant)
+    HubRepository(store).save(hubs[2])
+    return store
+
+
+@pytest.fixture
+def analytics(fleet: Store) -> FleetAnalytics:
+    return FleetAnalytics(fleet)
+
+
+class TestFleetAnalytics:
+    def test_temperature_deltas(self, analytics: FleetAnalytics):
+        assert analytics.temperature_deltas().tolist() == [5.0]
+
+    def test_mean_brightness_by_hub(self, analytics: FleetAnalytics):
+        assert analytics.mean_brightness_by_hub() == {
+            "hub-1": 30.0,
+            "hub-2": 90.0,
+            "hub-3": 10.0,
+        }
+
+    def test_mean_brightness_by_dwelling(self, analytics: FleetAnalytics):
+        assert analytics.mean_brightness_by_dwelling() == {
+            "occupied": 30.0,
+            "vacant": 90.0,
+        }
+
+    def test_occupied_switch_on_share(self, analytics: FleetAnalytics):
+        assert analytics.occupied_switch_on_share() == 0.5
+
+    def test_occupied_switch_on_share_empty(self, store: Store):
+        assert math.isnan(FleetAnalytics(store).occupied_switch_on_share())
+
+    class TestRefresh:
+        def test_update(self, fleet: Store, analytics: FleetAnalytics):
+            device = fleet.devices["dimmer-3"]
+            device.brightness = 50
+
+            DeviceRepository(fleet).save(device)
+
+            assert analytics.mean_brightness_by_hub()["hub-2"] == 50.0
+
+        def test_delete(self, fleet: Store, analytics: FleetAnalytics):
+            hub = fleet.hubs["hub-1"]
+            device = fleet.devices["dimmer-1"]
+            hub.unpair_device(device)
+            HubRepository(fleet).save(hub)
+            DeviceRepository(fleet).delete(device)
+            DeviceRepository(fleet).save(Dimmer(id="dimmer-5", brightness=60))
+
+            assert analytics.mean_brightness_by_hub() == {
+                "hub-1": 40.0,
+                "hub-2": 90.0,
+                "hub-3": 10.0,
+            }
+
+        def test_unpair(self, fleet: Store, analytics: FleetAnalytics):
+            hub = fleet.hubs["hub-1"]
+            hub.unpair_device(fleet.devices["dimmer-2"])
+
+            HubRepository(fleet).save(hub)
+
+            assert analytics.mean_brightness_by_hub()["hub-1"] == 20.0
+
+        def test_install_and_occupy(self, fleet: Store, analytics: FleetAnalytics):
+            dwelling = fleet.dwellings["vacant"]
+            dwelling.install_hub(fleet.hubs["hub-3"])
+            dwelling.state = DwellingState.OCCUPIED
+
+            DwellingRepository(fleet).save(dwelling)
+
+            assert analytics.mean_brightness_by_dwelling()["vacant"] == 50.0
+            assert analytics.occupied_switch_on_share() == pytest.approx(2 / 3)
+
+        def test_matches_rebuild(self, fleet: Store, analytics: FleetAnalytics):
+            devices = DeviceRepository(fleet)
+            for i in range(40):
+                devices.save(Thermostat(id=f"t{i}", target_temp_f=i, actual_temp_f=0))
+            for i in range(0, 40, 3):
+                devices.delete(fleet.devices[f"t{i}"])
+
+            deltas = np.sort(analytics.temperature_deltas())
+            analytics.rebuild()
+
+            assert np.array_equal(deltas, np.sort(analytics.temperature_deltas()))
+
+    def test_close(self, fleet: Store, analytics: FleetAnalytics):
+        analytics.close()
+
+        assert fleet.listeners == []
@@ -0,0 +1,195 @@
+import pytest
+
+from idt.caching import (
+    CachingDeviceRepository,
+    CachingDwellingRepository,
+    CachingHubRepository,
+    LRUCache,
+)
+from idt.domains import Dimmer, Dwelling, Hub
+from idt.ids import MonotonicAllocator
+from idt.repositories import DeviceRepository, DwellingRepository, HubRepository, Store
+
+
+@pytest.fixture
+def store():
+    return Store()
+
+
+class Clock:
+    now: float = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestLRUCache:
+    class TestGet:
+        def test_miss(self):
+            cache = LRUCache()
+
+            assert cache.get("key") is None
+            assert cache.misses == 1
+
+        def test_hit(self):
+            cache = LRUCache()
+            cache.put("key", "value")
+
+            assert cache.get("key") == "value"
+            assert cache.hits == 1
+
+        def test_expired(self):
+            clock = Clock()
+            cache = LRUCache(ttl=10.0, clock=clock)
+            cache.put("key", "value")
+
+            clock.now = 9.0
+            assert cache.get("key") == "value"
+            clock.now = 10.0
+            assert cache.get("key") is None
+            assert cache.expirations == 1
+            assert "key" not in cache
+
+    class TestPut:
+        def test_evicts_least_recent(self):
+            cache = LRUCache(maxsize=2)
+            cache.put("a", 1)
+            cache.put("b", 2)
+            cache.get("a")
+
+            cache.put("c", 3)
+
+            assert "a" in cache
+            assert "b" not in cache
+            assert cache.evictions == 1
+
+        def test_evicts_over_maxbytes(self):
+            cache = LRUCache(maxbytes=10, sizeof=len)
+            cache.put("a", "xxxx")
+            cache.put("b", "xxxx")
+            cache.put("a", "xxxxx")
+
+            cache.put("c", "xxxx")
+
+            assert "a" in cache
+            assert "b" not in cache
+            assert cache.bytes == 9
+
+        def test_maxbytes_needs_sizeof(self):
+            with pytest.raises(ValueError) as e:
+                LRUCache(maxbytes=10)
+
+            assert str(e.value) == "No sizeof for maxbytes: maxbytes=10"
+
+    class TestDiscard:
+        def test_success(self):
+            cache = LRUCache()
+            cache.put("key", "value")
+
+            cache.discard("key")
+            cache.discard("key")
+
+            assert len(cache) == 0
+
+
+class TestCachingDeviceRepository:
+    def test_reads_through(self, store: Store):
+        device = DeviceRepository(store).create(Dimmer())
+        repo = CachingDeviceRepository(store)
+
+        assert repo.get(device.id) is device
+        assert repo.get(device.id) is device
+        assert (repo.cache.hits, repo.cache.misses) == (1, 1)
+
+    def test_missing(self, store: Store):
+        repo = CachingDeviceRepository(store)
+
+        with pytest.raises(KeyError):
+            repo.get("missing")
+        assert len(repo.cache) == 0
+
+    def test_invalidated_by_save(self, store: Store):
+        repo = CachingDeviceRepository(store)
+        repo.get(DeviceRepository(store).create(Dimmer()).id)
+        (device_id,) = store.devices
+
+        DeviceRepository(store).save(Dimmer(id=device_id, brightness=50))
+
+        assert repo.get(device_id).brightness == 50
+
+    def test_invalidated_by_delete(self, store: Store):
+        device = DeviceRepository(store).create(Dimmer())
+        repo = CachingDeviceRepository(store)
+        repo.get(device.id)
+
+        repo.delete(device)
+
+        with pytest.raises(KeyError):
+            repo.get(device.id)
+
+    def test_alias_invalidated_by_save(self):
+        store = Store(ids=MonotonicAllocator())
+        repo = CachingDeviceRepository(store)
+        device = repo.create(Dimmer())
+        alias = device.id.replace("0", "O")
+        repo.get(alias)
+
+        repo.save(Dimmer(id=device.id, brightness=50))
+
+        assert repo.get(alias).brightness == 50
+        assert alias not in repo.cache
+
+    def test_alias_invalidated_by_delete(self):
+        store = Store(ids=MonotonicAllocator())
+        repo = CachingDeviceRepository(store)
+        device = repo.create(Dimmer())
+        alias = device.id.replace("0", "O")
+        repo.get(alias)
+
+        repo.delete(device)
+
+        with pytest.raises(KeyError):
+            repo.get(alias)
+
+    def test_invalidated_by_hub_save(self, store: Store):
+        repo = CachingDeviceRepository(store)
+        device = repo.create(Dimmer())
+        repo.get(device.id)
+        hub = Hub(id="hub")
+
+        hub.pair_device(device)
+        HubRepository(store).save(hub)
+
+        assert device.id not in repo.cache
+
+    def test_close(self, store: Store):
+        repo = CachingDeviceRepository(store)
+
+        repo.close()
+
+        assert store.listeners == []
+
+
+class TestCachingHubRepository:
+    def test_invalidated_by_dwelling_save(self, store: Store):
+        hub_repo = CachingHubRepository(store)
+        hub_repo.save(Hub(id="hub"))
+        dwelling = Dwelling(id="dwelling")
+        DwellingRepository(store).save(dwelling)
+        hub_repo.get("hub")
+
+        dwelling.install_hub(Hub(id="hub"))
+        DwellingRepository(store).save(dwelling)
+
+        assert hub_repo.get("hub").dwelling is dwelling
+
+
+class TestCachingDwellingRepository:
+    def test_invalidated_by_save(self, store: Store):
+        repo = CachingDwellingRepository(store)
+        repo.save(Dwelling(id="dwelling"))
+        first = repo.get("dwelling")
+
+        repo.save(Dwelling(id="dwelling"))
+
+        assert repo.get("dwelling") is not first
@@ -0,0 +1,154 @@
+import threading
+import time
+
+import pytest
+
+from idt.concurrent import ConcurrentStore, LockStripes
+from idt.domains import Device, Dwelling, Hub, Switch
+from idt.indexes import DeviceIndex
+from idt.repositories import DeviceRepository, DwellingRepository, HubRepository
+from idt.usecases import DeviceUsecases, DwellingUsecases, HubUsecases
+
+
+def run_threads(*targets, timeout: float = 10.0):
+    errors = []
+
+    def wrap(target):
+        def run():
+            try:
+                target()
+            except Exception as e:
+                errors.append(e)
+
+        return run
+
+    threads = [threading.Thread(target=wrap(target)) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout)
+        assert not thread.is_alive(), "deadlocked"
+    assert errors == []
+
+
+class Yielding(dict):
+    def __getitem__(self, key):
+        time.sleep(0)
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        time.sleep(0)
+        return super().get(key, default)
+
+
+class TestLockStripes:
+    def test_reentrant(self):
+        stripes = LockStripes(count=4)
+
+        with stripes.locked("a", "b"):
+            with stripes.locked("a"):
+                pass
+
+    def test_opposite_order(self):
+        stripes = LockStripes(count=2)
+        ids = ["a", "b", "c", "d"]
+
+        def lock(order):
+            def run():
+                for _ in range(2000):
+                    with stripes.locked(*order):
+                        pass
+
+            return run
+
+        run_threads(lock(ids), lock(list(reversed(ids))))
+
+
+class TestConcurrentStore:
+    @pytest.fixture
+    def store(self) -> ConcurrentStore:
+        store = ConcurrentStore(stripes=LockStripes(count=8))
+        hub = Hub(id="hub")
+        dwelling = Dwelling(id="dwelling")
+        dwelling.install_hub(hub)
+        DwellingRepository(store).save(dwelling)
+        DeviceRepository(store).save_many([Switch(id=f"device-{i}") for i in range(50)])
+        return store
+
+    def test_pair_while_saving(self, store: ConcurrentStore):
+        device_repo = DeviceRepository(store)
+        hub_uc = HubUsecases(HubRepository(store), device_repo)
+        dwelling_uc = DwellingUsecases(DwellingRepository(store), HubRepository(store))
+        device_uc = DeviceUsecases(device_repo)
+
+        def pair(offset):
+            def run():
+                for _ in range(20):
+                    for i in range(offset, 50, 4):
+                        hub_uc.pair_device("hub", f"device-{i}")
+                    for i in range(offset, 50, 4):
+                        hub_uc.unpair_device("hub", f"device-{i}")
+
+            return run
+
+        def save():
+            for _ in range(200):
+                dwelling_uc.occupy("dwelling")
+                DwellingRepository(store).save(store.dwellings["dwelling"])
+
+        def read():
+            for _ in range(200):
+                device_uc.list_devices()
+                list(device_uc.iter_devices())
+                device_repo.find(dwelling_id="dwelling")
+
+        run_threads(pair(0), pair(1), pair(2), pair(3), save, read)
+
+        rebuilt = DeviceIndex()
+        for device in store.devices.values():
+            rebuilt.add(device)
+        assert store.hubs["hub"].devices == {}
+        assert store.index.by_hub == rebuilt.by_hub
+        assert len(device_repo.find(paired=False)) == 50
+
+    def test_page_while_deleting(self, store: ConcurrentStore):
+        device_repo = DeviceRepository(store)
+        hub_repo = HubRepository(store)
+        hub_uc = HubUsecases(hub_repo, device_repo)
+        hub_uc.pair_devices("hub", [f"device-{i}" for i in range(50)])
+        # let a delete land between reading the order and reading the devices
+        store.devices = Yielding(store.devices)
+        seen = []
+
+        def churn():
+            for _ in range(20):
+                for i in range(0, 50, 2):
+                    hub_uc.unpair_device("hub", f"device-{i}")
+                    device_repo.delete(store.devices[f"device-{i}"])
+                for i in range(0, 50, 2):
+                    device_repo.save(Switch(id=f"device-{i}"))
+                    hub_uc.pair_device("hub", f"device-{i}")
+
+        def walk():
+            for _ in range(50):
+                page = device_repo.page(limit=7)
+                while page.cursor is not None:
+                    page = device_repo.page(page.cursor, limit=7)
+                hub = store.hubs["hub"]
+                page = hub_repo.page_devices(hub, limit=7)
+                while page.cursor is not None:
+                    page = hub_repo.page_devices(hub, page.cursor, limit=7)
+                seen.append(page)
+
+        run_threads(churn, walk, walk)
+
+        assert len(seen) == 100
+        assert len(device_repo.page(limit=100).items) == 50
+
+    def test_list_is_snapshot(self, store: ConcurrentStore):
+        device_repo = DeviceRepository(store)
+
+        devices = device_repo.list()
+        device_repo.save(Device(id="new"))
+
+        assert len(devices) == 50
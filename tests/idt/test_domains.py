@@ -94,6 +94,19 @@ class TestHub:
         assert hub.devices == {}
         assert device.hub is None
 
+    def test_pop_changes(self):
+        hub = Hub()
+        paired = Device(id="paired")
+        unpaired = Device(id="unpaired")
+        hub.pair_device(unpaired)
+        hub.pop_changes()
+
+        hub.pair_device(paired)
+        hub.unpair_device(unpaired)
+
+        assert hub.pop_changes() == [paired, unpaired]
+        assert hub.pop_changes() == []
+
 
 class TestDwelling:
     @pytest.mark.parametrize("hubs", [{}, {"1": Hub(), "2": Hub()}])
@@ -115,3 +128,10 @@ class TestDwelling:
 
         assert dwelling.hubs == {"hub-id": hub}
         assert hub.dwelling == dwelling
+
+    def test_pop_changes(self):
+        hub = Hub(id="hub-id")
+        dwelling = Dwelling(hubs={"hub-id": hub})
+
+        assert dwelling.pop_changes() == [hub]
+        assert dwelling.pop_changes() == []
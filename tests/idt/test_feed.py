@@ -0,0 +1,195 @@
+import threading
+import time
+
+import pytest
+
+from idt.domains import Dimmer, Dwelling, Hub, Switch
+from idt.feed import (
+    Change,
+    ChangeFeed,
+    DeviceEvent,
+    DwellingEvent,
+    SubscriptionLagged,
+    device_event,
+    dwelling_event,
+)
+
+
+def updated(id_: str, device_type: type = Switch, dwelling_id=None) -> DeviceEvent:
+    return DeviceEvent(
+        change=Change.UPDATED,
+        device_id=id_,
+        device_type=device_type,
+        dwelling_id=dwelling_id,
+    )
+
+
+@pytest.fixture
+def feed() -> ChangeFeed:
+    return ChangeFeed(capacity=4, timeout=0)
+
+
+class TestDeviceEvent:
+    def test_paired(self):
+        device = Dimmer(id="dimmer")
+        hub = Hub(id="hub")
+        hub.pair_device(device)
+        Dwelling(id="dwelling").install_hub(hub)
+
+        assert device_event(Change.PAIRED, device) == DeviceEvent(
+            change=Change.PAIRED,
+            device_id="dimmer",
+            device_type=Dimmer,
+            hub_id="hub",
+            dwelling_id="dwelling",
+        )
+
+    def test_unpaired(self):
+        hub = Hub(id="hub")
+
+        event = device_event(Change.UNPAIRED, Dimmer(id="dimmer"), hub)
+
+        assert event.hub_id == "hub"
+
+
+class TestChangeFeed:
+    class TestPublish:
+        def test_sequence(self, feed: ChangeFeed):
+            subscription = feed.subscribe()
+
+            feed.publish(updated("a"), updated("b"))
+
+            assert [e.seq for e in subscription.read()] == [0, 1]
+
+        def test_coalesces_updates(self, feed: ChangeFeed):
+            subscription = feed.subscribe()
+
+            feed.publish(updated("a"), updated("b"), updated("a"))
+
+            events = subscription.read()
+            assert [(e.device_id, e.seq) for e in events] == [("b", 1), ("a", 2)]
+
+        def test_keeps_other_changes(self, feed: ChangeFeed):
+            subscription = feed.subscribe()
+            deleted = DeviceEvent(
+                change=Change.DELETED, device_id="a", device_type=Switch
+            )
+
+            feed.publish(updated("a"), deleted, updated("a"))
+
+            assert [e.change for e in subscription.read()] == [
+                Change.UPDATED,
+                Change.DELETED,
+                Change.UPDATED,
+            ]
+
+        def test_bounded(self, feed: ChangeFeed):
+            feed.publish(*(updated(str(i)) for i in range(10)))
+
+            assert len(feed) == 4
+
+        def test_drops_slow_subscriber(self, feed: ChangeFeed):
+            slow = feed.subscribe()
+            fast = feed.subscribe()
+            feed.publish(*(updated(str(i)) for i in range(4)))
+            fast.read()
+
+            feed.publish(updated("4"))
+
+            with pytest.raises(SubscriptionLagged):
+                slow.read()
+            assert [e.device_id for e in fast.read()] == ["4"]
+
+        def test_drops_without_waiting_by_default(self):
+            feed = ChangeFeed(capacity=2)
+            slow = feed.subscribe()
+            started = time.monotonic()
+
+            feed.publish(*(updated(str(i)) for i in range(3)))
+
+            # publishers hold usecase locks, so they must not block on readers
+            assert time.monotonic() - started < 0.5
+            assert slow.lagged
+
+        def test_waits_for_slow_subscriber(self):
+            feed = ChangeFeed(capacity=2, timeout=None)
+            subscription = feed.subscribe()
+            read = []
+
+            def consume():
+                while len(read) < 5:
+                    read.extend(subscription.read(timeout=1))
+
+            consumer = threading.Thread(target=consume)
+            consumer.start()
+            feed.publish(*(updated(str(i)) for i in range(5)))
+            consumer.join()
+
+            assert [e.device_id for e in read] == ["0", "1", "2", "3", "4"]
+
+    class TestSubscribe:
+        def test_resume(self, feed: ChangeFeed):
+            feed.publish(updated("a"), updated("b"), updated("c"))
+
+            subscription = feed.subscribe(after=0)
+
+            assert [e.device_id for e in subscription.read()] == ["b", "c"]
+
+        def test_resume_trimmed(self, feed: ChangeFeed):
+            feed.publish(*(updated(str(i)) for i in range(6)))
+
+            with pytest.raises(SubscriptionLagged):
+                feed.subscribe(after=0)
+
+        def test_device_types(self, feed: ChangeFeed):
+            subscription = feed.subscribe(device_types=[Dimmer])
+
+            feed.publish(
+                updated("a"),
+                updated("b", Dimmer),
+                dwelling_event(Change.OCCUPIED, Dwelling(id="d")),
+            )
+
+            assert [e.device_id for e in subscription.read()] == ["b"]
+
+        def test_dwelling_ids(self, feed: ChangeFeed):
+            subscription = feed.subscribe(dwelling_ids=["d"])
+
+            feed.publish(
+                updated("a", dwelling_id="d"),
+                updated("b", dwelling_id="other"),
+                dwelling_event(Change.OCCUPIED, Dwelling(id="d")),
+            )
+
+            assert subscription.read() == [
+                DeviceEvent(
+                    change=Change.UPDATED,
+                    device_id="a",
+                    device_type=Switch,
+                    dwelling_id="d",
+                    seq=0,
+                ),
+                DwellingEvent(change=Change.OCCUPIED, dwelling_id="d", seq=2),
+            ]
+
+    class TestRead:
+        def test_batches(self, feed: ChangeFeed):
+            subscription = feed.subscribe()
+            feed.publish(updated("a"), updated("b"), updated("c"))
+
+            first = subscription.read(limit=2)
+            second = subscription.read(limit=2)
+
+            assert [e.device_id for e in first] == ["a", "b"]
+            assert [e.device_id for e in second] == ["c"]
+
+        def test_empty(self, feed: ChangeFeed):
+            assert feed.subscribe().read() == []
+
+    def test_close(self, feed: ChangeFeed):
+        subscription = feed.subscribe()
+        subscription.close()
+
+        feed.publish(*(updated(str(i)) for i in range(10)))
+
+        assert subscription.lagged is False
@@ -0,0 +1,176 @@
+import pytest
+
+from idt.domains import Dimmer, Lock, LockState, Switch, Thermostat
+from idt.history import ENTRY_BYTES, DeviceHistory
+from idt.repositories import DeviceRepository, Store
+from idt.usecases import DeviceUsecases
+
+
+class Clock:
+    now: float = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def store() -> Store:
+    return Store()
+
+
+@pytest.fixture
+def clock() -> Clock:
+    return Clock()
+
+
+@pytest.fixture
+def history(store: Store, clock: Clock) -> DeviceHistory:
+    return DeviceHistory(store, clock=clock)
+
+
+@pytest.fixture
+def usecases(store: Store) -> DeviceUsecases:
+    return DeviceUsecases(DeviceRepository(store))
+
+
+class TestDeviceHistory:
+    def test_records_changes(
+        self, history: DeviceHistory, usecases: DeviceUsecases, clock: Clock
+    ):
+        lock = usecases.create_device(Lock)
+        for now, state in [
+            (1.0, LockState.LOCKED),
+            (2.0, LockState.LOCKED),
+            (3.0, LockState.UNLOCKED),
+        ]:
+            clock.now = now
+            usecases.update_device(lock.id, state=state)
+
+        assert history.history(lock.id, "state") == [
+            (0.0, LockState.UNLOCKED),
+            (1.0, LockState.LOCKED),
+            (3.0, LockState.UNLOCKED),
+        ]
+        assert history.when(lock.id, "state", LockState.UNLOCKED, since=0.5) == [3.0]
+
+    def test_decodes_by_field_type(
+        self, history: DeviceHistory, usecases: DeviceUsecases
+    ):
+        dimmer = usecases.create_device(Dimmer, brightness=40)
+        thermostat = usecases.create_device(
+            Thermostat, target_temp_f=70.0, actual_temp_f=68.5
+        )
+
+        assert history.history(dimmer.id, "brightness") == [(0.0, 40)]
+        assert history.history(thermostat.id, "actual_temp_f") == [(0.0, 68.5)]
+        assert isinstance(history.history(dimmer.id, "brightness")[0][1], int)
+
+    def test_range(self, history: DeviceHistory, usecases: DeviceUsecases, clock):
+        dimmer = usecases.create_device(Dimmer)
+        for now in range(1, 10):
+            clock.now = float(now)
+            usecases.update_device(dimmer.id, brightness=now)
+
+        assert history.history(dimmer.id, "brightness", since=3.0, until=5.0) == [
+            (3.0, 3),
+            (4.0, 4),
+            (5.0, 5),
+        ]
+        assert history.value_at(dimmer.id, "brightness", 4.5) == 4
+        assert history.value_at(dimmer.id, "brightness", -1.0) is None
+
+    def test_wraps_at_capacity(self, store: Store, clock: Clock):
+        history = DeviceHistory(store, capacity=3, clock=clock)
+        usecases = DeviceUsecases(DeviceRepository(store))
+        dimmer = usecases.create_device(Dimmer)
+        for now in range(1, 6):
+            clock.now = float(now)
+            usecases.update_device(dimmer.id, brightness=now)
+
+        assert history.history(dimmer.id, "brightness") == [
+            (3.0, 3),
+            (4.0, 4),
+            (5.0, 5),
+        ]
+        assert history.history(dimmer.id, "brightness", since=4.0) == [
+            (4.0, 4),
+            (5.0, 5),
+        ]
+        assert history.usage().entries == 3
+
+    def test_clock_going_back(self, history: DeviceHistory, usecases, clock):
+        dimmer = usecases.create_device(Dimmer)
+        clock.now = -5.0
+
+        usecases.update_device(dimmer.id, brightness=1)
+
+        assert history.history(dimmer.id, "brightness") == [(0.0, 0), (0.0, 1)]
+
+    def test_untracked(self, history: DeviceHistory, usecases: DeviceUsecases):
+        switch = usecases.create_device(Switch)
+
+        assert history.history(switch.id, "code") == []
+        assert history.history("missing", "state") == []
+
+    def test_memory_cap(self, store: Store):
+        history = DeviceHistory(store, max_bytes=2 * ENTRY_BYTES)
+        repo = DeviceRepository(store)
+        first, second, third = repo.create_many([Dimmer(), Dimmer(), Dimmer()])
+
+        usage = history.usage()
+
+        assert history.history(first.id, "brightness") == []
+        assert history.history(third.id, "brightness") != []
+        assert (usage.bytes, usage.devices, usage.evictions) == (2 * ENTRY_BYTES, 2, 1)
+
+    def test_unchanged_keeps_eviction_order(self, store: Store):
+        history = DeviceHistory(store, max_bytes=2 * ENTRY_BYTES)
+        repo = DeviceRepository(store)
+        first, second = repo.create_many([Dimmer(), Dimmer()])
+
+        repo.save(first)
+        third = repo.create(Dimmer())
+
+        assert history.history(first.id, "brightness") == []
+        assert history.history(second.id, "brightness") != []
+        assert history.history(third.id, "brightness") != []
+
+    def test_memory_cap_one_device(self, store: Store, clock: Clock):
+        history = DeviceHistory(store, max_bytes=4 * ENTRY_BYTES, clock=clock)
+        usecases = DeviceUsecases(DeviceRepository(store))
+        thermostat = usecases.create_device(
+            Thermostat, target_temp_f=70.0, actual_temp_f=70.0
+        )
+        for now in range(1, 6):
+            clock.now = float(now)
+            usecases.update_device(thermostat.id, actual_temp_f=70.0 + now)
+
+        usage = history.usage()
+
+        assert history.history(thermostat.id, "actual_temp_f") == [
+            (4.0, 74.0),
+            (5.0, 75.0),
+        ]
+        assert (usage.bytes, usage.devices, usage.evictions) == (3 * ENTRY_BYTES, 1, 0)
+
+    def test_memory_cap_too_small(self, store: Store):
+        history = DeviceHistory(store, max_bytes=ENTRY_BYTES)
+
+        DeviceRepository(store).create(
+            Thermostat(target_temp_f=70.0, actual_temp_f=70.0)
+        )
+
+        usage = history.usage()
+        assert (usage.bytes, usage.devices, usage.evictions) == (0, 0, 1)
+
+    def test_delete(self, history: DeviceHistory, usecases: DeviceUsecases):
+        dimmer = usecases.create_device(Dimmer)
+
+        usecases.delete_device(dimmer.id)
+
+        assert history.usage().entries == 0
+
+    def test_close(self, history: DeviceHistory, store: Store):
+        history.close()
+
+        assert store.listeners == []
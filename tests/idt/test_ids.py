@@ -0,0 +1,184 @@
+import uuid
+
+import pytest
+
+from idt.domains import Dimmer
+from idt.ids import (
+    MonotonicAllocator,
+    TimeOrderedAllocator,
+    UUIDAllocator,
+    decode,
+    encode,
+)
+from idt.repositories import DeviceRepository, Store
+
+
+class TestEncode:
+    @pytest.mark.parametrize(
+        "value, text",
+        [
+            (0, "0000000000000"),
+            (1, "0000000000001"),
+            (32, "0000000000010"),
+            ((1 << 64) - 1, "fzzzzzzzzzzzz"),
+        ],
+    )
+    def test_success(self, value: int, text: str):
+        assert encode(value) == text
+        assert decode(text) == value
+
+    def test_out_of_range(self):
+        with pytest.raises(ValueError):
+            encode(1 << 64)
+
+    def test_sorts_by_value(self):
+        values = [0, 31, 32, 1023, 1024, 1 << 40, 1 << 63]
+
+        assert sorted(map(encode, values)) == [encode(value) for value in values]
+
+
+class TestDecode:
+    def test_forgiving(self):
+        assert decode("OOOOOOOOOOOOL") == 1
+        assert decode("000000000000A") == 10
+
+    @pytest.mark.parametrize("text", ["", "0", "000000000000u", "g000000000000"])
+    def test_invalid(self, text: str):
+        with pytest.raises(ValueError):
+            decode(text)
+
+
+class TestUUIDAllocator:
+    def test_allocate(self):
+        assert uuid.UUID(UUIDAllocator().allocate()).version == 4
+
+    def test_allocate_many(self):
+        ids = UUIDAllocator().allocate_many(100)
+
+        assert len(set(ids)) == 100
+        for id_ in ids:
+            assert str(uuid.UUID(id_)) == id_
+            assert uuid.UUID(id_).version == 4
+
+    def test_canonical(self):
+        id_ = UUIDAllocator().allocate()
+
+        assert UUIDAllocator().canonical(id_.upper()) is id_
+
+
+class TestMonotonicAllocator:
+    def test_allocate(self):
+        allocator = MonotonicAllocator()
+
+        assert [allocator.allocate(), *allocator.allocate_many(2)] == [
+            encode(1),
+            encode(2),
+            encode(3),
+        ]
+
+    def test_canonical(self):
+        allocator = MonotonicAllocator()
+        id_ = allocator.allocate()
+
+        assert allocator.canonical(id_.upper()) is id_
+
+    def test_after(self):
+        ids = [encode(5), "not-an-id", encode(3)]
+
+        assert MonotonicAllocator.after(ids).allocate() == encode(6)
+
+    def test_advance(self):
+        allocator = MonotonicAllocator(next_value=9)
+        allocator.advance([encode(5)])
+        assert allocator.allocate() == encode(9)
+
+        allocator.advance([encode(20), "not-an-id"])
+        assert allocator.allocate() == encode(21)
+
+    def test_exhausted(self):
+        allocator = MonotonicAllocator(next_value=(1 << 64) - 1)
+        allocator.allocate()
+
+        with pytest.raises(ValueError):
+            allocator.allocate()
+
+
+class TestTimeOrderedAllocator:
+    def test_allocate(self):
+        allocator = TimeOrderedAllocator(clock=lambda: 7)
+
+        assert decode(allocator.allocate()) == 7 << 16
+
+    def test_ordered_within_a_tick(self):
+        allocator = TimeOrderedAllocator(clock=lambda: 7)
+
+        ids = allocator.allocate_many(3) + [allocator.allocate()]
+
+        assert sorted(ids) == ids
+        assert len(set(ids)) == 4
+
+    def test_advance(self):
+        allocator = TimeOrderedAllocator(clock=lambda: 7)
+
+        allocator.advance([encode(9 << 16)])
+
+        assert decode(allocator.allocate()) == (9 << 16) + 1
+
+    def test_clock_going_back(self):
+        now = [9]
+        allocator = TimeOrderedAllocator(clock=lambda: now[0])
+        first = allocator.allocate()
+        now[0] = 8
+
+        assert allocator.allocate() > first
+
+
+class TestStore:
+    def test_allocator(self):
+        repo = DeviceRepository(Store(ids=MonotonicAllocator()))
+
+        device = repo.create(Dimmer())
+        devices = repo.create_many([Dimmer(), Dimmer()])
+
+        assert [device.id, *(d.id for d in devices)] == [
+            encode(1),
+            encode(2),
+            encode(3),
+        ]
+        assert repo.get(encode(2)) is devices[0]
+
+    def test_default(self):
+        device = DeviceRepository(Store()).create(Dimmer())
+
+        assert isinstance(device.id, str)
+
+    def test_resumes_past_loaded(self):
+        store = Store(
+            devices={encode(4): Dimmer(id=encode(4))}, ids=MonotonicAllocator()
+        )
+
+        assert DeviceRepository(store).create(Dimmer()).id == encode(5)
+
+    def test_rejects_live_id(self):
+        store = Store(ids=MonotonicAllocator())
+        repo = DeviceRepository(store)
+        existing = repo.create(Dimmer())
+        store.ids.next_value = 1
+
+        with pytest.raises(ValueError) as e:
+            repo.create(Dimmer())
+        store.ids.next_value = 1
+        with pytest.raises(ValueError):
+            repo.create_many([Dimmer(), Dimmer()])
+
+        assert str(e.value) == f"Device exists: id={existing.id}"
+        assert list(store.devices.values()) == [existing]
+
+    @pytest.mark.parametrize("ids", [MonotonicAllocator(), UUIDAllocator()])
+    def test_get_canonical(self, ids):
+        repo = DeviceRepository(Store(ids=ids))
+        device = repo.create(Dimmer())
+
+        assert repo.get(device.id.upper()) is device
+        with pytest.raises(KeyError):
+            repo.get("not-an-id")
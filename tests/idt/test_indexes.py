@@ -0,0 +1,160 @@
+import pytest
+
+from idt.domains import (
+    Device,
+    Dimmer,
+    Dwelling,
+    Hub,
+    Lock,
+    LockState,
+    Switch,
+    SwitchState,
+)
+from idt.indexes import DeviceIndex, InsertionOrder
+
+
+@pytest.fixture
+def index() -> DeviceIndex:
+    return DeviceIndex()
+
+
+class TestDeviceIndex:
+    class TestAdd:
+        def test_new(self, index: DeviceIndex):
+            lock = Lock(id="lock", state=LockState.LOCKED)
+
+            index.add(lock)
+
+            assert index.by_type == {Lock: {"lock"}}
+            assert index.by_hub == {None: {"lock"}}
+            assert index.by_state == {LockState.LOCKED: {"lock"}}
+
+        def test_changed(self, index: DeviceIndex):
+            switch = Switch(id="switch", state=SwitchState.OFF)
+            index.add(switch)
+            switch.state = SwitchState.ON
+            switch.hub = Hub(id="hub")
+
+            index.add(switch)
+
+            assert index.by_hub == {"hub": {"switch"}}
+            assert index.by_state == {SwitchState.ON: {"switch"}}
+
+        def test_stateless(self, index: DeviceIndex):
+            index.add(Dimmer(id="dimmer"))
+
+            assert index.by_state == {}
+
+    class TestDiscard:
+        def test_not_there(self, index: DeviceIndex):
+            index.discard("not-here")
+
+            assert index.device_keys == {}
+
+        def test_found(self, index: DeviceIndex):
+            index.add(Lock(id="lock"))
+
+            index.discard("lock")
+
+            assert index.by_type == {}
+            assert index.by_hub == {}
+            assert index.by_state == {}
+            assert index.device_keys == {}
+
+    class TestAddHub:
+        def test_moved(self, index: DeviceIndex):
+            hub = Hub(id="hub")
+            index.add_hub(hub)
+            hub.dwelling = Dwelling(id="dwelling")
+
+            index.add_hub(hub)
+
+            assert index.hubs_by_dwelling == {"dwelling": {"hub"}}
+            assert index.hub_keys == {"hub": "dwelling"}
+
+    class TestFind:
+        @pytest.fixture
+        def populated(self, index: DeviceIndex) -> DeviceIndex:
+            hub = Hub(id="hub")
+            Dwelling(id="dwelling", hubs={hub.id: hub})
+            devices = [
+                Lock(id="locked", state=LockState.LOCKED),
+                Lock(id="unlocked", state=LockState.UNLOCKED),
+                Switch(id="on", state=SwitchState.ON),
+                Dimmer(id="dimmer"),
+            ]
+            hub.pair_device(devices[0])
+            hub.pair_device(devices[2])
+            index.add_hub(hub)
+            for device in devices:
+                index.add(device)
+            return index
+
+        @pytest.mark.parametrize(
+            "args,kwargs,expected",
+            [
+                ((), {}, {"locked", "unlocked", "on", "dimmer"}),
+                ((Device,), {}, {"locked", "unlocked", "on", "dimmer"}),
+                ((Lock,), {}, {"locked", "unlocked"}),
+                ((Lock,), {"state": LockState.LOCKED}, {"locked"}),
+                ((), {"hub_id": "hub"}, {"locked", "on"}),
+                ((), {"hub_id": "not-here"}, set()),
+                ((Switch,), {"dwelling_id": "dwelling"}, {"on"}),
+                ((Lock,), {"dwelling_ids": ["dwelling", "other"]}, {"locked"}),
+                ((), {"dwelling_ids": []}, set()),
+                ((), {"paired": False}, {"unlocked", "dimmer"}),
+                ((), {"paired": True}, {"locked", "on"}),
+                ((Lock,), {"paired": True}, {"locked"}),
+            ],
+        )
+        def test_success(self, populated: DeviceIndex, args, kwargs, expected):
+            assert populated.find(*args, **kwargs) == expected
+
+
+class TestInsertionOrder:
+    @pytest.fixture
+    def order(self) -> InsertionOrder:
+        order = InsertionOrder()
+        for key in "abcde":
+            order.add(key)
+        return order
+
+    class TestAdd:
+        def test_existing(self, order: InsertionOrder):
+            order.add("a")
+
+            assert list(order.after()) == list(enumerate("abcde"))
+
+    class TestAfter:
+        def test_cursor(self, order: InsertionOrder):
+            assert list(order.after(2)) == [(3, "d"), (4, "e")]
+
+        def test_concurrent_changes(self, order: InsertionOrder):
+            entries = order.after()
+            first = next(entries)
+
+            for key in "bcd":
+                order.discard(key)
+            order.add("f")
+
+            assert [first, *entries] == [(0, "a"), (4, "e"), (5, "f")]
+
+    class TestDiscard:
+        def test_compacts(self, order: InsertionOrder):
+            for key in "abc":
+                order.discard(key)
+
+            assert order.keys == ["d", "e"]
+            assert list(order.after(1)) == [(3, "d"), (4, "e")]
+
+        def test_readded(self, order: InsertionOrder):
+            order.discard("a")
+            order.add("a")
+
+            assert [key for _, key in order.after()] == list("bcdea")
+
+    class TestAfterOf:
+        def test_cursor(self, order: InsertionOrder):
+            assert list(order.after_of("eca")) == [(0, "a"), (2, "c"), (4, "e")]
+            assert list(order.after_of("eca", 2)) == [(4, "e")]
+            assert list(order.after_of("xa")) == [(0, "a")]
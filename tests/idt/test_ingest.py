@@ -0,0 +1,116 @@
+import pytest
+from pytest_mock import MockerFixture
+
+from idt.domains import Thermostat
+from idt.feed import Change, ChangeFeed
+from idt.ingest import IngestStats, TelemetryIngestor, batches
+from idt.repositories import DeviceRepository, Store
+
+
+@pytest.fixture
+def repo() -> DeviceRepository:
+    repo = DeviceRepository(Store())
+    repo.save_many(
+        [
+            Thermostat(id="t1", target_temp_f=70.0, actual_temp_f=70.0),
+            Thermostat(id="t2", target_temp_f=70.0, actual_temp_f=70.0),
+        ]
+    )
+    return repo
+
+
+@pytest.fixture
+def ingestor(repo: DeviceRepository) -> TelemetryIngestor:
+    return TelemetryIngestor(repo, batch_size=3)
+
+
+def test_batches():
+    readings = [("t1", "actual_temp_f", float(i), i) for i in range(5)]
+
+    assert [len(batch) for batch in batches(readings, 2)] == [2, 2, 1]
+
+
+class TestTelemetryIngestor:
+    class TestIngest:
+        def test_last_write_wins(
+            self, repo: DeviceRepository, ingestor: TelemetryIngestor
+        ):
+            stats = ingestor.ingest(
+                [
+                    ("t1", "actual_temp_f", 71.0, 1),
+                    ("t1", "actual_temp_f", 72.0, 2),
+                    ("t2", "actual_temp_f", 68.0, 1),
+                ]
+            )
+
+            assert repo.get("t1").actual_temp_f == 72.0
+            assert repo.get("t2").actual_temp_f == 68.0
+            assert stats == IngestStats(received=3, applied=2, coalesced=1, batches=1)
+
+        def test_drops_stale(self, repo: DeviceRepository, ingestor: TelemetryIngestor):
+            stats = ingestor.ingest(
+                [
+                    ("t1", "actual_temp_f", 72.0, 2),
+                    ("t1", "actual_temp_f", 71.0, 1),
+                    ("t2", "actual_temp_f", 68.0, 1),
+                    ("t1", "actual_temp_f", 71.5, 1),
+                    ("t1", "actual_temp_f", 72.0, 2),
+                ]
+            )
+
+            assert repo.get("t1").actual_temp_f == 72.0
+            assert stats.stale == 3
+            assert stats.batches == 2
+
+        def test_bounds_seen(self, repo: DeviceRepository):
+            ingestor = TelemetryIngestor(repo, batch_size=1, max_seen=2)
+
+            stats = ingestor.ingest(
+                [
+                    ("t1", "actual_temp_f", 71.0, 5),
+                    ("t2", "actual_temp_f", 68.0, 5),
+                    ("t2", "target_temp_f", 65.0, 5),
+                    # t1 was forgotten, so its replay applies; t2 is still known
+                    ("t1", "actual_temp_f", 71.0, 5),
+                    ("t2", "target_temp_f", 65.0, 5),
+                ]
+            )
+
+            assert len(ingestor._seen) == 2
+            assert (stats.applied, stats.stale) == (4, 1)
+
+        def test_rejects_unknown(
+            self, repo: DeviceRepository, ingestor: TelemetryIngestor
+        ):
+            stats = ingestor.ingest(
+                [
+                    ("missing", "actual_temp_f", 71.0, 1),
+                    ("t1", "brightness", 10, 1),
+                    ("t1", "hub", None, 1),
+                ]
+            )
+
+            assert stats.rejected == 3
+            assert repo.get("t1").actual_temp_f == 70.0
+
+        def test_one_write_per_batch(
+            self,
+            mocker: MockerFixture,
+            repo: DeviceRepository,
+            ingestor: TelemetryIngestor,
+        ):
+            put_devices = mocker.spy(repo.store, "put_devices")
+
+            ingestor.ingest([("t1", "actual_temp_f", float(i), i) for i in range(4)])
+
+            assert put_devices.call_count == 2
+
+        def test_feed(self, repo: DeviceRepository):
+            feed = ChangeFeed()
+            subscription = feed.subscribe()
+            ingestor = TelemetryIngestor(repo, feed=feed)
+
+            ingestor.ingest([("t1", "actual_temp_f", 71.0, 1)])
+
+            events = subscription.read()
+            assert [(e.change, e.device_id) for e in events] == [(Change.UPDATED, "t1")]
@@ -0,0 +1,106 @@
+from pathlib import Path
+
+import pytest
+
+from idt.domains import Dimmer, Dwelling, DwellingState, Hub, Lock, LockState
+from idt.journal import JournalStore
+from idt.repositories import DeviceRepository, DwellingRepository, HubRepository
+
+
+@pytest.fixture
+def directory(tmp_path: Path) -> str:
+    return str(tmp_path / "journal")
+
+
+@pytest.fixture
+def store(directory: str) -> JournalStore:
+    store = JournalStore(directory=directory, snapshot_interval=None)
+    yield store
+    store.close()
+
+
+def reopen(store: JournalStore) -> JournalStore:
+    store.close()
+    return JournalStore(directory=store.directory, snapshot_interval=None)
+
+
+def populate(store: JournalStore) -> Lock:
+    lock = DeviceRepository(store).create(Lock(state=LockState.LOCKED, code=["1"]))
+    hub = Hub(id="hub")
+    hub.pair_device(lock)
+    HubRepository(store).save(hub)
+    dwelling = Dwelling(id="dwelling")
+    dwelling.install_hub(hub)
+    dwelling.state = DwellingState.OCCUPIED
+    DwellingRepository(store).save(dwelling)
+    return lock
+
+
+class TestJournalStore:
+    def test_replay(self, store: JournalStore):
+        lock = populate(store)
+        dimmer = DeviceRepository(store).create(Dimmer(brightness=10))
+        DeviceRepository(store).delete(dimmer)
+
+        restored = reopen(store)
+
+        assert list(restored.devices) == [str(lock.id)]
+        restored_lock = restored.devices[str(lock.id)]
+        assert restored_lock.state == LockState.LOCKED
+        assert restored_lock.hub is restored.hubs["hub"]
+        assert restored.hubs["hub"].dwelling is restored.dwellings["dwelling"]
+        assert restored.dwellings["dwelling"].state == DwellingState.OCCUPIED
+        assert DeviceRepository(restored).find(Lock, dwelling_id="dwelling")
+        restored.close()
+
+    def test_unpair(self, store: JournalStore):
+        lock = populate(store)
+        hub = store.hubs["hub"]
+        hub.unpair_device(lock)
+        HubRepository(store).save(hub)
+
+        restored = reopen(store)
+
+        assert restored.devices[str(lock.id)].hub is None
+        assert restored.hubs["hub"].devices == {}
+        restored.close()
+
+    def test_snapshot(self, store: JournalStore):
+        lock = populate(store)
+        store.snapshot()
+        lock.state = LockState.UNLOCKED
+        DeviceRepository(store).save(lock)
+
+        restored = reopen(store)
+
+        assert sorted(p.name for p in Path(store.directory).iterdir()) == [
+            "journal.00000002",
+            "journal.00000003",
+            "snapshot",
+        ]
+        assert restored.devices[str(lock.id)].state == LockState.UNLOCKED
+        assert restored.devices[str(lock.id)].hub is restored.hubs["hub"]
+        restored.close()
+
+    def test_torn_tail(self, store: JournalStore):
+        lock = populate(store)
+        store.sync()
+        with open(store._file.name, "ab") as file:
+            file.write(b"\x10\x00")
+
+        restored = reopen(store)
+
+        assert list(restored.devices) == [str(lock.id)]
+        restored.close()
+
+    def test_synchronous(self, directory: str):
+        store = JournalStore(
+            directory=directory, synchronous=True, snapshot_interval=None
+        )
+        lock = populate(store)
+
+        assert store._durable == store._written
+        store.close()
+        restored = JournalStore(directory=directory, snapshot_interval=None)
+        assert list(restored.devices) == [str(lock.id)]
+        restored.close()
@@ -0,0 +1,123 @@
+from pathlib import Path
+
+import pytest
+
+from idt.domains import Dimmer, Dwelling, DwellingState, Hub, Lock, LockState, Switch
+from idt.ids import MonotonicAllocator, encode
+from idt.mapped import MappedStore, _Section, write_snapshot
+from idt.repositories import (
+    DeviceRepository,
+    DwellingRepository,
+    HubRepository,
+    Page,
+    Store,
+)
+
+
+@pytest.fixture
+def path(tmp_path: Path) -> str:
+    source = Store()
+    lock = Lock(id="lock", state=LockState.LOCKED, code=["1"])
+    switch = Switch(id="switch")
+    dimmer = Dimmer(id="dimmer", brightness=20)
+    DeviceRepository(source).save_many([dimmer, lock, switch])
+    hub = Hub(id="hub")
+    hub.pair_device(lock)
+    hub.pair_device(switch)
+    dwelling = Dwelling(id="dwelling", state=DwellingState.OCCUPIED)
+    dwelling.install_hub(hub)
+    DwellingRepository(source).save(dwelling)
+    DwellingRepository(source).save(Dwelling(id="empty"))
+
+    path = str(tmp_path / "store.snap")
+    with open(path, "wb") as file:
+        write_snapshot(source, file)
+    return path
+
+
+@pytest.fixture
+def store(path: str) -> MappedStore:
+    store = MappedStore(path=path)
+    yield store
+    store.close()
+
+
+class TestMappedStore:
+    def test_invalid(self, tmp_path: Path):
+        path = tmp_path / "bad.snap"
+        path.write_bytes(b"\0" * 100)
+
+        with pytest.raises(ValueError) as e:
+            MappedStore(path=str(path))
+
+        assert str(e.value) == f"Not a store snapshot: path={path}"
+
+    def test_lazy(self, store: MappedStore):
+        lock = DeviceRepository(store).get("lock")
+
+        assert lock.state == LockState.LOCKED
+        assert lock.code == ["1"]
+        assert lock.hub is dict.__getitem__(store.hubs, "hub")
+        assert lock.hub.dwelling.state == DwellingState.OCCUPIED
+        assert set(lock.hub.devices) == {"lock", "switch"}
+        assert set(dict.keys(store.devices)) == {"lock", "switch"}
+        assert set(dict.keys(store.dwellings)) == {"dwelling"}
+
+    def test_not_there(self, store: MappedStore):
+        with pytest.raises(KeyError) as e:
+            DeviceRepository(store).get("not-here")
+
+        assert str(e.value) == "'not-here'"
+        assert "not-here" not in store.devices
+        assert "dimmer" in store.devices
+
+    def test_list(self, store: MappedStore):
+        DeviceRepository(store).get("switch")
+
+        devices = DeviceRepository(store).list()
+
+        assert [device.id for device in devices] == ["dimmer", "lock", "switch"]
+        assert [d.id for d in DwellingRepository(store).iter()] == [
+            "dwelling",
+            "empty",
+        ]
+
+    def test_find(self, store: MappedStore):
+        DeviceRepository(store).get("lock")
+
+        found = DeviceRepository(store).find(dwelling_id="dwelling")
+
+        assert {device.id for device in found} == {"lock", "switch"}
+
+    def test_writes(self, store: MappedStore):
+        device_repo = DeviceRepository(store)
+        device_repo.delete(device_repo.get("dimmer"))
+        device_repo.save(Dimmer(id="new"))
+        hub = HubRepository(store).get("hub")
+        hub.unpair_device(device_repo.get("switch"))
+        HubRepository(store).save(hub)
+
+        assert "dimmer" not in store.devices
+        with pytest.raises(KeyError):
+            device_repo.get("dimmer")
+        assert device_repo.page() == Page(
+            [device_repo.get(id_) for id_ in ("lock", "switch", "new")]
+        )
+        assert {d.id for d in device_repo.find(paired=False)} == {"switch", "new"}
+
+    def test_allocator_resumes(self, tmp_path: Path, mocker):
+        source = Store(ids=MonotonicAllocator())
+        repo = DeviceRepository(source)
+        repo.create_many([Dimmer() for _ in range(3)])
+        repo.save(Dimmer(id="zz-custom"))
+        path = str(tmp_path / "store.snap")
+        with open(path, "wb") as file:
+            write_snapshot(source, file)
+        key = mocker.spy(_Section, "key")
+
+        store = MappedStore(path=path, ids=MonotonicAllocator())
+
+        # the greatest id is read off the end of the sorted keys, not scanned for
+        assert key.call_count == 2
+        assert DeviceRepository(store).create(Dimmer()).id == encode(4)
+        store.close()
@@ -0,0 +1,133 @@
+import urllib.request
+
+import pytest
+
+from idt.domains import Dimmer
+from idt.metrics import Histogram, Metrics, instrument
+from idt.repositories import DeviceRepository, Store
+from idt.usecases import DeviceUsecases
+
+
+@pytest.fixture
+def store():
+    return Store()
+
+
+@pytest.fixture
+def metrics():
+    return Metrics()
+
+
+@pytest.fixture
+def usecases(store, metrics):
+    repo = instrument(DeviceRepository(store), metrics)
+    return instrument(DeviceUsecases(repo), metrics)
+
+
+class TestHistogram:
+    class TestPercentile:
+        def test_empty(self):
+            assert Histogram().percentile(0.5) == 0
+
+        def test_within_bucket_error(self):
+            histogram = Histogram()
+            for value in range(1, 10_001):
+                histogram.record(value * 1000)
+
+            assert histogram.percentile(0.5) == pytest.approx(5_000_000, rel=0.07)
+            assert histogram.percentile(0.99) == pytest.approx(9_900_000, rel=0.07)
+            assert histogram.percentile(1.0) == 10_000_000
+
+    class TestCumulative:
+        def test_success(self):
+            histogram = Histogram()
+            for value in (1, 10, 100, 1000):
+                histogram.record(value)
+
+            assert histogram.cumulative((5, 500, 5000)) == (1, 3, 4)
+
+
+class TestInstrument:
+    def test_counts_calls(self, usecases, metrics):
+        device = usecases.create_device(Dimmer, brightness=1)
+        usecases.update_device(device.id, brightness=2)
+
+        snapshot = metrics.snapshot()
+
+        assert snapshot["DeviceUsecases.create_device"]["calls"] == 1
+        assert snapshot["DeviceUsecases.update_device"]["calls"] == 1
+        assert snapshot["DeviceRepository.save"]["calls"] == 2
+        assert snapshot["DeviceUsecases.delete_device"]["calls"] == 0
+
+    def test_counts_errors(self, usecases, metrics):
+        with pytest.raises(KeyError):
+            usecases.delete_device("missing")
+
+        stats = metrics.snapshot()["DeviceUsecases.delete_device"]
+
+        assert stats["calls"] == 1
+        assert stats["errors"] == 1
+
+    def test_times_iterators_until_exhausted(self, usecases, metrics):
+        usecases.create_device(Dimmer, brightness=1)
+
+        iterator = usecases.iter_devices()
+        assert metrics.snapshot()["DeviceUsecases.iter_devices"]["calls"] == 0
+
+        assert len(list(iterator)) == 1
+        assert metrics.snapshot()["DeviceUsecases.iter_devices"]["calls"] == 1
+
+    def test_skips_context_managers(self, usecases, metrics):
+        assert "DeviceRepository.locked" not in metrics.snapshot()
+
+    def test_disabled(self, usecases, metrics):
+        metrics.enabled = False
+
+        usecases.create_device(Dimmer, brightness=1)
+
+        assert metrics.snapshot()["DeviceUsecases.create_device"]["calls"] == 0
+
+
+class TestMetrics:
+    class TestReset:
+        def test_success(self, usecases, metrics):
+            usecases.create_device(Dimmer, brightness=1)
+
+            metrics.reset()
+            usecases.create_device(Dimmer, brightness=1)
+
+            assert metrics.snapshot()["DeviceUsecases.create_device"]["calls"] == 1
+
+    class TestToPrometheus:
+        def test_success(self, usecases, metrics):
+            usecases.create_device(Dimmer, brightness=1)
+
+            text = metrics.to_prometheus()
+            labels = 'component="DeviceUsecases",method="create_device"'
+
+            assert "# TYPE idt_calls_total counter" in text
+            assert f"idt_calls_total{{{labels}}} 1" in text
+            assert f"idt_errors_total{{{labels}}} 0" in text
+            assert f'idt_latency_seconds_bucket{{{labels},le="+Inf"}} 1' in text
+            assert f"idt_latency_seconds_count{{{labels}}} 1" in text
+
+    class TestWritePrometheus:
+        def test_success(self, usecases, metrics, tmp_path):
+            path = tmp_path / "idt.prom"
+
+            metrics.write_prometheus(str(path))
+
+            assert path.read_text() == metrics.to_prometheus()
+
+    class TestServe:
+        def test_success(self, usecases, metrics):
+            server = metrics.serve(port=0)
+            try:
+                host, port = server.server_address
+                with urllib.request.urlopen(f"http://{host}:{port}/metrics") as resp:
+                    body = resp.read().decode()
+            finally:
+                server.shutdown()
+                server.server_close()
+
+            assert "idt_calls_total" in body
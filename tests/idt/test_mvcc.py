@@ -0,0 +1,169 @@
+import threading
+
+import pytest
+
+from idt.domains import Dimmer, Dwelling, DwellingState, Hub
+from idt.mvcc import VersionedStore
+from idt.repositories import DeviceRepository, DwellingRepository, HubRepository
+
+
+@pytest.fixture
+def store() -> VersionedStore:
+    store = VersionedStore()
+    dwelling = Dwelling(id="dwelling")
+    hub = Hub(id="hub")
+    hub.pair_device(Dimmer(id="dimmer", brightness=10))
+    dwelling.install_hub(hub)
+    DwellingRepository(store).save(dwelling)
+    return store
+
+
+@pytest.fixture
+def device_repo(store: VersionedStore) -> DeviceRepository:
+    return DeviceRepository(store)
+
+
+class TestSnapshot:
+    def test_isolated_from_updates(self, store, device_repo: DeviceRepository):
+        with store.snapshot() as snapshot:
+            device = device_repo.get("dimmer")
+            device.brightness = 90
+            device_repo.save(device)
+
+            assert snapshot.device("dimmer")["attrs"] == {"brightness": 10}
+        with store.snapshot() as snapshot:
+            assert snapshot.device("dimmer")["attrs"] == {"brightness": 90}
+
+    def test_isolated_from_creates_and_deletes(
+        self, store: VersionedStore, device_repo: DeviceRepository
+    ):
+        device_repo.create(Dimmer(id=None))
+        with store.snapshot() as snapshot:
+            created = device_repo.create(Dimmer())
+            deleted = [d for d in device_repo.list() if d.hub is None][0]
+            device_repo.delete(deleted)
+
+            ids = [record["id"] for record in snapshot.devices()]
+
+        assert created.id not in ids
+        assert deleted.id in ids
+
+    def test_transaction_is_atomic(self, store: VersionedStore):
+        dwelling_repo = DwellingRepository(store)
+        with store.transaction():
+            dwelling = dwelling_repo.get("dwelling")
+            dwelling.state = DwellingState.OCCUPIED
+            dwelling_repo.save(dwelling)
+            with store.snapshot() as snapshot:
+                assert snapshot.dwelling("dwelling")["state"] == "VACANT"
+
+        with store.snapshot() as snapshot:
+            assert snapshot.dwelling("dwelling")["state"] == "OCCUPIED"
+
+    def test_transaction_excludes_other_threads(
+        self, store: VersionedStore, device_repo: DeviceRepository
+    ):
+        version = store.version
+        seen = []
+        written = threading.Event()
+
+        def write():
+            device_repo.save(Dimmer(id="other", brightness=99))
+            with store.snapshot() as snapshot:
+                seen.append(snapshot.device("other"))
+            written.set()
+
+        with store.transaction():
+            device_repo.save(Dimmer(id="dimmer", brightness=20))
+            writer = threading.Thread(target=write)
+            writer.start()
+            # a standalone write must not join the open transaction
+            assert not written.wait(0.1)
+        writer.join()
+
+        assert seen[0]["attrs"] == {"brightness": 99}
+        # the transaction and the write each committed a version of their own
+        assert store.version == version + 2
+
+    def test_to_store(self, store: VersionedStore, device_repo: DeviceRepository):
+        with store.snapshot() as snapshot:
+            device_repo.save(Dimmer(id="other"))
+
+            copy = snapshot.to_store()
+
+        (dwelling,) = DwellingRepository(copy).list()
+        assert list(dwelling.hubs["hub"].devices) == ["dimmer"]
+        assert HubRepository(copy).get("hub").dwelling is dwelling
+        assert list(copy.devices) == ["dimmer"]
+
+    def test_closed(self, store: VersionedStore):
+        snapshot = store.snapshot()
+        snapshot.close()
+        snapshot.close()
+
+        with pytest.raises(ValueError):
+            snapshot.device("dimmer")
+
+
+class TestVersionedStore:
+    def test_seeds_existing(self):
+        store = VersionedStore(devices={"dimmer": Dimmer(id="dimmer")})
+
+        with store.snapshot() as snapshot:
+            assert snapshot.device("dimmer")["id"] == "dimmer"
+
+    def test_collects_without_readers(
+        self, store: VersionedStore, device_repo: DeviceRepository
+    ):
+        device = device_repo.get("dimmer")
+        for brightness in range(5):
+            device.brightness = brightness
+            device_repo.save(device)
+
+        assert store.chain_lengths() == {"devices": 1, "hubs": 1, "dwellings": 1}
+
+    def test_keeps_versions_for_readers(
+        self, store: VersionedStore, device_repo: DeviceRepository
+    ):
+        device = device_repo.get("dimmer")
+        snapshot = store.snapshot()
+        for brightness in range(5):
+            device.brightness = brightness
+            device_repo.save(device)
+        device_repo.save(Dimmer(id="deleted"))
+        device_repo.delete(device_repo.get("deleted"))
+
+        assert store.chain_lengths()["devices"] == 8
+
+        snapshot.close()
+
+        assert store.chain_lengths()["devices"] == 1
+
+    def test_consistent_under_writes(self, store: VersionedStore):
+        # a writer keeps swapping which of two dwellings is occupied; every
+        # snapshot must see exactly one of them occupied
+        dwelling_repo = DwellingRepository(store)
+        dwelling_repo.save(Dwelling(id="other", state=DwellingState.OCCUPIED))
+        stop = threading.Event()
+
+        def swap():
+            while not stop.is_set():
+                with store.transaction():
+                    for dwelling in dwelling_repo.list():
+                        dwelling.state = (
+                            DwellingState.VACANT
+                            if dwelling.state == DwellingState.OCCUPIED
+                            else DwellingState.OCCUPIED
+                        )
+                        dwelling_repo.save(dwelling)
+
+        writer = threading.Thread(target=swap)
+        writer.start()
+        try:
+            for _ in range(500):
+                with store.snapshot() as snapshot:
+                    states = [record["state"] for record in snapshot.dwellings()]
+                    assert sorted(states) == ["OCCUPIED", "VACANT"]
+        finally:
+            stop.set()
+            writer.join()
@@ -0,0 +1,292 @@
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from idt.domains import (
+    Dimmer,
+    Dwelling,
+    DwellingState,
+    Hub,
+    Lock,
+    LockState,
+    Switch,
+    SwitchState,
+)
+from idt.replay import CommandLog, Replayer, capture, main, read_log
+from idt.repositories import (
+    DeviceRepository,
+    DwellingRepository,
+    HubRepository,
+    Store,
+)
+from idt.serialization import device_record
+from idt.transfer import export_store, import_store
+from idt.usecases import SHUTDOWN, DeviceUsecases, DwellingUsecases, HubUsecases
+
+
+@pytest.fixture
+def store() -> Store:
+    store = Store()
+    dwelling = Dwelling(id="dwelling")
+    dwelling.install_hub(Hub(id="hub"))
+    DwellingRepository(store).save(dwelling)
+    HubRepository(store).save(Hub(id="spare"))
+    return store
+
+
+def entries(*ops) -> list:
+    return [{"at": float(i), **op} for i, op in enumerate(ops)]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class TestCapture:
+    def test_writes_calls(self, store: Store):
+        buffer = io.StringIO()
+        log = CommandLog(buffer, clock=lambda: 1.5)
+        device_uc = capture(DeviceUsecases(DeviceRepository(store)), log)
+        hub_uc = capture(HubUsecases(HubRepository(store), device_uc.repo), log)
+
+        dimmer = device_uc.create_device(Dimmer, brightness=10)
+        device_uc.update_device(dimmer.id, brightness=20)
+        hub_uc.pair_devices("hub", iter([dimmer.id]))
+
+        buffer.seek(0)
+        assert list(read_log(buffer)) == [
+            {
+                "at": 1.5,
+                "op": "create_device",
+                "type": "Dimmer",
+                "id": dimmer.id,
+                "attrs": {"brightness": 10},
+            },
+            {
+                "at": 1.5,
+                "op": "update_device",
+                "id": dimmer.id,
+                "attrs": {"brightness": 20},
+            },
+            {"at": 1.5, "op": "pair_device", "hub_id": "hub", "device_id": dimmer.id},
+        ]
+        assert store.devices[dimmer.id].hub is store.hubs["hub"]
+
+    def test_skips_failures(self, store: Store):
+        buffer = io.StringIO()
+        device_uc = capture(DeviceUsecases(DeviceRepository(store)), CommandLog(buffer))
+
+        with pytest.raises(KeyError):
+            device_uc.delete_device("not-here")
+
+        assert buffer.getvalue() == ""
+
+    def test_subclass_and_keyword_iterators(self, store: Store):
+        class AuditedHubUsecases(HubUsecases):
+            pass
+
+        DeviceRepository(store).save_many([Dimmer(id="1"), Dimmer(id="2")])
+        buffer = io.StringIO()
+        hub_uc = capture(
+            AuditedHubUsecases(HubRepository(store), DeviceRepository(store)),
+            CommandLog(buffer, clock=lambda: 0.0),
+        )
+
+        hub_uc.pair_devices("hub", device_ids=iter(["1", "2"]))
+
+        buffer.seek(0)
+        assert [entry["device_id"] for entry in read_log(buffer)] == ["1", "2"]
+        assert list(store.hubs["hub"].devices) == ["1", "2"]
+
+    def test_nothing_to_capture(self, store: Store):
+        with pytest.raises(TypeError) as e:
+            capture(DeviceRepository(store), CommandLog(io.StringIO()))
+
+        assert str(e.value) == "Nothing to capture: type=DeviceRepository"
+
+    def test_round_trip(self, store: Store):
+        # a copy taken before the traffic, replayed, ends up like the original
+        before = io.BytesIO()
+        export_store(store, before)
+        buffer = io.StringIO()
+        log = CommandLog(buffer)
+        device_repo = DeviceRepository(store)
+        device_uc = capture(DeviceUsecases(device_repo), log)
+        hub_uc = capture(HubUsecases(HubRepository(store), device_repo), log)
+        dwelling_uc = capture(
+            DwellingUsecases(DwellingRepository(store), HubRepository(store)), log
+        )
+
+        lock, switch_, dimmer = device_uc.create_devices(
+            [(Lock, {"code": ["1"]}), (Switch, {}), (Dimmer, {"brightness": 5})]
+        )
+        hub_uc.pair_devices("hub", [lock.id, switch_.id, dimmer.id])
+        hub_uc.pair_devices("spare", [dimmer.id], move=True)
+        device_uc.update_devices({switch_.id: {"state": SwitchState.ON}})
+        dwelling_uc.occupy("dwelling")
+        dwelling_uc.apply_to_devices("dwelling", Lock, state=LockState.LOCKED)
+        dwelling_uc.apply_scene(["dwelling"], SHUTDOWN)
+        hub_uc.unpair_device("spare", dimmer.id)
+        device_uc.delete_device(dimmer.id)
+
+        before.seek(0)
+        replica = import_store(before)
+        buffer.seek(0)
+        replayer = Replayer.of(replica, batch_size=10)
+        report = replayer.replay(read_log(buffer))
+
+        assert report.errors == 0
+        assert [replayer.ids[id_] for id_ in (lock.id, switch_.id)] == list(
+            replica.devices
+        )
+        assert [device_record(d)["attrs"] for d in replica.devices.values()] == [
+            device_record(d)["attrs"] for d in store.devices.values()
+        ]
+        assert list(replica.hubs["hub"].devices) == list(replica.devices)
+        assert replica.dwellings["dwelling"].state == DwellingState.OCCUPIED
+
+
+class TestReplayer:
+    def test_maps_created_ids(self, store: Store):
+        replayer = Replayer.of(store)
+
+        replayer.replay(
+            entries(
+                {"op": "create_device", "type": "Dimmer", "id": "old", "attrs": {}},
+                {"op": "create_hub", "id": "old-hub"},
+                {"op": "pair_device", "hub_id": "old-hub", "device_id": "old"},
+                {"op": "update_device", "id": "old", "attrs": {"brightness": 30}},
+            )
+        )
+
+        device = store.devices[replayer.ids["old"]]
+        assert device.id != "old"
+        assert device.brightness == 30
+        assert device.hub is store.hubs[replayer.ids["old-hub"]]
+
+    def test_batches(self, store: Store):
+        replayer = Replayer.of(store, batch_size=2)
+
+        report = replayer.replay(
+            entries(
+                *(
+                    {"op": "create_device", "type": "Switch", "id": str(i), "attrs": {}}
+                    for i in range(3)
+                ),
+                {"op": "update_device", "id": "0", "attrs": {"state": "ON"}},
+                {"op": "update_device", "id": "0", "attrs": {"state": "OFF"}},
+                {"op": "occupy", "id": "dwelling"},
+            )
+        )
+
+        assert report.entries == 6
+        assert {name: call["calls"] for name, call in report.calls.items()} == {
+            "create_device": 1,
+            "create_devices": 1,
+            "occupy": 1,
+            "update_device": 2,
+        }
+        assert store.devices[replayer.ids["0"]].state == SwitchState.OFF
+
+    def test_batch_falls_back(self, store: Store):
+        DeviceRepository(store).save_many([Dimmer(id="1"), Dimmer(id="2")])
+        replayer = Replayer.of(store, batch_size=10)
+
+        report = replayer.replay(
+            entries(
+                {"op": "delete_device", "id": "1"},
+                {"op": "delete_device", "id": "not-here"},
+                {"op": "delete_device", "id": "2"},
+            )
+        )
+
+        assert store.devices == {}
+        assert report.errors == 1
+        assert report.failures == {"delete_device: KeyError": 1}
+        assert report.calls["delete_devices"]["errors"] == 1
+        assert report.calls["delete_device"]["calls"] == 3
+
+    def test_unknown_op(self, store: Store):
+        report = Replayer.of(store).replay(entries({"op": "explode"}))
+
+        assert report.failures == {"explode: ValueError": 1}
+
+    def test_strict(self, store: Store):
+        with pytest.raises(KeyError):
+            Replayer.of(store, strict=True).replay(
+                entries({"op": "occupy", "id": "not-here"})
+            )
+
+    def test_paced(self, store: Store):
+        clock = FakeClock()
+        replayer = Replayer.of(
+            store, speed=2.0, batch_size=10, clock=clock, sleep=clock.sleep
+        )
+
+        report = replayer.replay(
+            [
+                {"at": 100.0, "op": "occupy", "id": "dwelling"},
+                {"at": 104.0, "op": "vacate", "id": "dwelling"},
+                {"at": 105.0, "op": "occupy", "id": "dwelling"},
+            ]
+        )
+
+        assert clock.slept == [2.0, 0.5]
+        assert report.elapsed_s == 2.5
+        assert store.dwellings["dwelling"].state == DwellingState.OCCUPIED
+
+    def test_paced_batches_only_due(self, store: Store):
+        clock = FakeClock()
+        replayer = Replayer.of(
+            store, speed=1.0, batch_size=10, clock=clock, sleep=clock.sleep
+        )
+        ops = [
+            {"at": at, "op": "create_device", "type": "Switch", "attrs": {}}
+            for at in (0.0, 0.0, 1.0)
+        ]
+
+        report = replayer.replay(ops)
+
+        assert {name: call["calls"] for name, call in report.calls.items()} == {
+            "create_device": 1,
+            "create_devices": 1,
+        }
+        assert clock.slept == [1.0]
+
+
+class TestMain:
+    def test_report(self, store: Store, tmp_path: Path, capsys):
+        export = tmp_path / "store.bin"
+        with open(export, "wb") as file:
+            export_store(store, file)
+        log = tmp_path / "log.jsonl"
+        log.write_text(
+            "".join(
+                json.dumps(entry) + "\n"
+                for entry in entries(
+                    {"op": "occupy", "id": "dwelling"},
+                    {"op": "install_hub", "dwelling_id": "dwelling", "hub_id": "spare"},
+                    {"op": "vacate", "id": "missing"},
+                )
+            )
+        )
+        output = tmp_path / "report.json"
+
+        main([str(log), "--store", str(export), "--output", str(output)])
+
+        assert "3 entries" in capsys.readouterr().out
+        report = json.loads(output.read_text())
+        assert report["errors"] == 1
+        assert report["failures"] == {"vacate: KeyError": 1}
+        assert set(report["calls"]) == {"install_hub", "occupy", "vacate"}
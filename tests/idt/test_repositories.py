@@ -1,8 +1,14 @@
 import pytest
 from pytest_mock import MockerFixture
 
-from idt.domains import Device, Dwelling, Hub, Lock, LockState
-from idt.repositories import DeviceRepository, DwellingRepository, HubRepository, Store
+from idt.domains import Device, Dwelling, DwellingState, Hub, Lock, LockState, Switch
+from idt.repositories import (
+    DeviceRepository,
+    DwellingRepository,
+    HubRepository,
+    Page,
+    Store,
+)
 
 
 @pytest.fixture
@@ -59,13 +65,35 @@ class TestDeviceRepository:
             device_repo: DeviceRepository,
             device: Device,
         ):
-            mocker.patch("idt.repositories.uuid.uuid4", return_value="a-uuid")
+            mocker.patch("idt.ids.uuid.uuid4", return_value="a-uuid")
 
             device = device_repo.create(device)
 
             assert device.id == "a-uuid"
             assert device_repo.store.devices == {"a-uuid": device}
 
+    class TestCreateMany:
+        def test_existing(self, device_repo: DeviceRepository):
+            devices = [Device(), Device(id="exists")]
+
+            with pytest.raises(ValueError) as e:
+                device_repo.create_many(devices)
+
+            assert str(e.value) == "Device exists: id=exists"
+            assert devices[0].id is None
+            assert device_repo.store.devices == {}
+
+        def test_success(self, device_repo: DeviceRepository):
+            devices = [Device(), Lock(), Switch()]
+
+            created = device_repo.create_many(devices)
+
+            assert created == devices
+            assert len({device.id for device in devices}) == 3
+            assert device_repo.store.devices == {
+                device.id: device for device in devices
+            }
+
     class TestDelete:
         def test_associated(self, device_repo: DeviceRepository, device: Device):
             device.id = "id"
@@ -95,6 +123,69 @@ class TestDeviceRepository:
             device_repo.delete(device)
 
             assert device_repo.store.devices == {}
+            assert device_repo.find() == []
+
+    class TestDeleteMany:
+        def test_associated(self, device_repo: DeviceRepository):
+            free = Device(id="free")
+            paired = Device(id="id", hub=Hub(id="hub_id"))
+            device_repo.save(free)
+
+            with pytest.raises(ValueError) as e:
+                device_repo.delete_many([free, paired])
+
+            assert str(e.value) == "Device associated with a hub: id=id hub_id=hub_id"
+            assert device_repo.store.devices == {"free": free}
+
+        def test_not_found(self, device_repo: DeviceRepository):
+            found = Device(id="found")
+            device_repo.save(found)
+
+            with pytest.raises(KeyError) as e:
+                device_repo.delete_many([found, Device(id="not-here")])
+
+            assert str(e.value) == "'not-here'"
+            assert device_repo.store.devices == {"found": found}
+
+        def test_success(self, device_repo: DeviceRepository):
+            devices = [Device(id="1"), Device(id="2")]
+            device_repo.save_many(devices)
+
+            device_repo.delete_many(devices)
+
+            assert device_repo.store.devices == {}
+            assert device_repo.find() == []
+
+    class TestFind:
+        def test_empty(self, device_repo: DeviceRepository):
+            assert device_repo.find(Lock) == []
+
+        def test_follows_saves(
+            self,
+            device_repo: DeviceRepository,
+            hub_repo: HubRepository,
+            dwelling_repo: DwellingRepository,
+        ):
+            lock = Lock(id="lock", state=LockState.UNLOCKED)
+            switch = Switch(id="switch")
+            hub = Hub(id="hub")
+            dwelling = Dwelling(id="dwelling")
+            device_repo.save(lock)
+            device_repo.save(switch)
+
+            lock.state = LockState.LOCKED
+            device_repo.save(lock)
+            hub.pair_device(lock)
+            hub.pair_device(switch)
+            hub_repo.save(hub)
+            dwelling.install_hub(hub)
+            dwelling_repo.save(dwelling)
+            hub.unpair_device(switch)
+            hub_repo.save(hub)
+
+            assert device_repo.find(Lock, state=LockState.LOCKED) == [lock]
+            assert device_repo.find(dwelling_id="dwelling") == [lock]
+            assert device_repo.find(paired=False) == [switch]
 
     class TestGet:
         def test_not_found(self, device_repo: DeviceRepository):
@@ -109,6 +200,21 @@ class TestDeviceRepository:
 
             assert device_repo.get("id") == device
 
+    class TestIter:
+        def test_empty(self, device_repo: DeviceRepository):
+            assert list(device_repo.iter()) == []
+
+        def test_some(self, device_repo: DeviceRepository):
+            devices = [Device(id="1"), Device(id="2"), Device(id="3")]
+            device_repo.save_many(devices)
+
+            iterator = device_repo.iter()
+            assert next(iterator) == devices[0]
+            device_repo.delete(devices[1])
+            device_repo.save(Device(id="4"))
+
+            assert [device.id for device in iterator] == ["3", "4"]
+
     class TestList:
         def test_empty(self, device_repo: DeviceRepository):
             assert device_repo.list() == []
@@ -125,6 +231,41 @@ class TestDeviceRepository:
 
             assert devices == [device_1, device_2]
 
+    class TestPage:
+        def test_empty(self, device_repo: DeviceRepository):
+            assert device_repo.page() == Page([])
+
+        def test_walk(self, device_repo: DeviceRepository):
+            devices = [Device(id=str(i)) for i in range(5)]
+            device_repo.save_many(devices)
+
+            first = device_repo.page(limit=3)
+            device_repo.delete(devices[3])
+            second = device_repo.page(first.cursor, limit=3)
+
+            assert first == Page(devices[:3], cursor=2)
+            assert second == Page(devices[4:])
+
+        @pytest.mark.parametrize("limit", [0, -1])
+        def test_invalid_limit(self, device_repo: DeviceRepository, limit: int):
+            device_repo.save(Device(id="1"))
+
+            with pytest.raises(ValueError) as e:
+                device_repo.page(limit=limit)
+
+            assert str(e.value) == f"Invalid page limit: limit={limit}"
+
+        def test_skips_removed(self, device_repo: DeviceRepository):
+            devices = [Device(id=str(i)) for i in range(5)]
+            device_repo.save_many(devices)
+            # gone from the map while the order still lists it
+            del device_repo.store.devices["1"]
+
+            first = device_repo.page(limit=2)
+
+            assert first == Page([devices[0], devices[2]], cursor=2)
+            assert device_repo.page(first.cursor, limit=2) == Page(devices[3:])
+
     class TestSave:
         def test_success(self, device_repo: DeviceRepository):
             device = Lock(id="id", state=LockState.UNLOCKED)
@@ -135,6 +276,38 @@ class TestDeviceRepository:
 
             assert device_repo.store.devices[device.id].state == LockState.LOCKED
 
+    class TestSaveMany:
+        def test_success(self, device_repo: DeviceRepository):
+            devices = [Lock(id="1", state=LockState.LOCKED), Switch(id="2")]
+
+            device_repo.save_many(devices)
+
+            assert device_repo.store.devices == {"1": devices[0], "2": devices[1]}
+            assert device_repo.find(state=LockState.LOCKED) == [devices[0]]
+
+    class TestVersion:
+        def test_unknown(self, device_repo: DeviceRepository):
+            assert device_repo.version("not-here") == 0
+
+        def test_bumped_by_save(self, device_repo: DeviceRepository):
+            device = Device(id="id")
+            device_repo.save(device)
+            first = device_repo.version("id")
+
+            device_repo.save(device)
+
+            assert device_repo.version("id") > first
+
+        def test_not_reused(self, device_repo: DeviceRepository):
+            device = Device(id="id")
+            device_repo.save(device)
+            first = device_repo.version("id")
+            device_repo.delete(device)
+
+            device_repo.save(Device(id="id"))
+
+            assert device_repo.version("id") > first
+
 
 class TestHubRepository:
     def test_init(self):
@@ -153,6 +326,36 @@ class TestHubRepository:
 
             assert hub_repo.get("id") == hub
 
+    class TestIterDevices:
+        def test_some(
+            self, hub_repo: HubRepository, device_repo: DeviceRepository, hub: Hub
+        ):
+            hub.id = "id"
+            devices = [Device(id=str(i)) for i in range(3)]
+            for device in reversed(devices):
+                hub.pair_device(device)
+            device_repo.save_many(devices)
+
+            assert list(hub_repo.iter_devices(hub)) == devices
+
+    class TestPageDevices:
+        def test_walk(
+            self, hub_repo: HubRepository, device_repo: DeviceRepository, hub: Hub
+        ):
+            hub.id = "id"
+            devices = [Device(id=str(i)) for i in range(3)]
+            device_repo.save(Device(id="unpaired"))
+            for device in devices:
+                hub.pair_device(device)
+            hub_repo.save(hub)
+
+            first = hub_repo.page_devices(hub, limit=2)
+
+            assert first == Page(devices[:2], cursor=2)
+            assert hub_repo.page_devices(hub, first.cursor, limit=2) == Page(
+                devices[2:]
+            )
+
     class TestSave:
         def test_success(self, hub_repo: HubRepository, hub: Hub):
             hub_repo.store.hubs[hub.id] = hub
@@ -163,6 +366,29 @@ class TestHubRepository:
 
             assert hub_repo.store.hubs[hub.id].devices == expected
 
+        def test_writes_changes(
+            self, mocker: MockerFixture, hub_repo: HubRepository, hub: Hub
+        ):
+            paired = Device(id="paired")
+            hub.pair_device(Device(id="other"))
+            hub_repo.save(hub)
+            put_device = mocker.spy(hub_repo.store, "put_device")
+
+            hub.pair_device(paired)
+            hub_repo.save(hub)
+
+            put_device.assert_called_once_with(paired)
+
+        def test_writes_unpaired(self, hub_repo: HubRepository, hub: Hub):
+            device = Device(id="device")
+            hub.pair_device(device)
+            hub_repo.save(hub)
+
+            hub.unpair_device(device)
+            hub_repo.save(hub)
+
+            assert hub_repo.store.index.find(paired=False) == {"device"}
+
 
 class TestDwellingRepository:
     def test_init(self):
@@ -181,6 +407,14 @@ class TestDwellingRepository:
 
             assert dwelling_repo.get("id") == dwelling
 
+    class TestIter:
+        def test_some(self, dwelling_repo: DwellingRepository):
+            dwellings = [Dwelling(id="1"), Dwelling(id="2")]
+            for dwelling in dwellings:
+                dwelling_repo.save(dwelling)
+
+            assert list(dwelling_repo.iter()) == dwellings
+
     class TestList:
         def test_empty(self, dwelling_repo: DwellingRepository):
             assert dwelling_repo.list() == []
@@ -197,6 +431,17 @@ class TestDwellingRepository:
 
             assert dwellings == [dwelling_1, dwelling_2]
 
+    class TestPage:
+        def test_walk(self, dwelling_repo: DwellingRepository):
+            dwellings = [Dwelling(id=str(i)) for i in range(3)]
+            for dwelling in dwellings:
+                dwelling_repo.save(dwelling)
+
+            first = dwelling_repo.page(limit=2)
+
+            assert first == Page(dwellings[:2], cursor=1)
+            assert dwelling_repo.page(first.cursor) == Page(dwellings[2:])
+
     class TestSave:
         def test_success(self, dwelling_repo: DwellingRepository, dwelling: Dwelling):
             dwelling_repo.store.dwellings[dwelling.id] = dwelling
@@ -206,3 +451,56 @@ class TestDwellingRepository:
             dwelling_repo.save(dwelling)
 
             assert dwelling_repo.store.dwellings[dwelling.id].hubs == expected
+
+        def test_writes_changes(
+            self,
+            mocker: MockerFixture,
+            dwelling_repo: DwellingRepository,
+            dwelling: Dwelling,
+        ):
+            hub = Hub(id="hub", devices={"device": Device(id="device")})
+            dwelling.install_hub(hub)
+            dwelling_repo.save(dwelling)
+            put_hub = mocker.spy(dwelling_repo.store, "put_hub")
+            put_device = mocker.spy(dwelling_repo.store, "put_device")
+
+            dwelling.state = DwellingState.OCCUPIED
+            dwelling_repo.save(dwelling)
+
+            put_hub.assert_not_called()
+            put_device.assert_not_called()
+
+
+class TestStore:
+    class TestSubscribe:
+        def test_events(self, store: Store):
+            events = []
+            store.subscribe(lambda event, id_: events.append((event, id_)))
+            hub = Hub(id="hub")
+            hub.pair_device(Device(id="device"))
+            dwelling = Dwelling(id="dwelling")
+            dwelling.install_hub(hub)
+
+            DwellingRepository(store).save(dwelling)
+            hub.unpair_device(store.devices["device"])
+            HubRepository(store).save(hub)
+            DeviceRepository(store).delete(store.devices["device"])
+
+            assert events == [
+                ("put_dwelling", "dwelling"),
+                ("put_hub", "hub"),
+                ("put_device", "device"),
+                ("put_hub", "hub"),
+                ("put_device", "device"),
+                ("pop_device", "device"),
+            ]
+
+        def test_unsubscribe(self, store: Store):
+            events = []
+            listener = lambda event, id_: events.append(event)  # noqa: E731
+            store.subscribe(listener)
+            store.unsubscribe(listener)
+
+            store.put_device(Device(id="device"))
+
+            assert events == []
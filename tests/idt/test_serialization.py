@@ -0,0 +1,147 @@
+import io
+
+import pytest
+
+from idt.domains import (
+    Device,
+    Dimmer,
+    Dwelling,
+    DwellingState,
+    Hub,
+    Lock,
+    LockState,
+    Switch,
+    SwitchState,
+    Thermostat,
+)
+from idt.serialization import (
+    attrs_from_record,
+    attrs_record,
+    device_from_record,
+    device_info,
+    device_record,
+    dwelling_from_record,
+    dwelling_record,
+    hub_from_record,
+    hub_record,
+    link_device,
+    link_hub,
+    read_frames,
+    write_frame,
+)
+
+
+class TestDeviceRecord:
+    def test_paired(self):
+        lock = Lock(id="lock", state=LockState.LOCKED, code=("1", "2"))
+        Hub(id="hub").pair_device(lock)
+
+        assert device_record(lock) == {
+            "type": "Lock",
+            "id": "lock",
+            "hub_id": "hub",
+            "attrs": {"state": "LOCKED", "code": ["1", "2"]},
+        }
+
+    @pytest.mark.parametrize(
+        "device",
+        [
+            Device(id="device"),
+            Switch(id="switch", state=SwitchState.ON),
+            Dimmer(id="dimmer", brightness=20),
+            Lock(id="lock", state=LockState.LOCKED, code=["1"]),
+            Thermostat(id="thermo", target_temp_f=70.0, actual_temp_f=71.5),
+        ],
+    )
+    def test_round_trip(self, device):
+        assert device_from_record(device_record(device)) == device
+
+
+class TestAttrsRecord:
+    def test_round_trip(self):
+        attrs = {"state": LockState.LOCKED, "code": ("1", "2")}
+
+        assert attrs_record(attrs) == {"state": "LOCKED", "code": ["1", "2"]}
+        assert attrs_from_record(Lock, attrs_record(attrs)) == {
+            "state": LockState.LOCKED,
+            "code": ["1", "2"],
+        }
+
+    def test_unknown_passes_through(self):
+        assert attrs_from_record(Switch, {"invalid": 1}) == {"invalid": 1}
+
+
+class TestDeviceInfo:
+    def test_unpaired(self):
+        lock = Lock(id="lock", state=LockState.LOCKED, code=["1"])
+
+        assert device_info(lock) == str(lock)
+
+    def test_paired(self):
+        dimmer = Dimmer(id="dimmer", brightness=40)
+        hub = Hub(id="hub", devices={"other": Switch(id="other")})
+        hub.pair_device(dimmer)
+        Dwelling(id="dwelling").install_hub(hub)
+
+        assert device_info(dimmer) == "Dimmer(id='dimmer', hub='hub', brightness=40)"
+
+
+class TestHubRecord:
+    def test_round_trip(self):
+        hub = Hub(id="hub", dwelling=Dwelling(id="dwelling"))
+
+        assert hub_record(hub) == {"id": "hub", "dwelling_id": "dwelling"}
+        assert hub_from_record(hub_record(hub)) == Hub(id="hub")
+
+
+class TestDwellingRecord:
+    def test_round_trip(self):
+        dwelling = Dwelling(id="dwelling", state=DwellingState.OCCUPIED)
+
+        assert dwelling_record(dwelling) == {"id": "dwelling", "state": "OCCUPIED"}
+        assert dwelling_from_record(dwelling_record(dwelling)) == dwelling
+
+
+class TestLink:
+    def test_success(self):
+        dwelling = Dwelling(id="dwelling")
+        hub = Hub(id="hub")
+        device = Device(id="device")
+
+        link_hub(hub, dwelling)
+        link_device(device, hub)
+
+        assert dwelling.hubs == {"hub": hub}
+        assert hub.dwelling is dwelling
+        assert hub.devices == {"device": device}
+        assert device.hub is hub
+
+    def test_unlinked(self):
+        hub = Hub(id="hub")
+        device = Device(id="device")
+
+        link_hub(hub, None)
+        link_device(device, None)
+
+        assert hub.dwelling is None
+        assert device.hub is None
+
+
+class TestFrames:
+    def test_round_trip(self):
+        buffer = io.BytesIO()
+        write_frame(buffer, b"one")
+        write_frame(buffer, b"")
+        write_frame(buffer, b"three")
+        buffer.seek(0)
+
+        assert list(read_frames(buffer)) == [b"one", b"", b"three"]
+
+    @pytest.mark.parametrize("tail", [b"\x05", b"\x05\x00\x00\x00\x00\x00\x00\x00ab"])
+    def test_torn_tail(self, tail: bytes):
+        buffer = io.BytesIO()
+        write_frame(buffer, b"one")
+        buffer.write(tail)
+        buffer.seek(0)
+
+        assert list(read_frames(buffer)) == [b"one"]
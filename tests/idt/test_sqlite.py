@@ -0,0 +1,144 @@
+from pathlib import Path
+
+import pytest
+
+from idt.domains import (
+    Dimmer,
+    Dwelling,
+    DwellingState,
+    Hub,
+    Lock,
+    LockState,
+    Thermostat,
+)
+from idt.ids import MonotonicAllocator
+from idt.repositories import DeviceRepository, DwellingRepository, HubRepository
+from idt.sqlite import SqliteStore
+
+
+@pytest.fixture
+def path(tmp_path: Path) -> str:
+    return str(tmp_path / "store.db")
+
+
+@pytest.fixture
+def store(path: str) -> SqliteStore:
+    store = SqliteStore(path=path)
+    yield store
+    store.close()
+
+
+def reopen(store: SqliteStore) -> SqliteStore:
+    store.close()
+    return SqliteStore(path=store.path)
+
+
+class TestSqliteStore:
+    def test_init(self, store: SqliteStore):
+        with store.reader() as connection:
+            (mode,) = connection.execute("PRAGMA journal_mode").fetchone()
+
+        assert mode == "wal"
+        assert store.devices == {}
+
+    def test_round_trip(self, store: SqliteStore):
+        device_repo = DeviceRepository(store)
+        lock = Lock(state=LockState.LOCKED, code=["1", "2"])
+        thermo = Thermostat(target_temp_f=70.0, actual_temp_f=68.5)
+        dimmer = Dimmer(brightness=30)
+        device_repo.create_many([lock, thermo, dimmer])
+        hub = Hub(id="hub")
+        hub.pair_device(lock)
+        hub.pair_device(thermo)
+        HubRepository(store).save(hub)
+        dwelling = Dwelling(id="dwelling", state=DwellingState.OCCUPIED)
+        dwelling.install_hub(hub)
+        DwellingRepository(store).save(dwelling)
+
+        restored = reopen(store)
+
+        assert list(restored.devices) == [str(lock.id), str(thermo.id), str(dimmer.id)]
+        restored_lock = restored.devices[str(lock.id)]
+        assert restored_lock.state == LockState.LOCKED
+        assert restored_lock.code == ["1", "2"]
+        assert restored_lock.hub is restored.hubs["hub"]
+        assert restored.hubs["hub"].dwelling is restored.dwellings["dwelling"]
+        assert restored.dwellings["dwelling"].state == DwellingState.OCCUPIED
+        assert DeviceRepository(restored).find(dwelling_id="dwelling", paired=True)
+        restored.close()
+
+    def test_allocator_resumes(self, store: SqliteStore):
+        store.ids = MonotonicAllocator()
+        lock = DeviceRepository(store).create(Lock())
+        store.close()
+        restored = SqliteStore(path=store.path, ids=MonotonicAllocator())
+
+        dimmer = DeviceRepository(restored).create(Dimmer())
+
+        assert dimmer.id != lock.id
+        assert isinstance(restored.devices[lock.id], Lock)
+        restored.close()
+
+    def test_unpair(self, store: SqliteStore):
+        dimmer = DeviceRepository(store).create(Dimmer())
+        hub = Hub(id="hub")
+        hub.pair_device(dimmer)
+        HubRepository(store).save(hub)
+
+        hub.unpair_device(dimmer)
+        HubRepository(store).save(hub)
+        restored = reopen(store)
+
+        assert restored.devices[str(dimmer.id)].hub is None
+        assert restored.hubs["hub"].devices == {}
+        restored.close()
+
+    def test_delete(self, store: SqliteStore):
+        device_repo = DeviceRepository(store)
+        dimmer = device_repo.create(Dimmer(brightness=30))
+
+        device_repo.delete(dimmer)
+        restored = reopen(store)
+
+        assert restored.devices == {}
+        restored.close()
+
+    class TestTransaction:
+        def test_batches(self, store: SqliteStore):
+            with store.transaction():
+                store.put_dwelling(Dwelling(id="dwelling"))
+                with store.reader() as connection:
+                    (count,) = connection.execute(
+                        "SELECT COUNT(*) FROM dwellings"
+                    ).fetchone()
+
+            assert count == 0
+            assert list(store.dwellings) == ["dwelling"]
+
+        def test_keeps_order(self, store: SqliteStore):
+            dimmer = Dimmer(id="dimmer")
+
+            with store.transaction():
+                store.put_device(dimmer)
+                store.pop_device("dimmer")
+                store.put_device(dimmer)
+
+            restored = reopen(store)
+            assert list(restored.devices) == ["dimmer"]
+            restored.close()
+
+        def test_rolls_back(self, store: SqliteStore):
+            store.put_dwelling(Dwelling(id="kept"))
+
+            with pytest.raises(RuntimeError):
+                with store.transaction():
+                    store.put_dwelling(Dwelling(id="dropped"))
+                    with store.transaction():
+                        store.put_device(Dimmer(id="dimmer"))
+                    raise RuntimeError()
+            store.put_device(Dimmer(id="later"))
+
+            restored = reopen(store)
+            assert list(restored.dwellings) == ["kept"]
+            assert list(restored.devices) == ["later"]
+            restored.close()
@@ -0,0 +1,153 @@
+import io
+import pickle
+
+import pytest
+
+from idt import transfer
+from idt.domains import (
+    Dimmer,
+    Dwelling,
+    DwellingState,
+    Hub,
+    Lock,
+    LockState,
+    Switch,
+    Thermostat,
+)
+from idt.mvcc import VersionedStore
+from idt.repositories import DeviceRepository, DwellingRepository, Store
+from idt.serialization import write_frame
+from idt.transfer import BINARY, JSONL, MAGIC, export_store, import_store
+
+
+@pytest.fixture
+def store() -> Store:
+    store = Store()
+    dwelling = Dwelling(id="dwelling", state=DwellingState.OCCUPIED)
+    hub = Hub(id="hub")
+    hub.pair_device(Lock(id="lock", state=LockState.LOCKED, code=["1", "2"]))
+    hub.pair_device(Thermostat(id="thermo", target_temp_f=70.0, actual_temp_f=68.5))
+    dwelling.install_hub(hub)
+    DwellingRepository(store).save(dwelling)
+    DwellingRepository(store).save(Dwelling(id="empty"))
+    DeviceRepository(store).save(Switch(id="switch"))
+    return store
+
+
+def exported(source, fmt: str) -> io.BytesIO:
+    buffer = io.BytesIO()
+    export_store(source, buffer, fmt)
+    buffer.seek(0)
+    return buffer
+
+
+class TestExportStore:
+    def test_counts(self, store: Store):
+        counts = export_store(store, io.BytesIO())
+
+        assert counts == {"dwelling": 2, "hub": 1, "device": 3}
+
+    def test_jsonl_readable(self, store: Store):
+        lines = exported(store, JSONL).read().decode().splitlines()
+
+        assert lines[0] == '{"kind": "dwelling", "id": "dwelling", "state": "OCCUPIED"}'
+        assert lines[-1] == '{"kind": "end", "dwelling": 2, "hub": 1, "device": 3}'
+
+    def test_snapshot(self):
+        store = VersionedStore()
+        repo = DeviceRepository(store)
+        repo.save(Dimmer(id="dimmer", brightness=10))
+        with store.snapshot() as snapshot:
+            repo.save(Dimmer(id="dimmer", brightness=90))
+            repo.save(Dimmer(id="later"))
+
+            buffer = exported(snapshot, BINARY)
+
+        restored = import_store(buffer)
+        assert list(restored.devices.values()) == [Dimmer(id="dimmer", brightness=10)]
+
+    def test_unknown_format(self, store: Store):
+        with pytest.raises(ValueError):
+            export_store(store, io.BytesIO(), "xml")
+
+
+class TestImportStore:
+    @pytest.mark.parametrize("fmt", [BINARY, JSONL])
+    def test_round_trip(self, store: Store, fmt: str):
+        restored = import_store(exported(store, fmt), fmt=fmt)
+
+        assert list(restored.dwellings) == ["dwelling", "empty"]
+        assert list(restored.devices) == ["lock", "thermo", "switch"]
+        dwelling = restored.dwellings["dwelling"]
+        hub = restored.hubs["hub"]
+        assert dwelling.state == DwellingState.OCCUPIED
+        assert dwelling.hubs == {"hub": hub}
+        assert hub.dwelling is dwelling
+        assert list(hub.devices) == ["lock", "thermo"]
+        assert restored.devices["lock"].hub is hub
+        assert restored.devices["lock"].code == ["1", "2"]
+        assert restored.devices["switch"].hub is None
+        assert hub.changes == {}
+        assert dwelling.changes == {}
+        assert DeviceRepository(restored).find(Lock, dwelling_id="dwelling")
+
+    @pytest.mark.parametrize("fmt", [BINARY, JSONL])
+    def test_batched(self, mocker, fmt: str):
+        mocker.patch.object(transfer, "BATCH", 2)
+        store = Store()
+        DeviceRepository(store).save_many([Dimmer(id=str(i)) for i in range(5)])
+
+        restored = import_store(exported(store, fmt), fmt=fmt)
+
+        assert list(restored.devices) == ["0", "1", "2", "3", "4"]
+
+    def test_into_store(self, store: Store):
+        target = Store()
+        DeviceRepository(target).save(Dimmer(id="existing"))
+
+        import_store(exported(store, BINARY), target)
+
+        assert list(target.devices) == ["existing", "lock", "thermo", "switch"]
+
+    def test_exists(self, store: Store):
+        with pytest.raises(ValueError) as e:
+            import_store(exported(store, BINARY), store)
+
+        assert str(e.value) == "Dwelling exists: id=dwelling"
+
+    @pytest.mark.parametrize("fmt", [BINARY, JSONL])
+    def test_truncated(self, store: Store, fmt: str):
+        data = exported(store, fmt).getvalue()
+
+        with pytest.raises(ValueError) as e:
+            import_store(io.BytesIO(data[: len(data) // 2]), fmt=fmt)
+
+        assert str(e.value).startswith("Truncated export")
+
+    def test_not_an_export(self):
+        with pytest.raises(ValueError) as e:
+            import_store(io.BytesIO(b"nonsense"))
+
+        assert str(e.value) == "Not a store export"
+
+    def test_refuses_globals(self):
+        buffer = io.BytesIO()
+        write_frame(buffer, MAGIC)
+        write_frame(buffer, pickle.dumps(("device", [Dimmer(id="x")])))
+        buffer.seek(0)
+
+        with pytest.raises(ValueError) as e:
+            import_store(buffer)
+
+        assert str(e.value) == "Unexpected global in export: idt.domains.Dimmer"
+
+    def test_dangling(self):
+        buffer = io.BytesIO(
+            b'{"kind": "hub", "id": "hub", "dwelling_id": "gone"}\n'
+            b'{"kind": "end", "dwelling": 0, "hub": 1, "device": 0}\n'
+        )
+
+        with pytest.raises(ValueError) as e:
+            import_store(buffer, fmt=JSONL)
+
+        assert str(e.value) == "Dangling reference: id=hub dwelling_id=gone"
@@ -1,4 +1,4 @@
-from typing import Mapping
+from typing import Mapping, Sequence
 
 import pytest
 from pytest_mock import MockerFixture
@@ -16,8 +16,22 @@ from idt.domains import (
     Thermostat,
     TypeDevice,
 )
-from idt.repositories import DeviceRepository, DwellingRepository, HubRepository, Store
-from idt.usecases import DeviceUsecases, DwellingUsecases, HubUsecases
+from idt.feed import Change, ChangeFeed
+from idt.ids import MonotonicAllocator
+from idt.repositories import (
+    DeviceRepository,
+    DwellingRepository,
+    HubRepository,
+    Page,
+    Store,
+)
+from idt.usecases import (
+    SHUTDOWN,
+    BulkResult,
+    DeviceUsecases,
+    DwellingUsecases,
+    HubUsecases,
+)
 
 
 @pytest.fixture
@@ -67,7 +81,7 @@ def hub() -> Hub:
 
 @pytest.fixture
 def mock_uuid(mocker: MockerFixture):
-    return mocker.patch("idt.repositories.uuid.uuid4", return_value="a-uuid")
+    return mocker.patch("idt.ids.uuid.uuid4", return_value="a-uuid")
 
 
 @pytest.fixture
@@ -124,6 +138,31 @@ class TestDeviceUsecases:
             assert device == expected
             assert device_uc.repo.store.devices == {expected.id: expected}
 
+    class TestCreateDevices:
+        def test_invalid_kwargs(self, device_uc: DeviceUsecases):
+            with pytest.raises(TypeError):
+                device_uc.create_devices(
+                    [(Switch, {"state": SwitchState.ON}), (Dimmer, {"invalid": True})]
+                )
+
+            assert device_uc.repo.store.devices == {}
+
+        def test_success(self, device_uc: DeviceUsecases):
+            devices = device_uc.create_devices(
+                [
+                    (Switch, {"state": SwitchState.ON}),
+                    (Thermostat, {"target_temp_f": 70.0, "actual_temp_f": 68.0}),
+                ]
+            )
+
+            switch_, thermo = devices
+            assert switch_.state == SwitchState.ON
+            assert thermo.target_temp_f == 70.0
+            assert device_uc.repo.store.devices == {
+                switch_.id: switch_,
+                thermo.id: thermo,
+            }
+
     class TestDeleteDevice:
         def test_not_there(self, device_uc: DeviceUsecases):
             with pytest.raises(KeyError) as e:
@@ -139,6 +178,24 @@ class TestDeviceUsecases:
 
             assert device_uc.repo.store.devices == {}
 
+    class TestDeleteDevices:
+        def test_not_there(self, device_uc: DeviceUsecases, device: Device):
+            device.id = "id"
+            device_uc.repo.store.devices[device.id] = device
+
+            with pytest.raises(KeyError) as e:
+                device_uc.delete_devices(["id", "not-here"])
+
+            assert str(e.value) == "'not-here'"
+            assert device_uc.repo.store.devices == {"id": device}
+
+        def test_success(self, device_uc: DeviceUsecases):
+            device_uc.repo.save_many([Device(id="1"), Device(id="2")])
+
+            device_uc.delete_devices(["1", "2"])
+
+            assert device_uc.repo.store.devices == {}
+
     class TestShowDeviceInfo:
         def test_not_there(self, device_uc: DeviceUsecases):
             with pytest.raises(KeyError) as e:
@@ -154,6 +211,58 @@ class TestDeviceUsecases:
 
             assert info == "Device(id='id', hub=None)"
 
+        def test_cached(self, device_uc: DeviceUsecases):
+            device_uc.repo.save(Dimmer(id="id", brightness=40))
+
+            device_uc.show_device_info("id")
+            info = device_uc.show_device_info("id")
+
+            assert info == "Dimmer(id='id', hub=None, brightness=40)"
+            assert device_uc.info_cache.hits == 1
+
+        def test_updated(self, device_uc: DeviceUsecases):
+            device_uc.repo.save(Dimmer(id="id", brightness=40))
+            device_uc.show_device_info("id")
+
+            device_uc.update_device("id", brightness=80)
+
+            info = device_uc.show_device_info("id")
+            assert info == "Dimmer(id='id', hub=None, brightness=80)"
+            assert len(device_uc.info_cache) == 1
+
+        def test_updated_through_alias(self):
+            device_uc = DeviceUsecases(
+                DeviceRepository(Store(ids=MonotonicAllocator()))
+            )
+            dimmer = device_uc.create_device(Dimmer)
+            alias = dimmer.id.replace("0", "O")
+            device_uc.show_device_info(alias)
+
+            device_uc.update_device(alias, brightness=77)
+
+            info = f"Dimmer(id='{dimmer.id}', hub=None, brightness=77)"
+            assert device_uc.show_device_info(alias) == info
+            assert device_uc.show_device_info(dimmer.id) == info
+            assert len(device_uc.info_cache) == 1
+
+        def test_paired(self, device_uc: DeviceUsecases):
+            hub_repo = HubRepository(device_uc.repo.store)
+            hub_uc = HubUsecases(hub_repo, device_uc.repo)
+            hub_repo.save(Hub(id="hub"))
+            device_uc.repo.save(Device(id="id"))
+            device_uc.show_device_info("id")
+
+            hub_uc.pair_device("hub", "id")
+
+            assert device_uc.show_device_info("id") == "Device(id='id', hub='hub')"
+
+    class TestIterDevices:
+        def test_some(self, device_uc: DeviceUsecases):
+            devices = [Device(id="1"), Device(id="2")]
+            device_uc.repo.save_many(devices)
+
+            assert list(device_uc.iter_devices()) == devices
+
     class TestListDevices:
         def test_empty(self, device_uc: DeviceUsecases):
             assert device_uc.list_devices() == []
@@ -170,6 +279,16 @@ class TestDeviceUsecases:
 
             assert devices == [device_1, device_2]
 
+    class TestPageDevices:
+        def test_walk(self, device_uc: DeviceUsecases):
+            devices = [Device(id="1"), Device(id="2")]
+            device_uc.repo.save_many(devices)
+
+            first = device_uc.page_devices(limit=1)
+
+            assert first == Page(devices[:1], cursor=0)
+            assert device_uc.page_devices(first.cursor) == Page(devices[1:])
+
     class TestUpdateDevice:
         def test_not_there(self, device_uc: DeviceUsecases):
             with pytest.raises(KeyError) as e:
@@ -186,11 +305,66 @@ class TestDeviceUsecases:
 
             assert device_uc.repo.store.devices == {expected.id: expected}
 
+    class TestUpdateDevices:
+        def test_not_there(self, device_uc: DeviceUsecases):
+            device = Lock(id="id", state=LockState.UNLOCKED)
+            device_uc.repo.store.devices[device.id] = device
+
+            with pytest.raises(KeyError) as e:
+                device_uc.update_devices(
+                    {"id": {"state": LockState.LOCKED}, "not-here": {}}
+                )
+
+            assert str(e.value) == "'not-here'"
+            assert device.state == LockState.UNLOCKED
+
+        def test_invalid_attr(self, device_uc: DeviceUsecases):
+            lock = Lock(id="lock", state=LockState.UNLOCKED)
+            dimmer = Dimmer(id="dimmer")
+            device_uc.repo.save_many([lock, dimmer])
+
+            with pytest.raises(AttributeError) as e:
+                device_uc.update_devices(
+                    {"lock": {"state": LockState.LOCKED}, "dimmer": {"state": 1}}
+                )
+
+            assert str(e.value) == "'Dimmer' object has no attribute 'state'"
+            assert lock.state == LockState.UNLOCKED
+
+        def test_success(self, device_uc: DeviceUsecases):
+            lock = Lock(id="lock", state=LockState.UNLOCKED)
+            dimmer = Dimmer(id="dimmer", brightness=10)
+            device_uc.repo.save_many([lock, dimmer])
+
+            device_uc.update_devices(
+                {"lock": {"state": LockState.LOCKED}, "dimmer": {"brightness": 90}}
+            )
+
+            assert lock.state == LockState.LOCKED
+            assert dimmer.brightness == 90
+            assert device_uc.repo.find(state=LockState.LOCKED) == [lock]
+
 
 class TestHubUsecases:
     def test_init(self, hub_repo, device_repo):
         assert HubUsecases(hub_repo, device_repo) is not None
 
+    class TestIterHubDevices:
+        def test_not_there(self, hub_uc: HubUsecases):
+            with pytest.raises(KeyError) as e:
+                hub_uc.iter_hub_devices("not-here")
+
+            assert str(e.value) == "'not-here'"
+
+        def test_some(self, hub_uc: HubUsecases, hub: Hub):
+            hub.id = "id"
+            devices = [Device(id="1"), Device(id="2")]
+            for device in devices:
+                hub.pair_device(device)
+            hub_uc.repo.save(hub)
+
+            assert list(hub_uc.iter_hub_devices("id")) == devices
+
     class TestListHubDevices:
         def test_not_there(self, hub_uc: HubUsecases):
             with pytest.raises(KeyError) as e:
@@ -218,6 +392,25 @@ class TestHubUsecases:
 
             assert hub_uc.list_hub_devices("id") == [device_1, device_2]
 
+    class TestPageHubDevices:
+        def test_not_there(self, hub_uc: HubUsecases):
+            with pytest.raises(KeyError) as e:
+                hub_uc.page_hub_devices("not-here")
+
+            assert str(e.value) == "'not-here'"
+
+        def test_walk(self, hub_uc: HubUsecases, hub: Hub):
+            hub.id = "id"
+            devices = [Device(id="1"), Device(id="2")]
+            for device in devices:
+                hub.pair_device(device)
+            hub_uc.repo.save(hub)
+
+            first = hub_uc.page_hub_devices("id", limit=1)
+
+            assert first == Page(devices[:1], cursor=0)
+            assert hub_uc.page_hub_devices("id", first.cursor) == Page(devices[1:])
+
     class TestPairDevice:
         def test_not_there(self, hub_uc: HubUsecases):
             with pytest.raises(KeyError) as e:
@@ -273,6 +466,94 @@ class TestHubUsecases:
             assert hub_uc.repo.store.hubs["id"].devices == {}
             assert hub_uc.device_repo.store.devices["device-id"].hub is None
 
+    @pytest.fixture
+    def hubs(self, hub_uc: HubUsecases) -> Sequence[Hub]:
+        source, target = Hub(id="source"), Hub(id="target")
+        source.pair_device(Dimmer(id="paired"))
+        for hub in (source, target):
+            hub_uc.repo.save(hub)
+        hub_uc.device_repo.save_many([Dimmer(id="1"), Dimmer(id="2")])
+        return source, target
+
+    class TestPairDevices:
+        def test_success(self, hub_uc: HubUsecases, hubs: Sequence[Hub]):
+            _, target = hubs
+
+            hub_uc.pair_devices("target", ["1", "2", "1"])
+
+            assert list(target.devices) == ["1", "2"]
+            assert hub_uc.device_repo.get("2").hub is target
+
+        def test_saves_once(self, hub_uc: HubUsecases, hubs, mocker: MockerFixture):
+            save = mocker.spy(hub_uc.repo, "save")
+
+            hub_uc.pair_devices("target", ["1", "2"])
+
+            assert save.call_count == 1
+
+        def test_paired_elsewhere(self, hub_uc: HubUsecases, hubs: Sequence[Hub]):
+            _, target = hubs
+
+            with pytest.raises(ValueError) as e:
+                hub_uc.pair_devices("target", ["1", "paired"])
+
+            assert (
+                str(e.value) == "Device paired to another hub: id=paired hub_id=source"
+            )
+            assert target.devices == {}
+            assert hub_uc.device_repo.get("1").hub is None
+
+        def test_device_not_there(self, hub_uc: HubUsecases, hubs: Sequence[Hub]):
+            _, target = hubs
+
+            with pytest.raises(KeyError):
+                hub_uc.pair_devices("target", ["1", "not-here"])
+
+            assert target.devices == {}
+
+        def test_move(self, hub_uc: HubUsecases, hubs: Sequence[Hub]):
+            source, target = hubs
+            feed = hub_uc.feed = ChangeFeed()
+            subscription = feed.subscribe()
+
+            hub_uc.pair_devices("target", ["paired", "1"], move=True)
+
+            assert source.devices == {}
+            assert list(target.devices) == ["paired", "1"]
+            assert hub_uc.device_repo.get("paired").hub is target
+            assert [(e.change, e.device_id, e.hub_id) for e in subscription.read()] == [
+                (Change.UNPAIRED, "paired", "source"),
+                (Change.PAIRED, "paired", "target"),
+                (Change.PAIRED, "1", "target"),
+            ]
+
+        def test_already_paired(self, hub_uc: HubUsecases, hubs: Sequence[Hub]):
+            source, _ = hubs
+
+            hub_uc.pair_devices("source", ["paired"])
+
+            assert list(source.devices) == ["paired"]
+
+    class TestUnpairDevices:
+        def test_success(self, hub_uc: HubUsecases, hubs: Sequence[Hub]):
+            _, target = hubs
+            hub_uc.pair_devices("target", ["1", "2"])
+
+            hub_uc.unpair_devices("target", ["1", "2"])
+
+            assert target.devices == {}
+            assert hub_uc.device_repo.get("1").hub is None
+
+        def test_not_paired(self, hub_uc: HubUsecases, hubs: Sequence[Hub]):
+            _, target = hubs
+            hub_uc.pair_devices("target", ["1"])
+
+            with pytest.raises(ValueError) as e:
+                hub_uc.unpair_devices("target", ["1", "paired"])
+
+            assert str(e.value) == "Device not paired to hub: id=paired hub_id=target"
+            assert list(target.devices) == ["1"]
+
 
 class TestDwellingUsecases:
     def test_init(self, dwelling_repo, hub_repo):
@@ -280,6 +561,86 @@ class TestDwellingUsecases:
 
         assert dwelling_uc.repo == dwelling_repo
         assert dwelling_uc.hub_repo == hub_repo
+        assert dwelling_uc.device_repo.store is dwelling_repo.store
+
+    @pytest.fixture
+    def furnished(self, dwelling_repo: DwellingRepository) -> Dwelling:
+        hub = Hub(id="hub")
+        hub.pair_device(Lock(id="lock"))
+        hub.pair_device(Switch(id="switch", state=SwitchState.ON))
+        hub.pair_device(Switch(id="off"))
+        hub.pair_device(Dimmer(id="dimmer", brightness=50))
+        dwelling = Dwelling(id="dwelling")
+        dwelling.install_hub(hub)
+        dwelling_repo.save(dwelling)
+        dwelling_repo.save(Dwelling(id="other"))
+        return dwelling
+
+    class TestApplyToDevices:
+        def test_not_there(self, dwelling_uc: DwellingUsecases):
+            with pytest.raises(KeyError):
+                dwelling_uc.apply_to_devices("not-here", Lock, state=LockState.LOCKED)
+
+        def test_success(self, dwelling_uc: DwellingUsecases, furnished: Dwelling):
+            result = dwelling_uc.apply_to_devices(
+                furnished.id, Switch, state=SwitchState.OFF
+            )
+
+            assert result == BulkResult(updated=["switch"], unchanged=["off"])
+            assert dwelling_uc.device_repo.find(state=SwitchState.ON) == []
+
+        def test_invalid_attr(self, dwelling_uc: DwellingUsecases, furnished: Dwelling):
+            result = dwelling_uc.apply_to_devices(furnished.id, Lock, brightness=0)
+
+            assert result.failed == {
+                "lock": "'Lock' object has no attribute 'brightness'"
+            }
+
+        def test_empty(self, dwelling_uc: DwellingUsecases, furnished: Dwelling):
+            result = dwelling_uc.apply_to_devices("other", Lock, state=LockState.LOCKED)
+
+            assert result == BulkResult()
+
+    class TestApplyScene:
+        def test_shutdown(self, dwelling_uc: DwellingUsecases, furnished: Dwelling):
+            result = dwelling_uc.apply_scene([furnished.id, "other"], SHUTDOWN)
+
+            assert sorted(result.updated) == ["dimmer", "lock", "switch"]
+            assert result.unchanged == ["off"]
+            devices = dwelling_uc.device_repo
+            assert devices.get("lock").state == LockState.LOCKED
+            assert devices.get("dimmer").brightness == 0
+            assert devices.find(state=SwitchState.ON) == []
+
+        def test_changed_before_lock(
+            self,
+            dwelling_uc: DwellingUsecases,
+            furnished: Dwelling,
+            mocker: MockerFixture,
+        ):
+            hub_uc = HubUsecases(dwelling_uc.hub_repo, dwelling_uc.device_repo)
+            locked = dwelling_uc.device_repo.locked
+
+            def interleaved(*ids):
+                # another writer gets in between finding the targets and locking
+                mocker.patch.object(dwelling_uc.device_repo, "locked", locked)
+                hub_uc.unpair_device("hub", "lock")
+                DeviceUsecases(dwelling_uc.device_repo).delete_device("lock")
+                hub_uc.unpair_device("hub", "dimmer")
+                return locked(*ids)
+
+            mocker.patch.object(dwelling_uc.device_repo, "locked", interleaved)
+
+            result = dwelling_uc.apply_scene([furnished.id], SHUTDOWN)
+
+            assert result.updated == ["switch"]
+            assert result.failed == {
+                "lock": "Device no longer in the dwellings",
+                "dimmer": "Device no longer in the dwellings",
+            }
+            store = dwelling_uc.repo.store
+            assert "lock" not in store.devices
+            assert store.devices["dimmer"].brightness == 50
 
     class TestInstallHub:
         def test_not_there(self, dwelling_uc: DwellingUsecases):
@@ -310,6 +671,14 @@ class TestDwellingUsecases:
             assert dwelling_uc.repo.store.dwellings["id"].hubs == {hub.id: hub}
             assert dwelling_uc.repo.store.hubs[hub.id].dwelling == dwelling
 
+    class TestIterDwellings:
+        def test_some(self, dwelling_uc: DwellingUsecases):
+            dwellings = [Dwelling(id="1"), Dwelling(id="2")]
+            for dwelling in dwellings:
+                dwelling_uc.repo.save(dwelling)
+
+            assert list(dwelling_uc.iter_dwellings()) == dwellings
+
     class TestListDwellings:
         def test_empty(self, dwelling_uc: DwellingUsecases):
             assert dwelling_uc.list_dwellings() == []
@@ -324,6 +693,17 @@ class TestDwellingUsecases:
 
             assert dwelling_uc.list_dwellings() == [dwelling_1, dwelling_2]
 
+    class TestPageDwellings:
+        def test_walk(self, dwelling_uc: DwellingUsecases):
+            dwellings = [Dwelling(id="1"), Dwelling(id="2")]
+            for dwelling in dwellings:
+                dwelling_uc.repo.save(dwelling)
+
+            first = dwelling_uc.page_dwellings(limit=1)
+
+            assert first == Page(dwellings[:1], cursor=0)
+            assert dwelling_uc.page_dwellings(first.cursor) == Page(dwellings[1:])
+
     class TestOccupy:
         def test_not_there(self, dwelling_uc: DwellingUsecases):
             with pytest.raises(KeyError) as e:
@@ -357,3 +737,38 @@ class TestDwellingUsecases:
             dwelling_uc.vacate("id")
 
             assert dwelling_uc.repo.store.dwellings["id"].state == DwellingState.VACANT
+
+
+class TestChangeFeed:
+    def test_events(self, store: Store):
+        feed = ChangeFeed()
+        device_repo = DeviceRepository(store)
+        hub_repo = HubRepository(store)
+        device_uc = DeviceUsecases(device_repo, feed=feed)
+        hub_uc = HubUsecases(hub_repo, device_repo, feed=feed)
+        dwelling_uc = DwellingUsecases(DwellingRepository(store), hub_repo, feed=feed)
+        hub_repo.save(Hub(id="hub"))
+        DwellingRepository(store).save(Dwelling(id="dwelling"))
+        subscription = feed.subscribe()
+
+        device = device_uc.create_device(Dimmer)
+        dwelling_uc.install_hub("dwelling", "hub")
+        hub_uc.pair_device("hub", device.id)
+        device_uc.update_device(device.id, brightness=10)
+        device_uc.update_device(device.id, brightness=20)
+        dwelling_uc.occupy("dwelling")
+        hub_uc.unpair_device("hub", device.id)
+        device_uc.delete_device(device.id)
+        dwelling_uc.vacate("dwelling")
+
+        events = subscription.read()
+        assert [(e.change, e.dwelling_id) for e in events] == [
+            (Change.CREATED, None),
+            (Change.HUB_INSTALLED, "dwelling"),
+            (Change.PAIRED, "dwelling"),
+            (Change.UPDATED, "dwelling"),
+            (Change.OCCUPIED, "dwelling"),
+            (Change.UNPAIRED, "dwelling"),
+            (Change.DELETED, None),
+            (Change.VACATED, "dwelling"),
+        ]
@@ -26,7 +26,7 @@ class UUID:
 
 @pytest.fixture
 def mock_uuid(mocker: MockerFixture, uuid: UUID):
-    return mocker.patch("idt.repositories.uuid.uuid4", side_effect=uuid.uuid)
+    return mocker.patch("idt.ids.uuid.uuid4", side_effect=uuid.uuid)
 
 
 @pytest.fixture